@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import DFUser, Store, Deal
+from django.db.models import Q
+from .models import DFUser, Store, Deal, IngestionRun, LIVE
+from .search import search_filter
 
 
 @admin.register(DFUser)
@@ -42,6 +44,15 @@ class DealAdmin(admin.ModelAdmin):
     ordering = ('-deal_rating', 'sale_price')
     readonly_fields = ('created_at', 'updated_at', 'deal_id')
     
+    def get_search_results(self, request, queryset, search_term):
+        # Titolo con gli indici di ricerca (vedi app/search.py) invece di un ILIKE '%...%'
+        # su tutta la tabella, deal_id per uguaglianza sulla chiave primaria. Gli indici di
+        # ricerca coprono i soli deal vivi: quelli scaduti si trovano per deal_id
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        return queryset.filter((LIVE & search_filter(search_term)) | Q(deal_id=search_term)), False
+    
     fieldsets = (
         ('Informazioni base', {
             'fields': ('deal_id', 'title', 'store')
@@ -56,4 +67,36 @@ class DealAdmin(admin.ModelAdmin):
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
-    )
\ No newline at end of file
+    )
+
+@admin.register(IngestionRun)
+class IngestionRunAdmin(admin.ModelAdmin):
+    list_display = (
+        'started_at', 'status', 'duration_seconds', 'pages', 'created_count', 'updated_count',
+        'skipped_count', 'rows_per_second', 'peak_memory_kb', 'errors'
+    )
+    list_filter = ('status', 'started_at')
+    ordering = ('-started_at',)
+    date_hierarchy = 'started_at'
+    # Le esecuzioni sono scritte solo da fetch_deals
+    readonly_fields = [field.name for field in IngestionRun._meta.fields]
+    
+    fieldsets = (
+        ('Esecuzione', {
+            'fields': ('started_at', 'finished_at', 'status', 'error_message', 'options')
+        }),
+        ('Tempi per fase', {
+            'fields': (
+                'duration_seconds', 'stores_seconds', 'deal_fetch_seconds', 'parse_seconds', 'db_write_seconds'
+            )
+        }),
+        ('Contatori', {
+            'fields': (
+                'pages', 'http_requests', 'http_retries', 'created_count', 'updated_count', 'skipped_count',
+                'snapshots_count', 'invalid_count', 'batch_errors', 'rows_per_second', 'peak_memory_kb'
+            )
+        }),
+    )
+    
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,95 @@
+from functools import wraps
+from django.http import Http404, HttpResponse
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.response import Response
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from .renderers import FastJSONRenderer
+
+
+class AsyncJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication con l'utente letto dall'ORM asincrono, stessi controlli ed errori"""
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_('Token contained no recognizable user identification')) from e
+
+        try:
+            user = await self.user_model.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist as e:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found') from e
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+
+        return user
+
+
+async def authenticate(request):
+    """Come DEFAULT_AUTHENTICATION_CLASSES: il JWT dell'header Authorization, altrimenti la sessione"""
+    result = await AsyncJWTAuthentication().aauthenticate(request)
+    request.user = result[0] if result is not None else await request.auser()
+
+
+def error_response(request, exc):
+    """Stesso corpo e stesse intestazioni dell'exception handler di DRF"""
+    if isinstance(exc, Http404):
+        exc = exceptions.NotFound(*exc.args)
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    response = Response(data, status=exc.status_code)
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        response['WWW-Authenticate'] = AsyncJWTAuthentication().authenticate_header(request)
+    return response
+
+
+def async_api_view(allow_anonymous=False):
+    """
+    @api_view(['GET']) con @permission_classes e FastJSONRenderer per le viste asincrone di
+    app/async_views.py: autenticazione JWT o di sessione senza bloccare il loop, 401 per gli
+    anonimi se allow_anonymous è falso, errori e JSON come DRF. La vista restituisce Response.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            try:
+                if request.method not in ('GET', 'HEAD'):
+                    raise exceptions.MethodNotAllowed(request.method)
+                await authenticate(request)
+                if not allow_anonymous and not request.user.is_authenticated:
+                    raise exceptions.NotAuthenticated()
+                response = await view(request, *args, **kwargs)
+            except (exceptions.APIException, Http404) as exc:
+                response = error_response(request, exc)
+            if not isinstance(response, Response):
+                return response
+            # Come finalize_response di DRF, ma il JSON si produce qui: l'handler di Django
+            # chiamerebbe render() passando da un thread
+            response.accepted_renderer = FastJSONRenderer()
+            response.accepted_media_type = FastJSONRenderer.media_type
+            response.renderer_context = {}
+            content = response.rendered_content
+            return HttpResponse(content, status=response.status_code, headers=response.headers)
+        return wrapper
+    return decorator
@@ -0,0 +1,17 @@
+from django.urls import path
+from . import async_views
+from .urls import urlpatterns as sync_urlpatterns
+
+# Endpoint in lettura con una versione asincrona: sotto ASGI sostituiscono quelli di app/urls.py
+ASYNC_VIEWS = {
+    'deals_list': async_views.deals_list,
+    'deals_list_filtered': async_views.deals_list_filtered,
+    'deal_detail': async_views.deal_detail,
+    'filters_data': async_views.filters_data,
+}
+
+urlpatterns = [
+    path(str(pattern.pattern), ASYNC_VIEWS[pattern.name], name=pattern.name)
+    if pattern.name in ASYNC_VIEWS else pattern
+    for pattern in sync_urlpatterns
+]
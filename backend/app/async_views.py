@@ -0,0 +1,177 @@
+"""
+Versioni asincrone delle viste in lettura di app/views.py, servite sotto ASGI (conf/asgi.py):
+stessi parametri, stesse risposte e stessi budget di query, con l'ORM, la cache e
+l'autenticazione asincroni. Django non ha cursor asincroni: le query SQL scritte a mano
+(statistiche dei filtri, stima del planner, controllo di pg_trgm) passano da sync_to_async.
+"""
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from rest_framework.response import Response
+
+from .async_api import async_api_view
+from .counts import adeal_count
+from .deal_details import MAX_DEAL_IDS, adeal_details, parse_deal_ids
+from .deal_params import (
+    InvalidParameter, apply_filters, deals_cursor_response, deals_page_response, deals_params,
+    filtered_cursor_response, filtered_page_response, filtered_params, page_bounds, store_ids_query
+)
+from .deal_rows import InvalidFields, adeal_rows, deal_data, parse_fields, with_fields
+from .filter_stats import MAX_PRICE_BUCKETS, filters_summary, price_buckets
+from .models import Deal, FeaturedDeal
+from .pagination import InvalidCursor, keyset_query, keyset_result, order_deals, sort_fields
+from .query_budget import query_budget
+from .response_cache import arequest_dataset_version, cached_response, conditional_response
+from .search import order_by_relevance, search_deals, trigram_available
+from .serializers import DealSerializer, FeaturedDealSerializer
+
+
+async def filter_deals(deals, store, min_price):
+    """Filtri per store e prezzo minimo, come filter_deals di app/views.py"""
+    store_ids = [store_id async for store_id in store_ids_query(store)] if store else None
+    return apply_filters(deals, store_ids, min_price)
+
+
+async def keyset_rows(deals, ordering, cursor, page_size, fields):
+    """keyset_page con le righe lette dall'ORM asincrono"""
+    query = keyset_query(deals, ordering, cursor, page_size)
+    rows = await adeal_rows(query, fields=with_fields(fields, *sort_fields(ordering)))
+    return keyset_result(rows, ordering, page_size)
+
+
+@async_api_view(allow_anonymous=True)
+@query_budget('deals', 3)
+@conditional_response('deals')
+@cached_response('deals')
+async def deals_list(request):
+    if not request.user.is_authenticated:
+        featured = [deal async for deal in FeaturedDeal.objects.all()]
+        serializer = FeaturedDealSerializer(featured, many=True)
+
+        return Response({
+            'authenticated': False,
+            'count': len(serializer.data),
+            'deals': serializer.data
+        })
+
+    try:
+        params = deals_params(request.GET)
+    except (InvalidFields, InvalidParameter) as error:
+        return Response({'error': str(error)}, status=400)
+
+    deals = order_deals(Deal.objects.live(), params.ordering)
+
+    if params.cursor is not None:
+        try:
+            page_deals, next_cursor = await keyset_rows(
+                deals, params.ordering, params.cursor, params.page_size, params.fields
+            )
+        except InvalidCursor:
+            return Response({'error': 'Parametro cursor non valido'}, status=400)
+        return Response(deals_cursor_response(params, page_deals, next_cursor))
+
+    start, end = page_bounds(params.page, params.page_size)
+    total_count, _ = await adeal_count(deals, {}, (await arequest_dataset_version(request)).version)
+    paginated_deals = await adeal_rows(deals[start:end], fields=params.fields)
+    return Response(deals_page_response(params, total_count, paginated_deals))
+
+
+@async_api_view()
+@query_budget('dealsFiltered', 6)
+@conditional_response('dealsFiltered')
+@cached_response('dealsFiltered')
+async def deals_list_filtered(request):
+    try:
+        params = filtered_params(request.GET)
+    except (InvalidFields, InvalidParameter) as error:
+        return Response({'error': str(error)}, status=400)
+
+    deals = await filter_deals(Deal.objects.live(), params.store, params.min_price)
+    if params.q:
+        # search_deals legge se pg_trgm c'è con una query SQL, una volta per processo: qui in un thread
+        await sync_to_async(trigram_available)()
+        deals = search_deals(deals, params.q)
+
+    if params.cursor is not None:
+        try:
+            page_deals, next_cursor = await keyset_rows(
+                deals, params.ordering, params.cursor, params.page_size, params.fields
+            )
+        except InvalidCursor:
+            return Response({'error': 'Invalid cursor parameter'}, status=400)
+        return Response(filtered_cursor_response(params, page_deals, next_cursor))
+
+    deals = order_by_relevance(deals) if params.ordering == 'relevance' else order_deals(deals, params.ordering)
+
+    start, end = page_bounds(params.page, params.page_size)
+    total_count, count_exact = await adeal_count(
+        deals, params.count_signature, (await arequest_dataset_version(request)).version,
+        estimate=params.estimate
+    )
+    paginated_deals = await adeal_rows(deals[start:end + 1], fields=params.fields)
+    return Response(filtered_page_response(params, total_count, count_exact, paginated_deals))
+
+
+@async_api_view()
+@query_budget('dealDetail', 3)
+@conditional_response('dealDetail')
+@cached_response('dealDetail')
+async def deal_detail(request):
+    try:
+        fields = parse_fields(request.GET.get('fields'))
+    except InvalidFields as error:
+        return Response({'error': str(error)}, status=400)
+
+    deal_ids = request.GET.get('deal_ids')
+    if deal_ids is not None:
+        deal_ids = parse_deal_ids(deal_ids)
+        if not deal_ids:
+            return Response({'error': 'deal_ids parameter required'}, status=400)
+        if len(deal_ids) > MAX_DEAL_IDS:
+            return Response({'error': f'At most {MAX_DEAL_IDS} deal_ids per request'}, status=400)
+        deals, missing = await adeal_details(deal_ids, fields)
+        return Response({
+            'deals': deals,
+            'missing': missing
+        })
+
+    deal_id = request.GET.get('deal_id')
+    if not deal_id:
+        return Response({'error': 'deal_id parameter required'}, status=400)
+
+    deals = Deal.objects.live().filter(deal_id=deal_id)
+    if fields is not None:
+        rows = await adeal_rows(deals, fields=fields)
+        deal = deal_data(rows)[0] if rows else None
+    else:
+        deal = await deals.afirst()
+        deal = DealSerializer(deal).data if deal is not None else None
+    if deal is None:
+        raise Http404('No Deal matches the given query.')
+
+    return Response({
+        'deal': deal
+    })
+
+
+@async_api_view()
+@query_budget('filtersData', 2)
+@conditional_response('filtersData')
+@cached_response('filtersData')
+async def filters_data(request):
+    try:
+        buckets = int(request.GET.get('buckets', price_buckets()))
+        if not 1 <= buckets <= MAX_PRICE_BUCKETS:
+            raise ValueError(buckets)
+    except ValueError:
+        return Response({'error': f'buckets must be between 1 and {MAX_PRICE_BUCKETS}'}, status=400)
+
+    # Una query aggregata scritta in SQL: senza cursor asincroni passa da un thread
+    summary = await sync_to_async(filters_summary)(buckets)
+    return Response({
+        'stores': [store['store_name'] for store in summary['stores']],
+        'prices': [bucket['min'] for bucket in summary['price_histogram']],
+        'store_counts': summary['stores'],
+        'min_price': summary['min_price'],
+        'max_price': summary['max_price'],
+        'price_histogram': summary['price_histogram'],
+    })
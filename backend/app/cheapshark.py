@@ -0,0 +1,389 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import namedtuple
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from urllib.parse import urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from django.conf import settings
+from django.utils import timezone
+
+from .models import HttpValidator
+from .ingestion import iter_response_array
+
+
+logger = logging.getLogger(__name__)
+
+BASE_URL = 'https://www.cheapshark.com/api/1.0'
+
+# Valori di default, sovrascrivibili da settings.CHEAPSHARK_CLIENT
+DEFAULTS = {
+    'CONNECT_TIMEOUT': 5,
+    'READ_TIMEOUT': 30,
+    'MAX_RETRIES': 4,
+    'BACKOFF_FACTOR': 0.5,
+    'BACKOFF_MAX': 30,
+    'RETRY_AFTER_MAX': 120,
+    'REQUESTS_PER_SECOND': 4.0,
+    'POOL_SIZE': 10,
+    'CIRCUIT_FAILURE_THRESHOLD': 5,
+    'CIRCUIT_RESET_TIMEOUT': 60,
+}
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+RequestStat = namedtuple('RequestStat', ['url', 'status', 'elapsed', 'attempt'])
+
+
+class CheapSharkError(requests.RequestException):
+    pass
+
+
+class CircuitOpenError(CheapSharkError):
+    pass
+
+
+class RateLimiter:
+    """Limite globale di richieste al secondo, condiviso tra tutti i thread"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.lock = threading.Lock()
+        self.next_slot = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class CircuitBreaker:
+    """
+    Dopo failure_threshold errori consecutivi il circuito si apre e le richieste
+    falliscono subito; passati reset_timeout secondi ne lascia passare una sola di prova,
+    mentre gli altri thread continuano a fallire finché la prova non ha un esito
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=60):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    def before_request(self):
+        with self.lock:
+            if self.opened_at is None:
+                return
+            if self.probing or time.monotonic() - self.opened_at < self.reset_timeout:
+                raise CircuitOpenError(
+                    f'CheapShark circuit open after {self.failures} consecutive failures'
+                )
+            # Half-open: solo questa richiesta passa e decide se richiudere o riaprire
+            self.probing = True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_client_error(self):
+        """
+        Un 4xx dice che CheapShark risponde ma non che la richiesta è andata bene:
+        chiude il circuito senza azzerare gli errori, così un altro errore lo riapre
+        """
+        with self.lock:
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self.probing = False
+
+
+def parse_retry_after(value):
+    """Retry-After può essere un numero di secondi o una data HTTP"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - timezone.now()).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+# Header che descrivono la codifica sul filo: il corpo registrato è già decodificato
+TRANSPORT_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection'}
+
+
+def recording_path(directory, url):
+    return Path(directory) / hashlib.sha1(url.encode()).hexdigest()[:20]
+
+
+def load_recording(base, stream=False):
+    """Ricostruisce una requests.Response da una risposta registrata"""
+    with open(f'{base}.json') as metadata_file:
+        metadata = json.load(metadata_file)
+
+    response = requests.Response()
+    response.url = metadata['url']
+    response.status_code = metadata['status']
+    response.reason = metadata.get('reason')
+    response.headers = CaseInsensitiveDict(metadata['headers'])
+    response.raw = gzip.open(f'{base}.body.gz', 'rb')
+    if not stream:
+        response.content
+        response.raw.close()
+    return response, metadata['elapsed']
+
+
+class RecordingSession:
+    """
+    Sessione che inoltra le richieste a quella reale e salva ogni risposta su disco:
+    metadati e header in <chiave>.json, corpo compresso in <chiave>.body.gz.
+    Il corpo viene copiato a pezzi, quindi anche le pagine enormi non passano dalla memoria.
+    """
+
+    def __init__(self, directory, session):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.session = session
+
+    def get(self, url, stream=False, **kwargs):
+        start = time.monotonic()
+        response = self.session.get(url, stream=True, **kwargs)
+        base = recording_path(self.directory, url)
+        try:
+            # Scrittura su file temporanei e rename, così un replay non legge mai file a metà
+            with gzip.open(f'{base}.body.gz.tmp', 'wb') as body:
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    body.write(chunk)
+            with open(f'{base}.json.tmp', 'w') as metadata_file:
+                json.dump({
+                    'url': url,
+                    'status': response.status_code,
+                    'reason': response.reason,
+                    'headers': {
+                        name: value for name, value in response.headers.items()
+                        if name.lower() not in TRANSPORT_HEADERS
+                    },
+                    'elapsed': time.monotonic() - start,
+                }, metadata_file)
+        finally:
+            response.close()
+        os.replace(f'{base}.body.gz.tmp', f'{base}.body.gz')
+        os.replace(f'{base}.json.tmp', f'{base}.json')
+        return load_recording(base, stream)[0]
+
+
+class ReplaySession:
+    """
+    Sessione che serve le risposte registrate da RecordingSession senza usare la rete;
+    con latency=True attende quanto aveva impiegato la risposta originale
+    """
+
+    def __init__(self, directory, latency=False):
+        self.directory = Path(directory)
+        self.latency = latency
+
+    def get(self, url, stream=False, **kwargs):
+        base = recording_path(self.directory, url)
+        if not os.path.exists(f'{base}.json'):
+            raise CheapSharkError(f'No recorded response for {url} in {self.directory}')
+        response, elapsed = load_recording(base, stream)
+        if self.latency:
+            time.sleep(elapsed)
+        return response
+
+
+class CheapSharkClient:
+    """
+    Client HTTP condiviso per le API di CheapShark: sessione con pool di
+    connessioni, timeout, retry con backoff esponenziale e jitter, rispetto dei 429
+    e di Retry-After, circuit breaker e richieste condizionali (ETag/Last-Modified).
+    """
+
+    def __init__(self, session=None, record_dir=None, replay_dir=None, replay_latency=False, **options):
+        config = {**DEFAULTS, **getattr(settings, 'CHEAPSHARK_CLIENT', {})}
+        config.update({key.upper(): value for key, value in options.items()})
+        if replay_dir:
+            # In replay si va alla velocità del DB: niente limite di richieste al secondo
+            config['REQUESTS_PER_SECOND'] = 0
+
+        self.timeout = (config['CONNECT_TIMEOUT'], config['READ_TIMEOUT'])
+        self.max_retries = config['MAX_RETRIES']
+        self.backoff_factor = config['BACKOFF_FACTOR']
+        self.backoff_max = config['BACKOFF_MAX']
+        self.retry_after_max = config['RETRY_AFTER_MAX']
+        self.rate_limiter = RateLimiter(config['REQUESTS_PER_SECOND'])
+        self.breaker = CircuitBreaker(
+            config['CIRCUIT_FAILURE_THRESHOLD'], config['CIRCUIT_RESET_TIMEOUT']
+        )
+
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=config['POOL_SIZE'], pool_maxsize=config['POOL_SIZE']
+            )
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+        if replay_dir:
+            session = ReplaySession(replay_dir, latency=replay_latency)
+        elif record_dir:
+            session = RecordingSession(record_dir, session)
+        # Una registrazione deve contenere le risposte complete: niente richieste condizionali,
+        # un 304 registrato farebbe saltare la sincronizzazione in replay su un DB vuoto
+        self.recording = bool(record_dir) and not replay_dir
+        self.session = session
+        self.stats = []
+
+    def url(self, path, params=None):
+        url = f'{BASE_URL}/{path}'
+        if params:
+            url += '?' + urlencode(params)
+        return url
+
+    def backoff(self, attempt):
+        # Full jitter: attesa casuale tra 0 e il backoff esponenziale
+        return random.uniform(0, min(self.backoff_max, self.backoff_factor * 2 ** attempt))
+
+    def get(self, path, params=None, conditional=False, stream=False):
+        url = self.url(path, params)
+        headers = self.validator_headers(url) if conditional and not self.recording else {}
+
+        attempt = 0
+        while True:
+            self.breaker.before_request()
+            self.rate_limiter.wait()
+
+            start = time.monotonic()
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout, stream=stream)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.record(url, type(e).__name__, start, attempt)
+                self.breaker.record_failure()
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.backoff(attempt)
+            else:
+                self.record(url, response.status_code, start, attempt)
+                if response.status_code not in RETRY_STATUSES:
+                    if response.status_code >= 400:
+                        self.breaker.record_client_error()
+                    else:
+                        self.breaker.record_success()
+                    response.raise_for_status()
+                    return response
+
+                self.breaker.record_failure()
+                if attempt >= self.max_retries:
+                    response.raise_for_status()
+                    return response
+
+                delay = parse_retry_after(response.headers.get('Retry-After'))
+                if delay is None:
+                    delay = self.backoff(attempt)
+                delay = min(delay, self.retry_after_max)
+                response.close()
+
+            logger.warning('Retrying %s in %.2fs (attempt %d)', url, delay, attempt + 1)
+            time.sleep(delay)
+            attempt += 1
+
+    def record(self, url, status, start, attempt):
+        elapsed = time.monotonic() - start
+        self.stats.append(RequestStat(url, status, elapsed, attempt))
+        logger.debug('GET %s -> %s in %.0fms', url, status, elapsed * 1000)
+
+    def latency_summary(self):
+        """Riepilogo delle latenze delle richieste fatte finora"""
+        if not self.stats:
+            return 'no requests'
+        latencies = sorted(stat.elapsed for stat in self.stats)
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+        retries = sum(1 for stat in self.stats if stat.attempt > 0)
+        return (
+            f'{len(latencies)} requests ({retries} retries), total {sum(latencies):.2f}s, '
+            f'p50 {percentile(0.5):.0f}ms, p95 {percentile(0.95):.0f}ms, max {latencies[-1] * 1000:.0f}ms'
+        )
+
+    def validator_headers(self, url):
+        validator = HttpValidator.objects.filter(url=url).first()
+        headers = {}
+        if validator:
+            if validator.etag:
+                headers['If-None-Match'] = validator.etag
+            if validator.last_modified:
+                headers['If-Modified-Since'] = validator.last_modified
+        return headers
+
+    def remember_validators(self, path, response, params=None):
+        """
+        Salva ETag e Last-Modified di una risposta; va chiamato solo dopo averne
+        elaborato il contenuto, altrimenti un errore renderebbe il 304 successivo sbagliato
+        """
+        etag = response.headers.get('ETag', '')
+        last_modified = response.headers.get('Last-Modified', '')
+        if etag or last_modified:
+            HttpValidator.objects.update_or_create(
+                url=self.url(path, params),
+                defaults={'etag': etag, 'last_modified': last_modified},
+            )
+
+    def stores(self):
+        """Risposta con la lista degli store, None se non è cambiata dall'ultima volta (304)"""
+        response = self.get('stores', conditional=True)
+        if response.status_code == 304:
+            return None
+        return response
+
+    def deals_page(self, store_id, page_number, page_size, max_age=None, stream=False):
+        """
+        Una pagina di deal come (deals, total_pages); con stream=True deals è un
+        generatore che legge la risposta man mano, invece della lista già decodificata
+        """
+        params = {
+            'storeID': store_id,
+            'pageSize': page_size,
+            'pageNumber': page_number,
+        }
+        if max_age:
+            # Solo i deal cambiati nelle ultime max_age ore
+            params['maxAge'] = max_age
+        response = self.get('deals', params, stream=stream)
+        try:
+            total_pages = int(response.headers.get('X-Total-Page-Count', 1))
+        except (TypeError, ValueError):
+            total_pages = 1
+        if stream:
+            return iter_response_array(response), total_pages
+        return response.json(), total_pages
@@ -0,0 +1,84 @@
+import hashlib
+import json
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import EmptyResultSet
+from django.db import connection
+from .response_cache import response_cache
+
+
+def estimated_count_threshold():
+    return getattr(settings, 'ESTIMATED_COUNT_THRESHOLD', 10000)
+
+
+def planner_estimate(queryset):
+    """Righe stimate dal planner di Postgres per la query, senza eseguirla"""
+    try:
+        sql, params = queryset.order_by().query.sql_with_params()
+    except EmptyResultSet:
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def count_key(signature, version, mode):
+    digest = hashlib.sha1(json.dumps(signature, sort_keys=True).encode()).hexdigest()
+    return f'counts:v{version}:{mode}:{digest}'
+
+
+def deal_count(queryset, signature, version, estimate=False):
+    """
+    Totale dei deal della query come (count, exact). Il conteggio è in cache per firma dei
+    filtri e versione dei dati, quindi pagine e ordinamenti diversi dello stesso filtro lo
+    condividono. Con estimate=True, se il planner stima più di ESTIMATED_COUNT_THRESHOLD
+    righe, si restituisce la stima invece di contarle.
+    """
+    cache = response_cache()
+    exact_key = count_key(signature, version, 'exact')
+    count = cache.get(exact_key)
+    if count is not None:
+        return count, True
+
+    if estimate:
+        estimated_key = count_key(signature, version, 'estimated')
+        count = cache.get(estimated_key)
+        if count is not None:
+            return count, False
+        count = planner_estimate(queryset)
+        if count > estimated_count_threshold():
+            cache.set(estimated_key, count)
+            return count, False
+
+    count = queryset.count()
+    cache.set(exact_key, count)
+    return count, True
+
+
+async def adeal_count(queryset, signature, version, estimate=False):
+    """
+    deal_count per le viste asincrone: cache e COUNT senza bloccare il loop; l'EXPLAIN
+    della stima passa da un thread, perché Django non ha cursor asincroni
+    """
+    cache = response_cache()
+    exact_key = count_key(signature, version, 'exact')
+    count = await cache.aget(exact_key)
+    if count is not None:
+        return count, True
+
+    if estimate:
+        estimated_key = count_key(signature, version, 'estimated')
+        count = await cache.aget(estimated_key)
+        if count is not None:
+            return count, False
+        count = await sync_to_async(planner_estimate)(queryset)
+        if count > estimated_count_threshold():
+            await cache.aset(estimated_key, count)
+            return count, False
+
+    count = await queryset.acount()
+    await cache.aset(exact_key, count)
+    return count, True
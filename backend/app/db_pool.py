@@ -0,0 +1,53 @@
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import JsonResponse
+from django.utils.deprecation import MiddlewareMixin
+from psycopg_pool import PoolTimeout
+
+
+def connection_pool(alias=DEFAULT_DB_ALIAS):
+    """Il pool di psycopg della connessione, None se DATABASES non ne configura uno"""
+    return getattr(connections[alias], 'pool', None)
+
+
+def pool_stats(alias=DEFAULT_DB_ALIAS):
+    """
+    Statistiche del pool di questo processo (ConnectionPool.get_stats: dimensione, connessioni
+    libere, richieste in attesa, attese in millisecondi, errori) accanto a max_connections e alle
+    connessioni aperte sul database da tutti i processi, per dimensionare max_size
+    """
+    pool = connection_pool(alias)
+    with connections[alias].cursor() as cursor:
+        cursor.execute(
+            "SELECT current_setting('max_connections')::int, "
+            "(SELECT count(*) FROM pg_stat_activity WHERE datname = current_database())"
+        )
+        max_connections, database_connections = cursor.fetchone()
+    return {
+        'pooled': pool is not None,
+        'pool': pool.get_stats() if pool is not None else None,
+        'max_connections': max_connections,
+        'database_connections': database_connections,
+    }
+
+
+def is_pool_timeout(exc):
+    # Django rilancia gli errori di psycopg come django.db.OperationalError, con l'originale in __cause__
+    while exc is not None:
+        if isinstance(exc, PoolTimeout):
+            return True
+        exc = exc.__cause__
+    return False
+
+
+class PoolTimeoutMiddleware(MiddlewareMixin):
+    """
+    Una richiesta che non ottiene una connessione dal pool entro DATABASE_POOL['timeout'] riceve
+    un 503 con Retry-After invece di un 500: il pool è esaurito, non il server rotto
+    """
+
+    def process_exception(self, request, exception):
+        if not is_pool_timeout(exception):
+            return None
+        response = JsonResponse({'detail': 'Database busy, retry later'}, status=503)
+        response['Retry-After'] = '1'
+        return response
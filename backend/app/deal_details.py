@@ -0,0 +1,86 @@
+import hashlib
+from .deal_rows import adeal_rows, deal_data, deal_rows, with_fields
+from .models import Deal
+from .response_cache import KEY_PREFIX, response_cache, response_cache_enabled
+
+
+# Deal al massimo per richiesta di dealDetail con deal_ids
+MAX_DEAL_IDS = 50
+
+
+def deal_cache_key(deal_id, updated_at, fields=None):
+    """
+    Chiave di un deal per id e updated_at: un deal modificato cambia chiave, quindi le voci
+    restano valide anche dopo una nuova versione dei dati, a differenza delle risposte intere.
+    Con fields la voce contiene solo quei campi ed è distinta da quella completa.
+    """
+    digest = hashlib.sha1(deal_id.encode()).hexdigest()
+    key = f'{KEY_PREFIX}:deal:{digest}:{updated_at.timestamp()}'
+    if fields is not None:
+        key += ':' + hashlib.sha1(','.join(fields).encode()).hexdigest()
+    return key
+
+
+def parse_deal_ids(value):
+    """Id separati da virgola, senza vuoti né doppioni, nell'ordine della richiesta"""
+    return list(dict.fromkeys(deal_id for deal_id in (part.strip() for part in value.split(',')) if deal_id))
+
+
+def deal_details(deal_ids, fields=None):
+    """
+    Dati dei deal vivi negli id richiesti, nello stesso ordine, e id non trovati. Una query
+    legge updated_at per le chiavi della cache, una seconda legge solo i deal non in cache
+    (con fields solo quelle colonne, più deal_id e updated_at per le chiavi).
+    """
+    deals = Deal.objects.live().filter(deal_id__in=deal_ids)
+    cache = response_cache() if response_cache_enabled() else None
+    found = {}
+    if cache is not None:
+        keys = {
+            deal_id: deal_cache_key(deal_id, updated_at, fields)
+            for deal_id, updated_at in deals.values_list('deal_id', 'updated_at')
+        }
+        cached = cache.get_many(keys.values())
+        found = {deal_id: cached[key] for deal_id, key in keys.items() if key in cached}
+        # Con tutti i deal in cache la lista è vuota e Django non esegue la query
+        deals = deals.filter(deal_id__in=[deal_id for deal_id in keys if deal_id not in found])
+
+    rows = deal_rows(deals, fields=with_fields(fields, 'deal_id', 'updated_at'))
+    fetched = dict(zip((row.deal_id for row in rows), deal_data(rows, fields)))
+    if cache is not None and fetched:
+        # Chiave dalla riga letta: se il deal è cambiato tra le due query vale la versione nuova
+        cache.set_many({
+            deal_cache_key(row.deal_id, row.updated_at, fields): fetched[row.deal_id] for row in rows
+        })
+    found.update(fetched)
+
+    return [found[deal_id] for deal_id in deal_ids if deal_id in found], [
+        deal_id for deal_id in deal_ids if deal_id not in found
+    ]
+
+
+async def adeal_details(deal_ids, fields=None):
+    """deal_details con l'ORM e la cache asincroni, per le viste di app/async_views.py"""
+    deals = Deal.objects.live().filter(deal_id__in=deal_ids)
+    cache = response_cache() if response_cache_enabled() else None
+    found = {}
+    if cache is not None:
+        keys = {
+            deal_id: deal_cache_key(deal_id, updated_at, fields)
+            async for deal_id, updated_at in deals.values_list('deal_id', 'updated_at')
+        }
+        cached = await cache.aget_many(keys.values())
+        found = {deal_id: cached[key] for deal_id, key in keys.items() if key in cached}
+        deals = deals.filter(deal_id__in=[deal_id for deal_id in keys if deal_id not in found])
+
+    rows = await adeal_rows(deals, fields=with_fields(fields, 'deal_id', 'updated_at'))
+    fetched = dict(zip((row.deal_id for row in rows), deal_data(rows, fields)))
+    if cache is not None and fetched:
+        await cache.aset_many({
+            deal_cache_key(row.deal_id, row.updated_at, fields): fetched[row.deal_id] for row in rows
+        })
+    found.update(fetched)
+
+    return [found[deal_id] for deal_id in deal_ids if deal_id in found], [
+        deal_id for deal_id in deal_ids if deal_id not in found
+    ]
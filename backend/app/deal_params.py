@@ -0,0 +1,211 @@
+"""
+Lettura e validazione dei parametri delle viste dei deal e costruzione delle loro risposte,
+comuni alle viste sincrone (app/views.py) e asincrone (app/async_views.py): le due versioni
+differiscono solo per le chiamate all'ORM.
+"""
+import math
+from collections import namedtuple
+
+from .deal_rows import deal_data, parse_fields
+from .models import Store
+from .search import MAX_QUERY_LENGTH
+
+# Ordinamenti accettati da deals_list_filtered, tutti paginabili anche per cursor
+ALLOWED_ORDERINGS = [
+    'deal_rating', '-deal_rating',
+    'sale_price', '-sale_price',
+    'normal_price', '-normal_price',
+    'title', '-title',
+    'created_at', '-created_at',
+    'metacritic_score', '-metacritic_score'
+]
+
+# deals_list: 8 deal per pagina per rimanere coerente con la richiesta della parte FE
+DEALS_PAGE_SIZE = 8
+DEALS_ORDERING = '-deal_rating'
+MAX_PAGE_SIZE = 50
+
+PAGE_ERROR = 'Invalid page or page_size parameter'
+
+# page è None con il cursor, che pagina per chiave
+DealsParams = namedtuple('DealsParams', ['fields', 'ordering', 'cursor', 'page', 'page_size'])
+FilteredParams = namedtuple('FilteredParams', [
+    'fields', 'store', 'min_price', 'q', 'ordering', 'cursor', 'page', 'page_size',
+    'estimate', 'count_signature', 'filters_applied'
+])
+
+
+class InvalidParameter(ValueError):
+    """Parametro della query non valido: il messaggio è l'errore restituito con il 400"""
+
+
+def parse_min_price(value):
+    """min_price come float, None se assente; InvalidParameter se non è un numero finito"""
+    if not value:
+        return None
+    try:
+        price = float(value)
+    except ValueError:
+        price = math.nan
+    if not math.isfinite(price):
+        raise InvalidParameter('min_price must be a number')
+    return price
+
+
+def parse_query(value):
+    """Testo della ricerca senza spazi ai lati, '' se assente"""
+    q = (value or '').strip()
+    if len(q) > MAX_QUERY_LENGTH:
+        raise InvalidParameter(f'q must be at most {MAX_QUERY_LENGTH} characters')
+    return q
+
+
+def parse_ordering(value, q):
+    """
+    (ordinamento richiesto, ordinamento applicato): con q il predefinito è per rilevanza, un
+    ordinamento non ammesso diventa -deal_rating
+    """
+    requested = value if value is not None else ('relevance' if q else '-deal_rating')
+    if requested not in ALLOWED_ORDERINGS and not (q and requested == 'relevance'):
+        return requested, '-deal_rating'
+    return requested, requested
+
+
+def parse_page(value, error=PAGE_ERROR):
+    """Numero di pagina, da 1; InvalidParameter(error) altrimenti"""
+    try:
+        page = int(value)
+    except (TypeError, ValueError):
+        raise InvalidParameter(error)
+    if page < 1:
+        raise InvalidParameter(error)
+    return page
+
+
+def parse_page_size(value, error=PAGE_ERROR):
+    """Deal per pagina, al massimo MAX_PAGE_SIZE; InvalidParameter(error) se non è positivo"""
+    try:
+        page_size = int(value)
+    except (TypeError, ValueError):
+        raise InvalidParameter(error)
+    if page_size < 1:
+        raise InvalidParameter(error)
+    return min(page_size, MAX_PAGE_SIZE)
+
+
+def page_bounds(page, page_size):
+    """Indici (inizio, fine) della pagina nel queryset ordinato"""
+    start = (page - 1) * page_size
+    return start, start + page_size
+
+
+def deals_params(params):
+    """Parametri di deals_list per gli utenti autenticati; InvalidFields o InvalidParameter"""
+    # Con fields=a,b,c solo quei campi, letti dal database senza le altre colonne
+    fields = parse_fields(params.get('fields'))
+    # Con il parametro cursor (vuoto per la prima pagina) la paginazione è per chiave
+    # e il costo non cresce con la profondità
+    cursor = params.get('cursor')
+    page = parse_page(params.get('page', 1), 'Parametro page non valido') if cursor is None else None
+    return DealsParams(fields, DEALS_ORDERING, cursor, page, DEALS_PAGE_SIZE)
+
+
+def filtered_params(params):
+    """Parametri di deals_list_filtered; InvalidFields o InvalidParameter"""
+    fields = parse_fields(params.get('fields'))
+    store = params.get('store')
+    min_price = params.get('min_price')
+    price = parse_min_price(min_price)
+    # Ricerca sul titolo: con q l'ordinamento predefinito è per rilevanza
+    q = parse_query(params.get('q'))
+    requested, ordering = parse_ordering(params.get('ordering'), q)
+    page_size = parse_page_size(params.get('page_size', 8))
+
+    filters_applied = {
+        'store': store,
+        'min_price': min_price,
+        'ordering': requested
+    }
+    # Firma dei filtri per la cache dei conteggi: ordinamento e pagina non cambiano il totale
+    count_signature = {'store': store or None, 'min_price': price}
+    if q:
+        filters_applied['q'] = q
+        count_signature['q'] = q
+
+    # Paginazione per chiave: il cursor (vuoto per la prima pagina) contiene la chiave di
+    # ordinamento e il deal_id dell'ultimo deal restituito
+    cursor = params.get('cursor')
+    if cursor is not None:
+        # La rilevanza non ha un indice su cui proseguire: per cursor i risultati della
+        # ricerca seguono l'ordinamento predefinito
+        if ordering == 'relevance':
+            ordering = '-deal_rating'
+        page = None
+    else:
+        page = parse_page(params.get('page', 1))
+
+    return FilteredParams(
+        fields, store, price, q, ordering, cursor, page, page_size,
+        params.get('count') == 'estimated', count_signature, filters_applied
+    )
+
+
+def store_ids_query(store):
+    """Id dello store con quel nome: senza join il filtro usa gli indici con store_id in testa"""
+    return Store.objects.filter(store_name=store).values_list('store_id', flat=True)
+
+
+def apply_filters(deals, store_ids, min_price):
+    """Filtri per store (None se non richiesto, già risolto in id) e prezzo minimo"""
+    if store_ids is not None:
+        deals = deals.filter(store_id__in=store_ids)
+    if min_price is not None:
+        deals = deals.filter(sale_price__gte=min_price)
+    return deals
+
+
+def deals_cursor_response(params, page_deals, next_cursor):
+    return {
+        'authenticated': True,
+        'page_size': params.page_size,
+        'hasNext': next_cursor is not None,
+        'nextCursor': next_cursor,
+        'deals': deal_data(page_deals, params.fields)
+    }
+
+
+def deals_page_response(params, total_count, page_deals):
+    return {
+        'authenticated': True,
+        'count': total_count,
+        'page': params.page,
+        'page_size': params.page_size,
+        'hasNext': page_bounds(params.page, params.page_size)[1] < total_count,
+        'deals': deal_data(page_deals, params.fields)
+    }
+
+
+def filtered_cursor_response(params, page_deals, next_cursor):
+    return {
+        'page_size': params.page_size,
+        'has_next': next_cursor is not None,
+        'next_cursor': next_cursor,
+        'deals': deal_data(page_deals, params.fields),
+        'filters_applied': params.filters_applied
+    }
+
+
+def filtered_page_response(params, total_count, count_exact, page_deals):
+    """page_deals si legge con un deal oltre la pagina: se c'è, has_next è vero senza guardare il totale"""
+    page_size = params.page_size
+    return {
+        'count': total_count,
+        'count_exact': count_exact,
+        'page': params.page,
+        'page_size': page_size,
+        'total_pages': (total_count + page_size - 1) // page_size,
+        'has_next': len(page_deals) > page_size,
+        'has_previous': params.page > 1,
+        'deals': deal_data(page_deals[:page_size], params.fields),
+        'filters_applied': params.filters_applied
+    }
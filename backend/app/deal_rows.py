@@ -0,0 +1,183 @@
+import decimal
+from collections import namedtuple
+from functools import lru_cache
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+from .serializers import DealSerializer
+
+
+# Campi che DealSerializer restituisce così come arrivano dal database (None compreso):
+# gli altri passano per il to_representation del campo del serializer, o per un equivalente
+# più veloce per date ISO 8601 e decimali come stringa (vedi iso_datetime e fixed_decimal)
+PLAIN_FIELDS = (
+    serializers.CharField, serializers.IntegerField, serializers.PrimaryKeyRelatedField,
+)
+
+# Colonna letta per i campi del serializer che non hanno lo stesso nome nel modello
+SOURCES = {
+    'store': 'store_id',
+}
+
+
+class InvalidFields(ValueError):
+    pass
+
+
+# Una voce per combinazione di campi richiesta: il limite evita che fields arbitrari la facciano crescere
+@lru_cache(maxsize=256)
+def deal_layout(fields=None):
+    """
+    Nomi dei campi nell'ordine di DealSerializer, colonne da leggere con values_list() e
+    campi del serializer; calcolato una volta dai campi del serializer, così le due strade
+    restano allineate. Con fields (vedi parse_fields) solo quei campi.
+    """
+    serializer_fields = DealSerializer().fields
+    names = tuple(name for name in serializer_fields if fields is None or name in fields)
+    columns = tuple(SOURCES.get(name, name) for name in names)
+    return names, columns, tuple(serializer_fields[name] for name in names)
+
+
+def parse_fields(value):
+    """
+    Campi richiesti con fields=a,b,c nell'ordine di DealSerializer, None senza parametro;
+    InvalidFields se il parametro è vuoto o contiene campi che DealSerializer non ha
+    """
+    if value is None:
+        return None
+    requested = {name.strip() for name in value.split(',')} - {''}
+    names = deal_layout()[0]
+    unknown = requested.difference(names)
+    if not requested:
+        raise InvalidFields('fields must name at least one field')
+    if unknown:
+        raise InvalidFields(f'Unknown fields: {", ".join(sorted(unknown))}')
+    return tuple(name for name in names if name in requested)
+
+
+def with_fields(fields, *required):
+    """
+    fields più i campi required, nell'ordine di DealSerializer: colonne che servono a chi
+    legge le righe (chiave del cursor, updated_at della cache) anche se il client non le chiede
+    """
+    if fields is None:
+        return None
+    return tuple(name for name in deal_layout()[0] if name in fields or name in required)
+
+
+@lru_cache(maxsize=256)
+def deal_row_type(fields=None):
+    """
+    Riga compatta di un deal, una namedtuple con i campi di DealSerializer (o solo fields):
+    gli attributi hanno il nome delle colonne di ordinamento, quindi vale anche per i cursor
+    """
+    return namedtuple('DealRow', deal_layout(fields)[0])
+
+
+def deal_values(deals, extra=(), fields=None):
+    """values_list() con le colonne di DealRow (solo fields, se indicati) e le annotazioni extra"""
+    return deals.values_list(*deal_layout(fields)[1], *extra)
+
+
+def make_rows(values, extra=(), fields=None):
+    row_type = deal_row_type(fields)
+    if not extra:
+        return [row_type._make(row) for row in values]
+    columns = len(row_type._fields)
+    return [(row_type._make(row[:columns]), row[columns:]) for row in values]
+
+
+def deal_rows(deals, *extra, fields=None):
+    """
+    Deal della query come DealRow, senza istanziare il modello; con extra anche le annotazioni
+    indicate, come coppie (DealRow, valori). Con fields la query legge solo quelle colonne.
+    """
+    return make_rows(deal_values(deals, extra, fields), extra, fields)
+
+
+async def adeal_rows(deals, *extra, fields=None):
+    """deal_rows con l'ORM asincrono, per le viste di app/async_views.py"""
+    return make_rows([row async for row in deal_values(deals, extra, fields)], extra, fields)
+
+
+def iso_datetime(field, tz):
+    """
+    DateTimeField.to_representation di DRF per il formato ISO 8601 con il fuso già risolto:
+    DRF cerca il fuso corrente per ogni valore, la parte più lenta di una pagina
+    """
+    def convert(value):
+        if timezone.is_naive(value):
+            return field.to_representation(value)
+        value = value.astimezone(tz).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert
+
+
+def fixed_decimal(field):
+    """
+    DecimalField.to_representation di DRF come stringa con decimal_places cifre, con esponente
+    e contesto calcolati una volta invece che per ogni valore
+    """
+    exponent = decimal.Decimal('.1') ** field.decimal_places
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+
+    def convert(value):
+        if not isinstance(value, decimal.Decimal):
+            return field.to_representation(value)
+        return f'{value.quantize(exponent, rounding=field.rounding, context=context):f}'
+    return convert
+
+
+def converter(field, tz):
+    if isinstance(field, PLAIN_FIELDS):
+        return None
+    if (
+        tz is not None and isinstance(field, serializers.DateTimeField) and not hasattr(field, 'timezone')
+        and getattr(field, 'format', api_settings.DATETIME_FORMAT) == ISO_8601
+    ):
+        return iso_datetime(field, tz)
+    if (
+        isinstance(field, serializers.DecimalField) and field.decimal_places is not None
+        and getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+        and not field.localize and not field.normalize_output
+    ):
+        return fixed_decimal(field)
+    return field.to_representation
+
+
+def page_converters(fields=None):
+    """Conversione di ogni campo per una pagina, con il fuso corrente letto una volta sola"""
+    tz = timezone.get_current_timezone() if settings.USE_TZ else None
+    return tuple(converter(field, tz) for field in deal_layout(fields)[2])
+
+
+def deal_data(rows, fields=None):
+    """
+    Stessi dict, con gli stessi formati, di DealSerializer(deals, many=True).data; con fields
+    solo quei campi, anche se le righe sono state lette con qualche colonna in più (with_fields)
+    """
+    if not rows:
+        return []
+    names = rows[0]._fields
+    # Solo i campi da convertire passano per Python, il resto è copiato da dict(zip())
+    converted = [
+        (name, convert) for name, convert in zip(names, page_converters(names)) if convert is not None
+        and (fields is None or name in fields)
+    ]
+    dropped = () if fields is None else tuple(name for name in names if name not in fields)
+    data = []
+    for row in rows:
+        item = dict(zip(names, row))
+        for name in dropped:
+            del item[name]
+        for name, convert in converted:
+            value = item[name]
+            if value is not None:
+                item[name] = convert(value)
+        data.append(item)
+    return data
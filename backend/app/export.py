@@ -0,0 +1,75 @@
+import csv
+import io
+from itertools import islice
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from .deal_rows import deal_data, deal_layout, deal_row_type
+from .renderers import FastJSONRenderer
+
+
+# Formati di dealsExport con il content type della risposta
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+def export_chunk_size():
+    return getattr(settings, 'DEALS_EXPORT_CHUNK_SIZE', 2000)
+
+
+def row_batches(deals, fields=None):
+    """
+    Deal della query come DealRow, a blocchi di DEALS_EXPORT_CHUNK_SIZE: iterator() legge con un
+    cursor lato server lo stesso numero di righe per volta, quindi la memoria non cresce con
+    il totale e il primo blocco arriva senza aspettare gli altri
+    """
+    row_type = deal_row_type(fields)
+    chunk_size = export_chunk_size()
+    # Fuori da una transazione Django dichiara il cursor WITH HOLD e Postgres materializza
+    # l'intero risultato al commit, prima di restituire la prima riga
+    with transaction.atomic():
+        rows = deals.values_list(*deal_layout(fields)[1]).iterator(chunk_size=chunk_size)
+        while batch := [row_type._make(values) for values in islice(rows, chunk_size)]:
+            yield batch
+
+
+def ndjson_chunks(deals, fields=None):
+    """Un deal per riga, nello stesso formato JSON di DealSerializer, un blocco di righe per volta"""
+    renderer = FastJSONRenderer()
+    for batch in row_batches(deals, fields):
+        yield b''.join(renderer.render(item) + b'\n' for item in deal_data(batch))
+
+
+def csv_chunks(deals, fields=None):
+    """Intestazione con i nomi dei campi e un deal per riga; i NULL diventano celle vuote"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(deal_layout(fields)[0])
+    yield buffer.getvalue().encode()
+    for batch in row_batches(deals, fields):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(item.values() for item in deal_data(batch))
+        yield buffer.getvalue().encode()
+
+
+def export_chunks(deals, export_format, fields=None):
+    if export_format == 'csv':
+        return csv_chunks(deals, fields)
+    return ndjson_chunks(deals, fields)
+
+
+async def aiter_chunks(chunks):
+    """
+    Blocchi di export_chunks per StreamingHttpResponse sotto ASGI: con un iteratore sincrono
+    Django li leggerebbe tutti in memoria prima di inviarli. Ogni blocco è letto nel thread
+    della richiesta, lo stesso della transazione e del cursor lato server.
+    """
+    try:
+        while (chunk := await sync_to_async(next)(chunks, None)) is not None:
+            yield chunk
+    finally:
+        # Client disconnesso: chiude cursor e transazione nel loro thread
+        await sync_to_async(chunks.close)()
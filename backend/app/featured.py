@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.db import connection, transaction
+from .models import Deal, FeaturedDeal, Store
+
+
+def featured_per_store():
+    return getattr(settings, 'FEATURED_DEALS_PER_STORE', 1)
+
+
+def refresh_featured_deals(per_store=None):
+    """
+    Ricalcola i primi per_store deal vivi di ogni store, in ordine di inserimento,
+    con un'unica INSERT ... SELECT; le letture concorrenti vedono la vecchia tabella
+    fino al commit. Restituisce il numero di deal in evidenza.
+    """
+    per_store = featured_per_store() if per_store is None else per_store
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FeaturedDeal._meta.db_table}')
+        cursor.execute(
+            f'INSERT INTO {FeaturedDeal._meta.db_table} '
+            '(deal_id, store_id, rank, title, store_name, sale_price, normal_price, thumb) '
+            'SELECT deal_id, store_id, rank, title, store_name, sale_price, normal_price, thumb FROM ('
+            '  SELECT d.deal_id, d.store_id, d.title, s.store_name, d.sale_price, d.normal_price, d.thumb,'
+            '    row_number() OVER (PARTITION BY d.store_id ORDER BY d.created_at, d.deal_id) AS rank'
+            f'  FROM {Deal._meta.db_table} d JOIN {Store._meta.db_table} s ON s.store_id = d.store_id'
+            '  WHERE d.expired_at IS NULL'
+            ') ranked WHERE rank <= %s',
+            [per_store]
+        )
+        return cursor.rowcount
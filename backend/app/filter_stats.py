@@ -0,0 +1,68 @@
+from decimal import Decimal
+from django.conf import settings
+from django.db import connection
+from .models import Deal, Store
+
+
+MAX_PRICE_BUCKETS = 50
+
+
+def price_buckets():
+    return getattr(settings, 'FILTERS_PRICE_BUCKETS', 10)
+
+
+def filters_summary(buckets=None):
+    """
+    Dati per i filtri della homepage calcolati in Postgres con un'unica query sui deal vivi:
+    store con il numero di deal, prezzo minimo e massimo e un istogramma dei prezzi in
+    buckets intervalli uguali (width_bucket). La dimensione non dipende da quanti deal ci sono.
+    """
+    buckets = price_buckets() if buckets is None else buckets
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'WITH live AS ('
+            f'  SELECT store_id, sale_price FROM {Deal._meta.db_table} WHERE expired_at IS NULL'
+            '), bounds AS ('
+            '  SELECT min(sale_price) AS low, max(sale_price) AS high FROM live'
+            ') '
+            'SELECT bounds.low, bounds.high,'
+            '  (SELECT coalesce(json_agg(json_build_object('
+            "     'store_id', s.store_id, 'store_name', s.store_name, 'count', per_store.count"
+            '   ) ORDER BY s.store_name), \'[]\'::json)'
+            '   FROM (SELECT store_id, count(*) AS count FROM live GROUP BY store_id) per_store'
+            f'   JOIN {Store._meta.db_table} s ON s.store_id = per_store.store_id),'
+            '  (SELECT coalesce(json_object_agg(bucket, count), \'{}\'::json) FROM ('
+            # width_bucket mette il massimo nel bucket buckets + 1: va nell'ultimo
+            '     SELECT CASE WHEN bounds.high > bounds.low'
+            '       THEN least(width_bucket(sale_price, bounds.low, bounds.high, %s), %s) ELSE 1 END AS bucket,'
+            '       count(*) AS count'
+            '     FROM live GROUP BY bucket'
+            '   ) histogram) '
+            'FROM bounds',
+            [buckets, buckets]
+        )
+        low, high, stores, counts = cursor.fetchone()
+
+    return {
+        'stores': stores,
+        'min_price': low,
+        'max_price': high,
+        'price_histogram': histogram(low, high, buckets, counts),
+    }
+
+
+def histogram(low, high, buckets, counts):
+    """Intervalli [min, max) dell'istogramma, anche quelli vuoti; l'ultimo include il massimo"""
+    if low is None:
+        return []
+    if high == low:
+        return [{'min': low, 'max': high, 'count': counts.get('1', 0)}]
+    width = (high - low) / buckets
+    return [
+        {
+            'min': (low + width * i).quantize(Decimal('0.01')),
+            'max': high if i == buckets - 1 else (low + width * (i + 1)).quantize(Decimal('0.01')),
+            'count': counts.get(str(i + 1), 0),
+        }
+        for i in range(buckets)
+    ]
@@ -0,0 +1,338 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import codecs
+import json
+import math
+from datetime import datetime
+from decimal import Decimal
+from django.db import connection, transaction
+from django.utils import timezone
+from .metrics import IngestionMetrics
+from .models import Store, Deal, DealPriceSnapshot
+from .price_history import record_price_snapshots
+
+
+# Campi riscritti quando un deal esiste già; created_at resta quello del primo inserimento
+DEAL_UPDATE_FIELDS = [
+    'thumb', 'title', 'store', 'store_name', 'steam_app_id', 'steam_rating_text',
+    'sale_price', 'normal_price', 'deal_rating', 'metacritic_score',
+    'release_date', 'last_change', 'last_seen_run', 'expired_at', 'updated_at',
+]
+
+
+def parse_timestamp(value):
+    """Converte un timestamp unix di CheapShark in datetime, '0' o vuoto diventano None"""
+    if not value or value == '0':
+        return None
+    try:
+        return datetime.fromtimestamp(int(value), tz=timezone.get_current_timezone())
+    except (ValueError, TypeError):
+        return None
+
+
+def iter_json_array(chunks):
+    """
+    Legge in modo incrementale un array JSON ricevuto a pezzi (bytes o str) e
+    restituisce un elemento alla volta, senza mai tenere in memoria l'intero
+    documento ma solo il pezzo corrente e l'elemento in corso di lettura.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    started = False
+
+    for chunk in chunks:
+        buffer += utf8.decode(chunk) if isinstance(chunk, bytes) else chunk
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                if buffer[pos] == ',' and not started:
+                    raise ValueError('Expected a JSON array')
+                pos += 1
+            if pos == len(buffer):
+                break
+            if not started:
+                if buffer[pos] != '[':
+                    raise ValueError('Expected a JSON array')
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == ']':
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Elemento incompleto: serve il pezzo successivo
+                break
+            if end == len(buffer) and not isinstance(item, (dict, list)):
+                # Un numero a fine pezzo potrebbe continuare nel successivo
+                break
+            yield item
+            pos = end
+        buffer = buffer[pos:]
+
+    raise ValueError('Truncated JSON array')
+
+
+def iter_response_array(response, chunk_size=64 * 1024):
+    """Elementi dell'array JSON di una risposta HTTP in streaming, chiusa a fine lettura"""
+    try:
+        yield from iter_json_array(response.iter_content(chunk_size=chunk_size))
+    finally:
+        response.close()
+
+
+def max_age_hours(synced_at, now=None):
+    """
+    Ore trascorse dall'ultima sincronizzazione, da passare come maxAge a CheapShark;
+    arrotonda per eccesso e aggiunge un'ora di margine per non perdere deal al confine
+    """
+    if synced_at is None:
+        return None
+    elapsed = ((now or timezone.now()) - synced_at).total_seconds()
+    return max(1, math.ceil(elapsed / 3600)) + 1
+
+
+def resolve_stores(store_ids):
+    """
+    Restituisce un dizionario store_id -> Store, creando con un'unica query
+    gli store che non esistono ancora
+    """
+    store_ids = set(store_ids)
+    stores = Store.objects.in_bulk(store_ids)
+    missing = [
+        Store(store_id=store_id, store_name=f'Store {store_id}', is_active=True)
+        for store_id in store_ids if store_id not in stores
+    ]
+    if missing:
+        Store.objects.bulk_create(missing, ignore_conflicts=True)
+        stores = Store.objects.in_bulk(store_ids)
+    return stores
+
+
+def sync_deal_store_names():
+    """
+    Riallinea la copia del nome dello store nei deal dopo la sincronizzazione degli store:
+    un deal non ricevuto di nuovo terrebbe il nome vecchio, o quello provvisorio di
+    resolve_stores. Aggiorna solo le righe diverse e restituisce quante sono.
+    """
+    max_length = Deal._meta.get_field('store_name').max_length
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {Deal._meta.db_table} d SET store_name = left(s.store_name, %s), updated_at = now() '
+            f'FROM {Store._meta.db_table} s '
+            'WHERE d.store_id = s.store_id AND d.store_name IS DISTINCT FROM left(s.store_name, %s)',
+            [max_length, max_length]
+        )
+        return cursor.rowcount
+
+
+def build_deal(deal_data, store, run_id=None):
+    """Costruisce un'istanza Deal (non salvata) a partire da un deal di CheapShark"""
+    return Deal(
+        deal_id=deal_data['dealID'],
+        thumb=deal_data.get('thumb', ''),
+        title=deal_data.get('title', ''),
+        store=store,
+        store_name=store.store_name,
+        steam_app_id=deal_data.get('steamAppID'),
+        steam_rating_text=deal_data.get('steamRatingText'),
+        sale_price=Decimal(str(deal_data.get('salePrice', 0))),
+        normal_price=Decimal(str(deal_data.get('normalPrice', 0))),
+        deal_rating=Decimal(str(deal_data.get('dealRating', 0))),
+        metacritic_score=int(deal_data['metacriticScore']) if deal_data.get('metacriticScore') else None,
+        release_date=parse_timestamp(deal_data.get('releaseDate')),
+        last_change=parse_timestamp(deal_data.get('lastChange')),
+        last_seen_run=run_id,
+    )
+
+
+def deal_changed(deal, stored):
+    """Confronta un deal ricevuto con (last_change, sale_price, normal_price) salvati"""
+    return (deal.last_change, deal.sale_price, deal.normal_price) != stored
+
+
+def price_changed(deal, stored):
+    return (deal.sale_price, deal.normal_price) != stored[1:]
+
+
+class DealBatchWriter:
+    """
+    Accumula i deal ricevuti da CheapShark e li scrive a blocchi con un upsert
+    set-based (INSERT ... ON CONFLICT DO UPDATE), una transazione per blocco.
+    I deal con lastChange e prezzi uguali a quelli salvati non vengono riscritti,
+    così le righe invariate non generano nuove tuple nella tabella deals.
+    Per i deal nuovi o con un prezzo diverso viene aggiunto uno snapshot allo storico prezzi.
+    Il tempo di decodifica dei deal e quello di scrittura vanno nelle fasi
+    'parse' e 'db_write' di metrics.
+    Con run_id ogni deal ricevuto, anche se invariato, viene marcato con l'id
+    dell'esecuzione, così expire_unseen_deals trova quelli non più elencati.
+    """
+
+    def __init__(self, batch_size=500, stores=None, log=None, warn=None, metrics=None, run_id=None):
+        self.batch_size = batch_size
+        self.run_id = run_id
+        self.stores = dict(stores or {})
+        self.log = log or (lambda message: None)
+        self.warn = warn or self.log
+        self.metrics = metrics or IngestionMetrics()
+        self.pending = []
+        self.batches = 0
+        self.created_count = 0
+        self.updated_count = 0
+        self.skipped_count = 0
+        self.snapshots_count = 0
+        self.invalid_count = 0
+        self.errors = 0
+
+    def add(self, deal_data):
+        with self.metrics.phase('parse'):
+            try:
+                store_id = int(deal_data['storeID'])
+                if store_id not in self.stores:
+                    self.stores.update(resolve_stores([store_id]))
+                self.pending.append(build_deal(deal_data, self.stores[store_id], self.run_id))
+            except Exception as e:
+                self.invalid_count += 1
+                self.warn(f'Error processing deal {deal_data.get("dealID", "unknown")}: {str(e)}')
+                return
+
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def extend(self, deals_data):
+        # In streaming la decodifica del JSON avviene mentre si scorre la pagina
+        deals_data = iter(deals_data)
+        while True:
+            with self.metrics.phase('parse'):
+                deal_data = next(deals_data, None)
+            if deal_data is None:
+                return
+            self.add(deal_data)
+
+    def flush(self):
+        if not self.pending:
+            return
+        with self.metrics.phase('db_write'):
+            self.write_batch()
+
+    def write_batch(self):
+        deals, self.pending = self.pending, []
+        self.batches += 1
+
+        # Se lo stesso deal compare più volte nel blocco vince l'ultima occorrenza,
+        # altrimenti ON CONFLICT non può aggiornare due volte la stessa riga
+        unique_deals = list({deal.deal_id: deal for deal in deals}.values())
+
+        try:
+            with transaction.atomic():
+                stored = {}
+                expired = set()
+                for deal_id, last_change, sale_price, normal_price, expired_at in Deal.objects.filter(
+                    deal_id__in=[deal.deal_id for deal in unique_deals]
+                ).values_list('deal_id', 'last_change', 'sale_price', 'normal_price', 'expired_at'):
+                    stored[deal_id] = (last_change, sale_price, normal_price)
+                    if expired_at is not None:
+                        expired.add(deal_id)
+                # Un deal scaduto che ricompare viene riscritto, così torna visibile
+                changed = [
+                    deal for deal in unique_deals
+                    if deal.deal_id not in stored or deal.deal_id in expired
+                    or deal_changed(deal, stored[deal.deal_id])
+                ]
+                changed_ids = {deal.deal_id for deal in changed}
+                unchanged_ids = [deal.deal_id for deal in unique_deals if deal.deal_id not in changed_ids]
+                if self.run_id is not None and unchanged_ids:
+                    Deal.objects.filter(deal_id__in=unchanged_ids).exclude(
+                        last_seen_run=self.run_id
+                    ).update(last_seen_run=self.run_id)
+                snapshots = 0
+                if changed:
+                    Deal.objects.bulk_create(
+                        changed,
+                        update_conflicts=True,
+                        unique_fields=['deal_id'],
+                        update_fields=DEAL_UPDATE_FIELDS,
+                    )
+                    now = timezone.now()
+                    snapshots = record_price_snapshots([
+                        DealPriceSnapshot(
+                            deal_id=deal.deal_id,
+                            sale_price=deal.sale_price,
+                            normal_price=deal.normal_price,
+                            captured_at=now,
+                        )
+                        for deal in changed
+                        if deal.deal_id not in stored or price_changed(deal, stored[deal.deal_id])
+                    ])
+        except Exception as e:
+            self.errors += 1
+            self.warn(f'Error writing batch {self.batches}: {str(e)}')
+            return
+
+        # Stesso conteggio del vecchio percorso riga per riga: la prima occorrenza
+        # di un deal nuovo è una creazione, le occorrenze ripetute nel blocco
+        # contano come aggiornamenti
+        created = len(unique_deals) - len(stored)
+        skipped = len(unique_deals) - len(changed)
+        updated = len(deals) - created - skipped
+        self.created_count += created
+        self.updated_count += updated
+        self.skipped_count += skipped
+        self.snapshots_count += snapshots
+        self.log(
+            f'Batch {self.batches}: {len(deals)} deals processed '
+            f'({created} created, {updated} updated, {skipped} skipped)'
+        )
+
+
+def expire_unseen_deals(store_ids, run_id, now=None):
+    """
+    Segna come scaduti i deal vivi degli store indicati che l'esecuzione run_id
+    non ha ricevuto, con un solo UPDATE per store; va chiamata solo per gli store
+    letti per intero e senza maxAge, altrimenti i deal mancanti sono solo invariati
+    """
+    now = now or timezone.now()
+    expired = 0
+    for store_id in store_ids:
+        expired += Deal.objects.live().filter(store_id=store_id).exclude(
+            last_seen_run=run_id
+        ).update(expired_at=now)
+    return expired
+
+
+def fetch_deal_pages(fetch_page, store_ids, max_pages=None, workers=4):
+    """
+    Scarica in parallelo le pagine di deal di più store e le restituisce man mano
+    che arrivano come tuple (store_id, page_number, total_pages, deals).
+
+    fetch_page(store_id, page_number) deve restituire (deals, total_pages): la prima
+    pagina di ogni store indica quante pagine ci sono (X-Total-Page-Count) e solo
+    allora vengono accodate le successive, fino a max_pages se indicato.
+    Le richieste in volo sono al massimo il doppio dei worker, così le pagine già
+    scaricate non si accumulano in memoria se la scrittura su DB è più lenta.
+    """
+    queued = deque((store_id, 0) for store_id in store_ids)
+    in_flight = {}
+    executor = ThreadPoolExecutor(max_workers=workers)
+
+    def submit_queued():
+        while queued and len(in_flight) < workers * 2:
+            store_id, page_number = queued.popleft()
+            future = executor.submit(fetch_page, store_id, page_number)
+            in_flight[future] = (store_id, page_number)
+
+    try:
+        submit_queued()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                store_id, page_number = in_flight.pop(future)
+                deals, total_pages = future.result()
+                if page_number == 0:
+                    last_page = min(total_pages, max_pages) if max_pages else total_pages
+                    queued.extend((store_id, number) for number in range(1, last_page))
+                yield store_id, page_number, total_pages, deals
+            submit_queued()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
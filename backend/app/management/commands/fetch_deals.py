@@ -1,9 +1,28 @@
+import argparse
 import requests
-from datetime import datetime
-from decimal import Decimal
 from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
-from app.models import Store, Deal
+from app.models import Store, IngestionRun
+from app.cheapshark import CheapSharkClient
+from app.featured import refresh_featured_deals
+from app.response_cache import bump_dataset_version
+from app.ingestion import (
+    DealBatchWriter, expire_unseen_deals, fetch_deal_pages, max_age_hours, sync_deal_store_names
+)
+from app.metrics import (
+    IngestionMetrics, rows_per_second, write_json_summary, write_prometheus_textfile
+)
+
+
+# Steam, GOG e Humble Store
+DEFAULT_STORE_IDS = [1, 7, 11]
+
+
+def store_ids_list(value):
+    try:
+        return [int(store_id) for store_id in value.split(',') if store_id.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'Invalid store id list: {value}')
 
 
 class Command(BaseCommand):
@@ -20,32 +39,214 @@ class Command(BaseCommand):
             action='store_true',
             help='Fetch only deals data',
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of deals written per bulk upsert transaction',
+        )
+        parser.add_argument(
+            '--stores',
+            type=store_ids_list,
+            default=DEFAULT_STORE_IDS,
+            help='Comma separated CheapShark store ids to fetch deals for (default: 1,7,11)',
+        )
+        parser.add_argument(
+            '--page-size',
+            type=int,
+            default=60,
+            help='Deals per page requested to CheapShark (max 60)',
+        )
+        parser.add_argument(
+            '--max-pages',
+            type=int,
+            default=None,
+            help='Maximum number of pages fetched per store (default: every page)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Number of pages fetched concurrently',
+        )
+        parser.add_argument(
+            '--rps',
+            type=float,
+            default=None,
+            help='Global cap of requests per second to CheapShark (0 disables it)',
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Ignore the per-store sync watermark and fetch every deal',
+        )
+        parser.add_argument(
+            '--stream',
+            action='store_true',
+            help='Parse deal pages incrementally instead of loading each response in memory',
+        )
+        recording = parser.add_mutually_exclusive_group()
+        recording.add_argument(
+            '--record',
+            metavar='DIR',
+            help='Save every CheapShark response, compressed and with its headers, in DIR (implies --full)',
+        )
+        recording.add_argument(
+            '--replay',
+            metavar='DIR',
+            help='Serve CheapShark responses from a --record directory instead of the network (implies --full)',
+        )
+        parser.add_argument(
+            '--replay-latency',
+            action='store_true',
+            help='With --replay, wait the recorded latency of every response',
+        )
+        parser.add_argument(
+            '--metrics-json',
+            metavar='PATH',
+            help='Write the timings and counters of the run as JSON to PATH',
+        )
+        parser.add_argument(
+            '--prometheus-textfile',
+            metavar='PATH',
+            help='Write the metrics of the run to PATH for the node_exporter textfile collector',
+        )
     
     def handle(self, *args, **options):
+        self.run_fetch(options)
+    
+    def run_fetch(self, options, should_stop=None):
+        """
+        Esegue un fetch completo con le opzioni del comando; usato anche da
+        run_fetcher, che passa should_stop per interrompere il fetch tra un blocco e l'altro.
+        Tempi e contatori dell'esecuzione vengono salvati in un IngestionRun.
+        """
+        self.metrics = IngestionMetrics()
+        self.writer = None
+        self.pages_count = 0
+        self.expired_count = 0
+        self.interrupted = False
+        self.ingestion_run = IngestionRun.objects.create(options={
+            key: options[key] for key in (
+                'stores', 'stores_only', 'deals_only', 'full', 'stream', 'workers',
+                'batch_size', 'page_size', 'max_pages', 'rps', 'record', 'replay',
+            )
+        })
+        
+        client_options = {
+            'pool_size': options['workers'],
+            'record_dir': options['record'],
+            'replay_dir': options['replay'],
+            'replay_latency': options['replay_latency'],
+        }
+        if options['rps'] is not None:
+            client_options['requests_per_second'] = options['rps']
+        self.client = CheapSharkClient(**client_options)
+        
+        deals_options = {
+            'store_ids': options['stores'],
+            'page_size': options['page_size'],
+            'max_pages': options['max_pages'],
+            'workers': options['workers'],
+            'batch_size': options['batch_size'],
+            # maxAge dipende dall'ora di esecuzione: registrazioni e replay leggono
+            # sempre tutto il catalogo, così gli URL coincidono
+            'full': options['full'] or bool(options['record'] or options['replay']),
+            'stream': options['stream'],
+            'should_stop': should_stop,
+        }
+        
         try:
             if options['deals_only']:
-                self.fetch_deals()
+                self.fetch_deals(**deals_options)
             elif options['stores_only']:
                 self.fetch_stores()
+                # I deal in evidenza copiano il nome dello store
+                self.refresh_featured()
             else:
                 # Fetch both stores and deals
                 self.fetch_stores()
-                self.fetch_deals()
+                self.fetch_deals(**deals_options)
             
             self.stdout.write(
                 self.style.SUCCESS('Successfully completed data fetch')
             )
         
         except Exception as e:
+            self.finish_run(IngestionRun.STATUS_FAILED, str(e), options)
             raise CommandError(f'Error during data fetch: {str(e)}')
+        else:
+            status = IngestionRun.STATUS_INTERRUPTED if self.interrupted else IngestionRun.STATUS_SUCCESS
+            self.finish_run(status, '', options)
+        finally:
+            self.stdout.write(f'HTTP: {self.client.latency_summary()}')
+    
+    def finish_run(self, status, error_message, options):
+        """Completa l'IngestionRun dell'esecuzione e scrive i riepiloghi richiesti"""
+        self.metrics.stop()
+        # Anche un'esecuzione fallita può aver scritto dei blocchi: le risposte in cache
+        # della versione precedente non valgono più
+        bump_dataset_version()
+        writer = self.writer
+        run = self.ingestion_run
+        run.status = status
+        run.error_message = error_message
+        run.finished_at = timezone.now()
+        run.duration_seconds = self.metrics.duration
+        run.stores_seconds = self.metrics.phases['stores']
+        run.deal_fetch_seconds = self.metrics.phases['deal_fetch']
+        run.parse_seconds = self.metrics.phases['parse']
+        run.db_write_seconds = self.metrics.phases['db_write']
+        run.pages = self.pages_count
+        run.http_requests = len(self.client.stats)
+        run.http_retries = sum(1 for stat in self.client.stats if stat.attempt > 0)
+        if writer:
+            run.created_count = writer.created_count
+            run.updated_count = writer.updated_count
+            run.skipped_count = writer.skipped_count
+            run.snapshots_count = writer.snapshots_count
+            run.invalid_count = writer.invalid_count
+            run.batch_errors = writer.errors
+        run.expired_count = self.expired_count
+        run.rows_per_second = rows_per_second(run.deals_processed, run.duration_seconds)
+        run.peak_memory_kb = self.metrics.peak_memory_kb
+        
+        self.stdout.write(
+            f'Phases: stores {run.stores_seconds:.2f}s, deal fetch {run.deal_fetch_seconds:.2f}s, '
+            f'parse {run.parse_seconds:.2f}s, db write {run.db_write_seconds:.2f}s; '
+            f'{run.rows_per_second:.0f} deals/s, peak memory {run.peak_memory_kb // 1024} MB, '
+            f'{run.errors} errors'
+        )
+        
+        # Le metriche non devono mai nascondere l'esito del fetch
+        try:
+            run.save()
+            summary = run.summary()
+            if options['metrics_json']:
+                write_json_summary(options['metrics_json'], summary)
+            if options['prometheus_textfile']:
+                write_prometheus_textfile(options['prometheus_textfile'], summary)
+        except Exception as e:
+            self.stderr.write(f'Error saving ingestion metrics: {str(e)}')
+    
+    def refresh_featured(self):
+        with self.metrics.phase('db_write'):
+            featured_count = refresh_featured_deals()
+        self.stdout.write(f'Featured deals: {featured_count} deals selected for the homepage')
     
     def fetch_stores(self):
         """Fetch stores data from CheapShark API"""
         self.stdout.write('Fetching stores data...')
         
+        with self.metrics.phase('stores'):
+            self.sync_stores()
+    
+    def sync_stores(self):
         try:
-            response = requests.get('https://www.cheapshark.com/api/1.0/stores')
-            response.raise_for_status()
+            response = self.client.stores()
+            if response is None:
+                self.stdout.write('Stores list not modified since last fetch, skipping')
+                return
             stores_data = response.json()
             
             created_count = 0
@@ -70,6 +271,13 @@ class Command(BaseCommand):
                     updated_count += 1
                     self.stdout.write(f'Updated store: {store.store_name}')
             
+            renamed = sync_deal_store_names()
+            if renamed:
+                self.stdout.write(f'Store name updated on {renamed} deals')
+            
+            # Il validatore si salva solo a lista elaborata con successo
+            self.client.remember_validators('stores', response)
+            
             self.stdout.write(
                 self.style.SUCCESS(
                     f'Stores fetch completed: {created_count} created, {updated_count} updated'
@@ -81,95 +289,102 @@ class Command(BaseCommand):
         except Exception as e:
             raise CommandError(f'Error processing stores data: {str(e)}')
     
-    def fetch_deals(self):
-        
-        ids = '1,7,11'
-        dealsNum = 16
+    def fetch_deals(self, store_ids=DEFAULT_STORE_IDS, page_size=60, max_pages=None,
+                    workers=4, batch_size=500, full=False, stream=False, should_stop=None):
 
         # Fetch deals data from CheapShark API
-        self.stdout.write(f'Fetching deals data for stores Steam(id 1), GOG(id 7), Humble Store(id 11)....')
-        
+        self.stdout.write(
+            f'Fetching deals data for stores {", ".join(str(store_id) for store_id in store_ids)} '
+            f'(page size {page_size}, max pages {max_pages or "all"})....'
+        )
         
         try:
-            url = f'https://www.cheapshark.com/api/1.0/deals?storeID={ids}&pageSize={dealsNum}'
-            response = requests.get(url)
-            response.raise_for_status()
-            deals_data = response.json()
+            started_at = timezone.now()
             
-            created_count = 0
-            updated_count = 0
+            # Gli store vengono letti una volta sola, non per ogni deal; quelli
+            # mancanti sono creati dal writer la prima volta che compaiono
+            stores = Store.objects.in_bulk(store_ids)
+            max_ages = {}
+            if not full:
+                for store in stores.values():
+                    max_ages[store.store_id] = max_age_hours(store.deals_synced_at, started_at)
+                    if max_ages[store.store_id]:
+                        self.stdout.write(
+                            f'Store {store.store_id}: incremental sync of deals changed '
+                            f'in the last {max_ages[store.store_id]} hours'
+                        )
             
-            for deal_data in deals_data:
-                try:
-                    # Assicuriamoci che lo store esista
-                    store_obj, _ = Store.objects.get_or_create(
-                        store_id=int(deal_data['storeID']),
-                        defaults={
-                            'store_name': f"Store {deal_data['storeID']}",
-                            'is_active': True,
-                            'images': {}
-                        }
-                    )
-                    
-                    # Prepara i dati per il deal
-                    release_date = None
-                    if deal_data.get('releaseDate') and deal_data['releaseDate'] != '0':
-                        try:
-                            release_date = datetime.fromtimestamp(
-                                int(deal_data['releaseDate']), tz=timezone.get_current_timezone()
-                            )
-                        except (ValueError, TypeError):
-                            pass
-                    
-                    last_change = None
-                    if deal_data.get('lastChange') and deal_data['lastChange'] != '0':
-                        try:
-                            last_change = datetime.fromtimestamp(
-                                int(deal_data['lastChange']), tz=timezone.get_current_timezone()
-                            )
-                        except (ValueError, TypeError):
-                            pass
-                    
-                    defaults = {
-                        'thumb': deal_data.get('thumb', ''),
-                        'title': deal_data.get('title', ''),
-                        'store': store_obj,
-                        'store_name': store_obj.store_name,
-                        'steam_app_id': deal_data.get('steamAppID'),
-                        'steam_rating_text': deal_data.get('steamRatingText'),
-                        'sale_price': Decimal(str(deal_data.get('salePrice', 0))),
-                        'normal_price': Decimal(str(deal_data.get('normalPrice', 0))),
-                        'deal_rating': Decimal(str(deal_data.get('dealRating', 0))),
-                        'metacritic_score': int(deal_data['metacriticScore']) if deal_data.get('metacriticScore') else None,
-                        'release_date': release_date,
-                        'last_change': last_change,
-                    }
-                    
-                    deal, created = Deal.objects.update_or_create(
-                        deal_id=deal_data['dealID'],
-                        defaults=defaults
-                    )
-                    
-                    if created:
-                        created_count += 1
-                        self.stdout.write(f'Created deal: {deal.title}')
-                    else:
-                        updated_count += 1
-                        self.stdout.write(f'Updated deal: {deal.title}')
+            def fetch_page(store_id, page_number):
+                return self.client.deals_page(
+                    store_id, page_number, page_size,
+                    max_age=max_ages.get(store_id), stream=stream
+                )
+            
+            self.writer = writer = DealBatchWriter(
+                batch_size=batch_size,
+                stores=stores,
+                log=self.stdout.write,
+                warn=lambda message: self.stdout.write(self.style.WARNING(message)),
+                metrics=self.metrics,
+                run_id=self.ingestion_run.pk,
+            )
+            
+            store_pages = {}
+            store_total_pages = {}
+            pages = fetch_deal_pages(fetch_page, store_ids, max_pages=max_pages, workers=workers)
+            try:
+                while True:
+                    # Il tempo passato ad aspettare la pagina successiva è quello di rete
+                    with self.metrics.phase('deal_fetch'):
+                        page = next(pages, None)
+                    if page is None:
+                        break
+                    store_id, page_number, total_pages, deals_data = page
+                    self.pages_count += 1
+                    store_pages[store_id] = store_pages.get(store_id, 0) + 1
+                    store_total_pages[store_id] = total_pages
+                    writer.extend(deals_data)
+                    if should_stop and should_stop():
+                        # Le pagine in coda vengono annullate, il blocco in corso viene comunque scritto
+                        self.stdout.write(self.style.WARNING('Stop requested, interrupting deals fetch'))
+                        self.interrupted = True
+                        break
+            finally:
+                pages.close()
+            writer.flush()
+            
+            # Il watermark avanza solo per gli store letti fino all'ultima pagina e
+            # solo se tutti i blocchi sono stati scritti, altrimenti la prossima
+            # esecuzione perderebbe i deal non salvati
+            if not writer.errors:
+                synced = [
+                    store_id for store_id, total_pages in store_total_pages.items()
+                    if store_pages[store_id] >= total_pages
+                ]
+                Store.objects.filter(store_id__in=synced).update(deals_synced_at=started_at)
                 
-                except Exception as e:
-                    self.stdout.write(
-                        self.style.WARNING(f'Error processing deal {deal_data.get("dealID", "unknown")}: {str(e)}')
+                # Solo una lettura completa senza maxAge elenca tutti i deal dello store:
+                # quelli che non ha ricevuto non sono più in offerta
+                with self.metrics.phase('db_write'):
+                    self.expired_count = expire_unseen_deals(
+                        [store_id for store_id in synced if not max_ages.get(store_id)],
+                        self.ingestion_run.pk
                     )
-                    continue
             
             self.stdout.write(
                 self.style.SUCCESS(
-                    f'Deals fetch completed: {created_count} created, {updated_count} updated'
+                    f'Deals fetch completed: {writer.created_count} created, '
+                    f'{writer.updated_count} updated, {writer.skipped_count} skipped '
+                    f'from {self.pages_count} pages'
                 )
             )
+            self.stdout.write(f'Price history: {writer.snapshots_count} price changes recorded')
+            self.stdout.write(f'Expired deals: {self.expired_count} no longer listed by CheapShark')
+            
+            # I deal in evidenza per la homepage si ricalcolano una volta per sincronizzazione
+            self.refresh_featured()
             
         except requests.RequestException as e:
             raise CommandError(f'Error fetching deals: {str(e)}')
         except Exception as e:
-            raise CommandError(f'Error processing deals data: {str(e)}')
\ No newline at end of file
+            raise CommandError(f'Error processing deals data: {str(e)}')
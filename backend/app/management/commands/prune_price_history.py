@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from app.price_history import add_months, drop_partitions_before, month_start
+
+
+class Command(BaseCommand):
+    help = 'Drop the monthly partitions of the deal price history older than the retention'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-months',
+            type=int,
+            default=12,
+            help='Number of months of price history to keep, current month included',
+        )
+    
+    def handle(self, *args, **options):
+        if options['keep_months'] < 1:
+            raise CommandError('--keep-months must be at least 1')
+        
+        cutoff = add_months(month_start(timezone.now()), 1 - options['keep_months'])
+        dropped = drop_partitions_before(cutoff)
+        
+        for name in dropped:
+            self.stdout.write(f'Dropped partition: {name}')
+        self.stdout.write(
+            self.style.SUCCESS(f'Price history pruned: {len(dropped)} partitions older than {cutoff:%Y-%m} dropped')
+        )
@@ -0,0 +1,66 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from app.models import Deal
+
+
+class Command(BaseCommand):
+    help = 'Delete the deals expired for longer than the retention, in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days',
+            type=int,
+            default=30,
+            help='Delete deals expired more than this many days ago',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of deals deleted per transaction',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0,
+            help='Seconds to wait between two batches, to leave room to the other queries',
+        )
+
+    def handle(self, *args, **options):
+        if options['older_than_days'] < 0:
+            raise CommandError('--older-than-days must not be negative')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        cutoff = timezone.now() - timedelta(days=options['older_than_days'])
+        expired = Deal.objects.filter(expired_at__lt=cutoff).order_by()
+
+        deleted = 0
+        batches = 0
+        while True:
+            # Ogni blocco è una transazione breve: i lock sulle righe eliminate
+            # durano solo il tempo di un DELETE di batch_size righe
+            with transaction.atomic():
+                deal_ids = list(
+                    expired.select_for_update(skip_locked=True).values_list('deal_id', flat=True)[:options['batch_size']]
+                )
+                if not deal_ids:
+                    break
+                Deal.objects.filter(deal_id__in=deal_ids).delete()
+
+            batches += 1
+            deleted += len(deal_ids)
+            self.stdout.write(f'Batch {batches}: {len(deal_ids)} expired deals deleted')
+            if len(deal_ids) < options['batch_size']:
+                break
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Expired deals purged: {deleted} deals expired before {cutoff:%Y-%m-%d %H:%M} deleted'
+            )
+        )
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from app.featured import featured_per_store, refresh_featured_deals
+from app.response_cache import bump_dataset_version
+
+
+class Command(BaseCommand):
+    help = 'Recompute the featured deals per store shown to anonymous users'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--per-store',
+            type=int,
+            default=None,
+            help='Number of featured deals per store (default: FEATURED_DEALS_PER_STORE setting)',
+        )
+    
+    def handle(self, *args, **options):
+        per_store = options['per_store'] if options['per_store'] is not None else featured_per_store()
+        if per_store < 1:
+            raise CommandError('--per-store must be at least 1')
+        
+        count = refresh_featured_deals(per_store)
+        bump_dataset_version()
+        self.stdout.write(self.style.SUCCESS(f'Featured deals refreshed: {count} deals, up to {per_store} per store'))
@@ -0,0 +1,112 @@
+import random
+import signal
+import threading
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from app.management.commands import fetch_deals
+
+
+# Chiave dell'advisory lock Postgres (namespace 'DF', lock del fetcher): una sola
+# replica alla volta la ottiene e fa da leader finché la sua connessione resta aperta
+LOCK_NAMESPACE = 0x4446
+LOCK_ID = 1
+
+
+class Command(BaseCommand):
+    help = 'Run the CheapShark fetcher in a loop, on a single leader replica'
+
+    def add_arguments(self, parser):
+        # Stesse opzioni di fetch_deals, passate a ogni iterazione
+        fetch_deals.Command.add_arguments(self, parser)
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=3600,
+            help='Seconds between two fetches',
+        )
+        parser.add_argument(
+            '--jitter',
+            type=int,
+            default=300,
+            help='Random seconds added or removed from each interval',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run a single iteration and exit',
+        )
+
+    def handle(self, *args, **options):
+        self.stop_event = threading.Event()
+        self.is_leader = False
+        previous_handlers = self.install_signal_handlers()
+
+        try:
+            while not self.stop_event.is_set():
+                self.run_iteration(options)
+                if options['once']:
+                    break
+
+                delay = max(0, options['interval'] + random.uniform(-options['jitter'], options['jitter']))
+                self.stdout.write(f'Next fetch in {delay:.0f} seconds')
+                self.stop_event.wait(delay)
+        finally:
+            self.release_lock()
+            for signum, handler in previous_handlers.items():
+                signal.signal(signum, handler)
+
+        self.stdout.write(self.style.SUCCESS('Fetcher stopped'))
+
+    def install_signal_handlers(self):
+        def request_stop(signum, frame):
+            self.stdout.write(self.style.WARNING(f'Received signal {signum}, stopping after the current batch'))
+            self.stop_event.set()
+
+        # I segnali si possono gestire solo dal thread principale
+        previous_handlers = {}
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                previous_handlers[signum] = signal.signal(signum, request_stop)
+        return previous_handlers
+
+    def run_iteration(self, options):
+        if not self.acquire_lock():
+            self.stdout.write('Another replica holds the fetcher lock, standing by')
+            return
+
+        command = fetch_deals.Command(stdout=self.stdout, stderr=self.stderr)
+        try:
+            command.run_fetch(options, should_stop=self.stop_event.is_set)
+        except CommandError as e:
+            # Un fetch fallito non ferma il demone, si riprova al giro successivo
+            self.stderr.write(str(e))
+
+    def acquire_lock(self):
+        """
+        Prova a diventare leader con pg_try_advisory_lock; se lo è già verifica di
+        avere ancora il lock, che si perde se la connessione a Postgres cade
+        """
+        if connection.vendor != 'postgresql':
+            return True
+
+        with connection.cursor() as cursor:
+            if self.is_leader:
+                cursor.execute(
+                    "SELECT EXISTS (SELECT 1 FROM pg_locks WHERE locktype = 'advisory' "
+                    "AND pid = pg_backend_pid() AND classid = %s AND objid = %s AND objsubid = 2 AND granted)",
+                    [LOCK_NAMESPACE, LOCK_ID]
+                )
+                self.is_leader = cursor.fetchone()[0]
+            if not self.is_leader:
+                cursor.execute('SELECT pg_try_advisory_lock(%s, %s)', [LOCK_NAMESPACE, LOCK_ID])
+                self.is_leader = cursor.fetchone()[0]
+                if self.is_leader:
+                    self.stdout.write('Acquired fetcher lock, this replica is now the leader')
+        return self.is_leader
+
+    def release_lock(self):
+        if not self.is_leader or connection.vendor != 'postgresql':
+            return
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_unlock(%s, %s)', [LOCK_NAMESPACE, LOCK_ID])
+        self.is_leader = False
@@ -0,0 +1,142 @@
+import json
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+# Fasi misurate di una sincronizzazione, nell'ordine in cui compaiono nei riepiloghi
+PHASES = ('stores', 'deal_fetch', 'parse', 'db_write')
+
+
+class IngestionMetrics:
+    """
+    Tempi per fase e contatori di una sincronizzazione con CheapShark.
+    Le fasi si misurano con il context manager phase(); le durate di più
+    intervalli della stessa fase si sommano.
+    peak_memory_kb è il picco della memoria residente del processo durante questa
+    sincronizzazione: su Linux il picco si azzera all'inizio di ogni esecuzione, quindi
+    sotto run_fetcher ogni esecuzione riparte da zero. Leggerlo non costa nulla durante
+    la sincronizzazione, a differenza di tracemalloc che rallenterebbe le fasi misurate.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.finished = None
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.peak_memory_kb = 0
+        reset_peak_rss()
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] += time.perf_counter() - start
+
+    def stop(self):
+        if self.finished is None:
+            self.finished = time.perf_counter()
+            self.peak_memory_kb = peak_rss_kb()
+
+    @property
+    def duration(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+
+def reset_peak_rss():
+    """Azzera il picco della memoria residente del processo (VmHWM, solo Linux); False se non si può"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        return False
+    return True
+
+
+def peak_rss_kb():
+    """
+    Picco della memoria residente del processo in kB: VmHWM su Linux, altrimenti ru_maxrss,
+    che non si può azzerare ed è il massimo dall'avvio del processo
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS lo riporta in byte, Linux in kB
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def rows_per_second(rows, seconds):
+    return rows / seconds if seconds > 0 else 0.0
+
+
+def write_json_summary(path, summary):
+    with open(path, 'w') as f:
+        json.dump(summary, f, indent=2, default=str)
+        f.write('\n')
+
+
+def prometheus_metrics(summary):
+    """
+    Righe in formato testuale Prometheus per il textfile collector di node_exporter;
+    summary è il dizionario restituito da IngestionRun.summary()
+    """
+    lines = [
+        '# HELP dealsfinder_ingestion_phase_seconds Seconds spent in each phase of the last deals fetch.',
+        '# TYPE dealsfinder_ingestion_phase_seconds gauge',
+    ]
+    for phase in PHASES:
+        lines.append(f'dealsfinder_ingestion_phase_seconds{{phase="{phase}"}} {summary["phases"][phase]:.6f}')
+
+    gauges = (
+        ('duration_seconds', 'Total duration of the last deals fetch.', summary['duration_seconds']),
+        ('success', 'Whether the last deals fetch completed successfully.', int(summary['status'] == 'success')),
+        ('last_run_timestamp_seconds', 'Unix time the last deals fetch finished.', summary['finished_at'].timestamp()),
+        ('pages', 'Deal pages read by the last deals fetch.', summary['pages']),
+        ('http_requests', 'HTTP requests made by the last deals fetch.', summary['http_requests']),
+        ('http_retries', 'HTTP retries made by the last deals fetch.', summary['http_retries']),
+        ('rows_per_second', 'Deals processed per second by the last deals fetch.', summary['rows_per_second']),
+        ('peak_memory_bytes', 'Peak resident memory of the process during the last deals fetch.', summary['peak_memory_kb'] * 1024),
+        ('errors', 'Errors (invalid deals and failed batches) in the last deals fetch.', summary['errors']),
+    )
+    for name, help_text, value in gauges:
+        lines.append(f'# HELP dealsfinder_ingestion_{name} {help_text}')
+        lines.append(f'# TYPE dealsfinder_ingestion_{name} gauge')
+        lines.append(f'dealsfinder_ingestion_{name} {value}')
+
+    lines.append('# HELP dealsfinder_ingestion_deals Deals handled by the last deals fetch, by outcome.')
+    lines.append('# TYPE dealsfinder_ingestion_deals gauge')
+    for outcome in ('created', 'updated', 'skipped'):
+        lines.append(f'dealsfinder_ingestion_deals{{outcome="{outcome}"}} {summary[f"{outcome}_count"]}')
+    return '\n'.join(lines) + '\n'
+
+
+def write_prometheus_textfile(path, summary):
+    """
+    Scrive le metriche in un file temporaneo nella stessa cartella e lo rinomina,
+    così node_exporter non legge mai un file scritto a metà
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.dealsfinder-', suffix='.prom.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(prometheus_metrics(summary))
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
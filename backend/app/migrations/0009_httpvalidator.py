@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_alter_deal_steam_rating_text'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HttpValidator',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.CharField(max_length=500, unique=True)),
+                ('etag', models.CharField(blank=True, max_length=255)),
+                ('last_modified', models.CharField(blank=True, max_length=64)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'HTTP Validator',
+                'verbose_name_plural': 'HTTP Validators',
+                'db_table': 'http_validators',
+            },
+        ),
+    ]
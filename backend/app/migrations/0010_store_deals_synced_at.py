@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_httpvalidator'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='store',
+            name='deals_synced_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
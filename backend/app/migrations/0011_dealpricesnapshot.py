@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:01
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+# Django non gestisce le tabelle partizionate: la tabella padre viene creata a mano,
+# partizionata per mese su captured_at. La chiave primaria deve includere la colonna
+# di partizionamento; le partizioni mensili sono create al bisogno da app/price_history.py
+CREATE_PARTITIONED_TABLE = '''
+CREATE TABLE deal_price_snapshots (
+    id bigserial NOT NULL,
+    deal_id varchar(255) NOT NULL,
+    sale_price numeric(10, 2) NOT NULL,
+    normal_price numeric(10, 2) NOT NULL,
+    captured_at timestamp with time zone NOT NULL,
+    PRIMARY KEY (id, captured_at)
+) PARTITION BY RANGE (captured_at);
+CREATE INDEX deal_price_snapshot_deal_idx ON deal_price_snapshots (deal_id, captured_at);
+'''
+
+DROP_PARTITIONED_TABLE = 'DROP TABLE deal_price_snapshots CASCADE;'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_store_deals_synced_at'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(CREATE_PARTITIONED_TABLE, DROP_PARTITIONED_TABLE),
+            ],
+            state_operations=[
+                migrations.CreateModel(
+                    name='DealPriceSnapshot',
+                    fields=[
+                        ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                        ('sale_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                        ('normal_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                        ('captured_at', models.DateTimeField(default=django.utils.timezone.now)),
+                        ('deal', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='price_snapshots', to='app.deal')),
+                    ],
+                    options={
+                        'verbose_name': 'Deal Price Snapshot',
+                        'verbose_name_plural': 'Deal Price Snapshots',
+                        'db_table': 'deal_price_snapshots',
+                        'indexes': [models.Index(fields=['deal', 'captured_at'], name='deal_price_snapshot_deal_idx')],
+                    },
+                ),
+            ],
+        ),
+    ]
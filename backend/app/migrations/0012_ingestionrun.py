@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:07
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_dealpricesnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestionRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('running', 'Running'), ('success', 'Success'), ('interrupted', 'Interrupted'), ('failed', 'Failed')], default='running', max_length=20)),
+                ('options', models.JSONField(blank=True, default=dict)),
+                ('stores_seconds', models.FloatField(default=0)),
+                ('deal_fetch_seconds', models.FloatField(default=0)),
+                ('parse_seconds', models.FloatField(default=0)),
+                ('db_write_seconds', models.FloatField(default=0)),
+                ('duration_seconds', models.FloatField(default=0)),
+                ('pages', models.PositiveIntegerField(default=0)),
+                ('http_requests', models.PositiveIntegerField(default=0)),
+                ('http_retries', models.PositiveIntegerField(default=0)),
+                ('created_count', models.PositiveIntegerField(default=0)),
+                ('updated_count', models.PositiveIntegerField(default=0)),
+                ('skipped_count', models.PositiveIntegerField(default=0)),
+                ('snapshots_count', models.PositiveIntegerField(default=0)),
+                ('invalid_count', models.PositiveIntegerField(default=0)),
+                ('batch_errors', models.PositiveIntegerField(default=0)),
+                ('rows_per_second', models.FloatField(default=0)),
+                ('peak_memory_kb', models.PositiveBigIntegerField(default=0)),
+                ('error_message', models.TextField(blank=True)),
+            ],
+            options={
+                'verbose_name': 'Ingestion Run',
+                'verbose_name_plural': 'Ingestion Runs',
+                'db_table': 'ingestion_runs',
+                'ordering': ['-started_at'],
+            },
+        ),
+    ]
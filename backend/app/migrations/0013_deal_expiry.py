@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0012_ingestionrun'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deal',
+            name='expired_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='deal',
+            name='last_seen_run',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ingestionrun',
+            name='expired_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='deal',
+            index=models.Index(condition=models.Q(('expired_at__isnull', True)), fields=['-deal_rating', 'sale_price'], name='deal_live_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deal',
+            index=models.Index(condition=models.Q(('expired_at__isnull', False)), fields=['expired_at'], name='deal_expired_idx'),
+        ),
+    ]
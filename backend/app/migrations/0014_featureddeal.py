@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_featured_deals(apps, schema_editor):
+    # Stessa selezione di app/featured.py, così gli utenti non autenticati vedono
+    # i deal in evidenza già dal deploy e non solo dopo il prossimo fetch_deals
+    per_store = getattr(settings, 'FEATURED_DEALS_PER_STORE', 1)
+    schema_editor.execute(
+        'INSERT INTO featured_deals '
+        '(deal_id, store_id, rank, title, store_name, sale_price, normal_price, thumb) '
+        'SELECT deal_id, store_id, rank, title, store_name, sale_price, normal_price, thumb FROM ('
+        '  SELECT d.deal_id, d.store_id, d.title, s.store_name, d.sale_price, d.normal_price, d.thumb,'
+        '    row_number() OVER (PARTITION BY d.store_id ORDER BY d.created_at, d.deal_id) AS rank'
+        '  FROM deals d JOIN stores s ON s.store_id = d.store_id'
+        '  WHERE d.expired_at IS NULL'
+        ') ranked WHERE rank <= %s',
+        [per_store]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0013_deal_expiry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeaturedDeal',
+            fields=[
+                ('deal_id', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('store_id', models.IntegerField()),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('title', models.CharField(max_length=500)),
+                ('store_name', models.CharField(max_length=255)),
+                ('sale_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('normal_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('thumb', models.URLField(blank=True)),
+            ],
+            options={
+                'verbose_name': 'Featured Deal',
+                'verbose_name_plural': 'Featured Deals',
+                'db_table': 'featured_deals',
+                'ordering': ['store_id', 'rank'],
+                'indexes': [models.Index(fields=['store_id', 'rank'], name='featured_deal_store_rank_idx')],
+            },
+        ),
+        migrations.RunPython(populate_featured_deals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:57
+
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models
+
+
+# Indici creati CONCURRENTLY, così la tabella dei deal resta scrivibile durante il deploy
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('app', '0014_featureddeal'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='deal',
+            options={'ordering': ['-deal_rating', '-deal_id'], 'verbose_name': 'Deal', 'verbose_name_plural': 'Deals'},
+        ),
+        RemoveIndexConcurrently(
+            model_name='deal',
+            name='deal_live_rating_idx',
+        ),
+        AddIndexConcurrently(
+            model_name='deal',
+            index=models.Index(condition=models.Q(('expired_at__isnull', True)), fields=['deal_rating', 'deal_id'], name='deal_live_rating_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='deal',
+            index=models.Index(condition=models.Q(('expired_at__isnull', True)), fields=['sale_price', 'deal_id'], name='deal_live_sale_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='deal',
+            index=models.Index(condition=models.Q(('expired_at__isnull', True)), fields=['normal_price', 'deal_id'], name='deal_live_normal_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='deal',
+            index=models.Index(condition=models.Q(('expired_at__isnull', True)), fields=['title', 'deal_id'], name='deal_live_title_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='deal',
+            index=models.Index(condition=models.Q(('expired_at__isnull', True)), fields=['created_at', 'deal_id'], name='deal_live_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='deal',
+            index=models.Index(condition=models.Q(('expired_at__isnull', True)), fields=['metacritic_score', 'deal_id'], name='deal_live_metacritic_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='deal',
+            index=models.Index(condition=models.Q(('expired_at__isnull', True)), fields=['store', 'deal_rating', 'deal_id'], name='deal_live_store_rating_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='deal',
+            index=models.Index(condition=models.Q(('expired_at__isnull', True)), fields=['store', 'sale_price', 'deal_id'], name='deal_live_store_sale_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='deal',
+            index=models.Index(condition=models.Q(('expired_at__isnull', True)), fields=['store', 'normal_price', 'deal_id'], name='deal_live_store_normal_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='deal',
+            index=models.Index(condition=models.Q(('expired_at__isnull', True)), fields=['store', 'title', 'deal_id'], name='deal_live_store_title_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='deal',
+            index=models.Index(condition=models.Q(('expired_at__isnull', True)), fields=['store', 'created_at', 'deal_id'], name='deal_live_store_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='deal',
+            index=models.Index(condition=models.Q(('expired_at__isnull', True)), fields=['store', 'metacritic_score', 'deal_id'], name='deal_live_store_metacritic_idx'),
+        ),
+    ]
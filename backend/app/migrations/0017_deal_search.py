@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:07
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+# pg_trgm è un modulo contrib: l'immagine docker di Postgres lo include, altri server
+# potrebbero non averlo. Senza, estensione e indice trigram non vengono creati e la
+# ricerca resta solo full-text (vedi app/search.py)
+CREATE_TRIGRAM_INDEX = '''
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm') THEN
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+        CREATE INDEX IF NOT EXISTS deal_title_trgm_idx ON deals USING gin (title gin_trgm_ops)
+            WHERE expired_at IS NULL;
+    END IF;
+END
+$$;
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0016_datasetversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deal',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.SearchVector('title', config='simple'), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddIndex(
+            model_name='deal',
+            index=django.contrib.postgres.indexes.GinIndex(condition=models.Q(('expired_at__isnull', True)), fields=['search_vector'], name='deal_search_vector_idx'),
+        ),
+        migrations.RunSQL(CREATE_TRIGRAM_INDEX, 'DROP INDEX IF EXISTS deal_title_trgm_idx'),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:31
+
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models
+
+
+# A parità di rating torna prima il deal più economico, come prima di 0015: gli indici del
+# rating seguono il nuovo ordinamento e vengono ricostruiti CONCURRENTLY
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('app', '0017_deal_search'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='deal',
+            options={'ordering': ['-deal_rating', 'sale_price', '-deal_id'], 'verbose_name': 'Deal', 'verbose_name_plural': 'Deals'},
+        ),
+        RemoveIndexConcurrently(
+            model_name='deal',
+            name='deal_live_rating_idx',
+        ),
+        RemoveIndexConcurrently(
+            model_name='deal',
+            name='deal_live_store_rating_idx',
+        ),
+        AddIndexConcurrently(
+            model_name='deal',
+            index=models.Index(condition=models.Q(('expired_at__isnull', True)), fields=['-deal_rating', 'sale_price', '-deal_id'], name='deal_live_rating_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='deal',
+            index=models.Index(condition=models.Q(('expired_at__isnull', True)), fields=['store', '-deal_rating', 'sale_price', '-deal_id'], name='deal_live_store_rating_idx'),
+        ),
+    ]
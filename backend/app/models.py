@@ -1,5 +1,7 @@
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin
 from django.contrib.auth.base_user import BaseUserManager
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
 from django.utils import timezone
 
@@ -52,6 +54,9 @@ class Store(models.Model):
     store_id = models.IntegerField(unique=True, primary_key=True)
     store_name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
+    # Inizio dell'ultima sincronizzazione completa dei deal dello store: la successiva
+    # chiede a CheapShark solo i deal cambiati da allora
+    deals_synced_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -64,6 +69,19 @@ class Store(models.Model):
         return f"{self.store_name} ({self.store_id})"
 
 
+class DealQuerySet(models.QuerySet):
+    def live(self):
+        """
+        Deal ancora presenti su CheapShark, quelli scaduti restano solo fino alla purge.
+        search_vector serve solo nelle condizioni di ricerca, non viene letto.
+        """
+        return self.filter(expired_at__isnull=True).defer('search_vector')
+
+
+# Condizione degli indici parziali sulle sole righe vive, vedi DealQuerySet.live()
+LIVE = models.Q(expired_at__isnull=True)
+
+
 class Deal(models.Model):
     deal_id = models.CharField(max_length=255, unique=True, primary_key=True)
     thumb = models.URLField(blank=True)
@@ -78,14 +96,249 @@ class Deal(models.Model):
     metacritic_score = models.IntegerField(null=True, blank=True)
     release_date = models.DateTimeField(null=True, blank=True)
     last_change = models.DateTimeField(null=True, blank=True)
+    # Id dell'ultimo IngestionRun che ha ricevuto il deal da CheapShark; non è indicizzato
+    # così l'aggiornamento a ogni sincronizzazione resta un HOT update
+    last_seen_run = models.BigIntegerField(null=True, blank=True)
+    # Valorizzato quando una sincronizzazione completa dello store non trova più il deal
+    expired_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Titolo come tsvector calcolato da Postgres a ogni scrittura, per la ricerca (vedi app/search.py).
+    # Configurazione 'simple': i titoli sono nomi propri, niente stemming né stopword
+    search_vector = models.GeneratedField(
+        expression=SearchVector('title', config='simple'),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+    
+    objects = DealQuerySet.as_manager()
     
     class Meta:
         db_table = 'deals'
         verbose_name = 'Deal'
         verbose_name_plural = 'Deals'
-        ordering = ['-deal_rating', 'sale_price']
+        # A parità di rating prima il più economico, deal_id come tie-breaker: l'ordine è stabile
+        # e coincide con la paginazione per cursor (vedi app/pagination.py)
+        ordering = ['-deal_rating', 'sale_price', '-deal_id']
+        # Un indice sulle sole righe vive per ogni ordinamento di deals_list_filtered, con
+        # deal_id in coda come nei cursor; letti all'indietro servono anche gli ordinamenti
+        # decrescenti. Le varianti con store_id in testa servono il filtro per store.
+        indexes = [
+            models.Index(
+                fields=['-deal_rating', 'sale_price', '-deal_id'], name='deal_live_rating_idx', condition=LIVE
+            ),
+            models.Index(fields=['sale_price', 'deal_id'], name='deal_live_sale_idx', condition=LIVE),
+            models.Index(fields=['normal_price', 'deal_id'], name='deal_live_normal_idx', condition=LIVE),
+            models.Index(fields=['title', 'deal_id'], name='deal_live_title_idx', condition=LIVE),
+            models.Index(fields=['created_at', 'deal_id'], name='deal_live_created_idx', condition=LIVE),
+            models.Index(fields=['metacritic_score', 'deal_id'], name='deal_live_metacritic_idx', condition=LIVE),
+            models.Index(
+                fields=['store', '-deal_rating', 'sale_price', '-deal_id'], name='deal_live_store_rating_idx',
+                condition=LIVE
+            ),
+            models.Index(
+                fields=['store', 'sale_price', 'deal_id'], name='deal_live_store_sale_idx', condition=LIVE
+            ),
+            models.Index(
+                fields=['store', 'normal_price', 'deal_id'], name='deal_live_store_normal_idx', condition=LIVE
+            ),
+            models.Index(
+                fields=['store', 'title', 'deal_id'], name='deal_live_store_title_idx', condition=LIVE
+            ),
+            models.Index(
+                fields=['store', 'created_at', 'deal_id'], name='deal_live_store_created_idx', condition=LIVE
+            ),
+            models.Index(
+                fields=['store', 'metacritic_score', 'deal_id'], name='deal_live_store_metacritic_idx',
+                condition=LIVE
+            ),
+            # Ricerca full-text sul titolo dei deal vivi; l'indice trigram per la ricerca fuzzy,
+            # anch'esso sulle sole righe vive, è creato dalla migrazione 0017 se pg_trgm è disponibile
+            GinIndex(fields=['search_vector'], name='deal_search_vector_idx', condition=LIVE),
+            # Solo le righe scadute, per la purge
+            models.Index(
+                fields=['expired_at'], name='deal_expired_idx',
+                condition=models.Q(expired_at__isnull=False)
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.title} - ${self.sale_price}"
+
+
+class FeaturedDeal(models.Model):
+    """
+    Deal in evidenza per gli utenti non autenticati, i primi N di ogni store.
+    Tabella ricalcolata a fine sincronizzazione (vedi app/featured.py) con i soli
+    campi della card, così la homepage legge poche righe senza join.
+    """
+    deal_id = models.CharField(max_length=255, primary_key=True)
+    store_id = models.IntegerField()
+    rank = models.PositiveSmallIntegerField()
+    title = models.CharField(max_length=500)
+    store_name = models.CharField(max_length=255)
+    sale_price = models.DecimalField(max_digits=10, decimal_places=2)
+    normal_price = models.DecimalField(max_digits=10, decimal_places=2)
+    thumb = models.URLField(blank=True)
+    
+    class Meta:
+        db_table = 'featured_deals'
+        verbose_name = 'Featured Deal'
+        verbose_name_plural = 'Featured Deals'
+        ordering = ['store_id', 'rank']
+        indexes = [
+            models.Index(fields=['store_id', 'rank'], name='featured_deal_store_rank_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.store_name} #{self.rank}: {self.title}"
+
+
+class HttpValidator(models.Model):
+    """ETag e Last-Modified dell'ultima risposta di CheapShark, per le richieste condizionali"""
+    url = models.CharField(max_length=500, unique=True)
+    etag = models.CharField(max_length=255, blank=True)
+    last_modified = models.CharField(max_length=64, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'http_validators'
+        verbose_name = 'HTTP Validator'
+        verbose_name_plural = 'HTTP Validators'
+    
+    def __str__(self):
+        return self.url
+
+
+class DealPriceSnapshot(models.Model):
+    """
+    Storico append-only dei prezzi di un deal, una riga per ogni cambio di prezzo.
+    In Postgres la tabella è partizionata per mese su captured_at (vedi app/price_history.py),
+    così i mesi vecchi si eliminano con un DROP della partizione.
+    """
+    id = models.BigAutoField(primary_key=True)
+    # Nessun vincolo di FK: lo storico sopravvive ai deal eliminati e segue il ciclo
+    # di vita delle partizioni
+    deal = models.ForeignKey(
+        Deal, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False,
+        related_name='price_snapshots'
+    )
+    sale_price = models.DecimalField(max_digits=10, decimal_places=2)
+    normal_price = models.DecimalField(max_digits=10, decimal_places=2)
+    captured_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        db_table = 'deal_price_snapshots'
+        verbose_name = 'Deal Price Snapshot'
+        verbose_name_plural = 'Deal Price Snapshots'
+        indexes = [
+            models.Index(fields=['deal', 'captured_at'], name='deal_price_snapshot_deal_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.deal_id} - ${self.sale_price} @ {self.captured_at}"
+
+
+class IngestionRun(models.Model):
+    """Tempi per fase e contatori di un'esecuzione di fetch_deals, per confrontare le sincronizzazioni"""
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCESS = 'success'
+    STATUS_INTERRUPTED = 'interrupted'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCESS, 'Success'),
+        (STATUS_INTERRUPTED, 'Interrupted'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    
+    started_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_RUNNING)
+    options = models.JSONField(default=dict, blank=True)
+    # Secondi spesi in ogni fase; deal_fetch è l'attesa delle pagine da CheapShark
+    stores_seconds = models.FloatField(default=0)
+    deal_fetch_seconds = models.FloatField(default=0)
+    parse_seconds = models.FloatField(default=0)
+    db_write_seconds = models.FloatField(default=0)
+    duration_seconds = models.FloatField(default=0)
+    pages = models.PositiveIntegerField(default=0)
+    http_requests = models.PositiveIntegerField(default=0)
+    http_retries = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    updated_count = models.PositiveIntegerField(default=0)
+    skipped_count = models.PositiveIntegerField(default=0)
+    snapshots_count = models.PositiveIntegerField(default=0)
+    expired_count = models.PositiveIntegerField(default=0)
+    invalid_count = models.PositiveIntegerField(default=0)
+    batch_errors = models.PositiveIntegerField(default=0)
+    rows_per_second = models.FloatField(default=0)
+    # Picco della memoria residente del processo durante l'esecuzione (app/metrics.py)
+    peak_memory_kb = models.PositiveBigIntegerField(default=0)
+    error_message = models.TextField(blank=True)
+    
+    class Meta:
+        db_table = 'ingestion_runs'
+        verbose_name = 'Ingestion Run'
+        verbose_name_plural = 'Ingestion Runs'
+        ordering = ['-started_at']
+    
+    def __str__(self):
+        return f"{self.started_at:%Y-%m-%d %H:%M} - {self.status}"
+    
+    @property
+    def deals_processed(self):
+        return self.created_count + self.updated_count + self.skipped_count
+    
+    @property
+    def errors(self):
+        return self.invalid_count + self.batch_errors
+    
+    def summary(self):
+        return {
+            'id': self.pk,
+            'status': self.status,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'duration_seconds': self.duration_seconds,
+            'phases': {
+                'stores': self.stores_seconds,
+                'deal_fetch': self.deal_fetch_seconds,
+                'parse': self.parse_seconds,
+                'db_write': self.db_write_seconds,
+            },
+            'pages': self.pages,
+            'http_requests': self.http_requests,
+            'http_retries': self.http_retries,
+            'deals_processed': self.deals_processed,
+            'created_count': self.created_count,
+            'updated_count': self.updated_count,
+            'skipped_count': self.skipped_count,
+            'snapshots_count': self.snapshots_count,
+            'expired_count': self.expired_count,
+            'rows_per_second': self.rows_per_second,
+            'peak_memory_kb': self.peak_memory_kb,
+            'errors': self.errors,
+            'invalid_count': self.invalid_count,
+            'batch_errors': self.batch_errors,
+            'error_message': self.error_message,
+            'options': self.options,
+        }
+
+
+class DatasetVersion(models.Model):
+    """
+    Versione dei dati letti dalle API, una sola riga. fetch_deals la incrementa a fine
+    sincronizzazione: le risposte in cache sono indicizzate per versione, quindi un
+    incremento le invalida tutte senza cancellarle.
+    """
+    version = models.PositiveBigIntegerField(default=1)
+    updated_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        db_table = 'dataset_version'
+        verbose_name = 'Dataset Version'
+        verbose_name_plural = 'Dataset Version'
     
     def __str__(self):
-        return f"{self.title} - ${self.sale_price}"
\ No newline at end of file
+        return f"v{self.version} @ {self.updated_at}"
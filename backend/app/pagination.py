@@ -0,0 +1,160 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from decimal import Decimal
+from django.core.exceptions import ValidationError
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+from .models import Deal
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+# Chiavi secondarie, prima del tie-breaker: a parità di rating il deal più economico viene
+# prima, come nell'ordinamento originale delle liste. deal_rating crescente è l'esatto
+# contrario di -deal_rating, così lo stesso indice letto all'indietro serve entrambi
+SECONDARY_KEYS = {
+    '-deal_rating': ('sale_price',),
+    'deal_rating': ('-sale_price',),
+}
+
+
+def ordering_keys(ordering):
+    """Chiavi di ordinamento con il segno: ordering, le sue chiavi secondarie e deal_id nella direzione di ordering"""
+    tie_breaker = '-deal_id' if ordering.startswith('-') else 'deal_id'
+    return (ordering, *SECONDARY_KEYS.get(ordering, ()), tie_breaker)
+
+
+def sort_fields(ordering):
+    """Campi da leggere per costruire il cursor dell'ordinamento, deal_id compreso"""
+    return tuple(key.lstrip('-') for key in ordering_keys(ordering))
+
+
+def order_deals(deals, ordering):
+    """Ordina per ordering, le sue chiavi secondarie e deal_id come tie-breaker, in pagina e per cursor"""
+    return deals.order_by(*ordering_keys(ordering))
+
+
+def cursor_value(value):
+    # Datetime con i microsecondi: DjangoJSONEncoder li tronca ai millisecondi e il
+    # confronto di riga restituirebbe di nuovo l'ultimo deal della pagina
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(ordering, deal):
+    """Cursor opaco con l'ordinamento, le chiavi di ordinamento dell'ultimo deal e il suo deal_id"""
+    payload = json.dumps([ordering, *(cursor_value(getattr(deal, field)) for field in sort_fields(ordering))])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(ordering, cursor):
+    """
+    Valori delle chiavi di ordinamento e deal_id contenuti nel cursor, come tupla;
+    InvalidCursor se non è di questo ordinamento
+    """
+    fields = sort_fields(ordering)
+    try:
+        payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_ordering, *values = json.loads(payload)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise InvalidCursor(cursor)
+    if cursor_ordering != ordering or len(values) != len(fields) or not isinstance(values[-1], str):
+        raise InvalidCursor(cursor)
+    try:
+        return tuple(Deal._meta.get_field(field).to_python(value) for field, value in zip(fields, values))
+    except (ValidationError, TypeError):
+        raise InvalidCursor(cursor)
+
+
+def key_conditions(key, value):
+    """
+    Condizioni "dopo value" (None se nessun valore viene dopo) e "uguale a value" di una chiave
+    con segno. I NULL stanno in fondo negli ordinamenti crescenti e in testa in quelli decrescenti.
+    """
+    field = Deal._meta.get_field(key.lstrip('-'))
+    column = f'{Deal._meta.db_table}.{field.column}'
+    descending = key.startswith('-')
+    if value is None:
+        return (f'{column} IS NOT NULL', []) if descending else None, (f'{column} IS NULL', [])
+    after = f'{column} {"<" if descending else ">"} %s'
+    if not descending and field.null:
+        after = f'({after} OR {column} IS NULL)'
+    return (after, [value]), (f'{column} = %s', [value])
+
+
+def seek_condition(ordering, values):
+    """
+    Condizione che seleziona i deal dopo values (chiavi di ordinamento e deal_id) nell'ordinamento.
+    Con una sola chiave è un confronto di riga, così Postgres può proseguire la scansione di un
+    indice (chiave, deal_id). Con chiavi secondarie in direzioni diverse è il confronto
+    lessicografico esteso, preceduto dal limite sulla prima chiave da cui parte la scansione.
+    """
+    keys = ordering_keys(ordering)
+    if len(keys) == 2:
+        field = Deal._meta.get_field(ordering.lstrip('-'))
+        table = Deal._meta.db_table
+        key, pk = f'{table}.{field.column}', f'{table}.deal_id'
+        value, deal_id = values
+        descending = ordering.startswith('-')
+        operator = '<' if descending else '>'
+        if value is None:
+            if descending:
+                return f'({key} IS NOT NULL OR {pk} < %s)', [deal_id]
+            return f'({key} IS NULL AND {pk} > %s)', [deal_id]
+        condition = f'({key}, {pk}) {operator} (%s, %s)'
+        if not descending and field.null:
+            condition = f'({condition} OR {key} IS NULL)'
+        return condition, [value, deal_id]
+
+    alternatives, equal_sql, equal_params = [], [], []
+    for key, value in zip(keys, values):
+        after, equal = key_conditions(key, value)
+        if after is not None:
+            alternatives.append((' AND '.join([*equal_sql, after[0]]), equal_params + after[1]))
+        equal_sql.append(equal[0])
+        equal_params = equal_params + equal[1]
+    condition = ' OR '.join(f'({sql})' for sql, _ in alternatives)
+    params = [param for _, sql_params in alternatives for param in sql_params]
+    if values[0] is None:
+        return condition, params
+    # Ridondante, ma è il limite da cui parte la scansione dell'indice: il resto lo filtra
+    field = Deal._meta.get_field(ordering.lstrip('-'))
+    column = f'{Deal._meta.db_table}.{field.column}'
+    bound = f'{column} {"<=" if ordering.startswith("-") else ">="} %s'
+    if not ordering.startswith('-') and field.null:
+        bound = f'({bound} OR {column} IS NULL)'
+    return f'{bound} AND ({condition})', [values[0], *params]
+
+
+def keyset_query(deals, ordering, cursor, page_size):
+    """Query della pagina successiva al cursor (dall'inizio se vuoto): page_size + 1 righe"""
+    deals = order_deals(deals, ordering)
+    if cursor:
+        sql, params = seek_condition(ordering, decode_cursor(ordering, cursor))
+        deals = deals.filter(RawSQL(sql, params, output_field=BooleanField()))
+    return deals[:page_size + 1]
+
+
+def keyset_result(rows, ordering, page_size):
+    """Righe lette da keyset_query e cursor della pagina seguente, None se è l'ultima"""
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    return rows, encode_cursor(ordering, rows[-1])
+
+
+def keyset_page(deals, ordering, cursor, page_size, fetch=list):
+    """
+    Pagina di deal successiva al cursor (dall'inizio se vuoto) ordinata per ordering_keys;
+    restituisce i deal e il cursor della pagina seguente, None se è l'ultima.
+    Legge page_size + 1 righe per sapere se c'è un'altra pagina senza contare. fetch legge
+    le righe della query: istanze del modello o qualsiasi oggetto con gli attributi di ordinamento.
+    """
+    return keyset_result(fetch(keyset_query(deals, ordering, cursor, page_size)), ordering, page_size)
@@ -0,0 +1,81 @@
+import re
+from datetime import datetime, timezone as dt_timezone
+from django.db import connection
+from .models import DealPriceSnapshot
+
+
+TABLE = DealPriceSnapshot._meta.db_table
+PARTITION_NAME = re.compile(rf'^{TABLE}_p(\d{{4}})(\d{{2}})$')
+
+
+def month_start(value):
+    """Primo istante (UTC) del mese che contiene value"""
+    value = value.astimezone(dt_timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(start, months):
+    index = start.year * 12 + start.month - 1 + months
+    return start.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(start):
+    return f'{TABLE}_p{start:%Y%m}'
+
+
+def ensure_partition(moment):
+    """Crea, se non esiste, la partizione mensile che deve contenere moment"""
+    start = month_start(moment)
+    name = partition_name(start)
+    with connection.cursor() as cursor:
+        # to_regclass non prende lock sulla tabella padre, il CREATE solo se serve
+        cursor.execute('SELECT to_regclass(%s)', [name])
+        if cursor.fetchone()[0] is None:
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS {name} PARTITION OF {TABLE} FOR VALUES FROM (%s) TO (%s)',
+                [start, add_months(start, 1)]
+            )
+    return name
+
+
+def record_price_snapshots(snapshots):
+    """Scrive in blocco gli snapshot, creando prima le partizioni mensili necessarie"""
+    if not snapshots:
+        return 0
+    for start in {month_start(snapshot.captured_at) for snapshot in snapshots}:
+        ensure_partition(start)
+    DealPriceSnapshot.objects.bulk_create(snapshots)
+    return len(snapshots)
+
+
+def list_partitions():
+    """Partizioni mensili esistenti come lista di (inizio mese, nome tabella)"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT child.relname FROM pg_inherits '
+            'JOIN pg_class parent ON parent.oid = pg_inherits.inhparent '
+            'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+            'WHERE parent.relname = %s',
+            [TABLE]
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    partitions = []
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            start = datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=dt_timezone.utc)
+            partitions.append((start, name))
+    return sorted(partitions)
+
+
+def drop_partitions_before(cutoff):
+    """Elimina le partizioni dei mesi precedenti a quello di cutoff, restituendo i nomi eliminati"""
+    cutoff = month_start(cutoff)
+    dropped = []
+    with connection.cursor() as cursor:
+        for start, name in list_partitions():
+            if start < cutoff:
+                cursor.execute(f'DROP TABLE {name}')
+                dropped.append(name)
+    return dropped
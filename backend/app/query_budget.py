@@ -0,0 +1,104 @@
+import logging
+from contextlib import contextmanager
+from functools import wraps
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+
+
+logger = logging.getLogger(__name__)
+
+# Numero massimo di query di ogni endpoint, dichiarato con @query_budget accanto alla vista
+QUERY_BUDGETS = {}
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget_mode():
+    """'raise' (i test, vedi conftest.py), 'log' (DEBUG) o None: in produzione le query non si contano"""
+    return getattr(settings, 'QUERY_BUDGET_MODE', None)
+
+
+class QueryCounter:
+    """execute_wrapper che conserva le query eseguite dalla vista"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+
+def add_counter(counter):
+    connection.execute_wrappers.append(counter)
+
+
+def remove_counter(counter):
+    connection.execute_wrappers.remove(counter)
+
+
+def query_budget(endpoint, max_queries):
+    """
+    Dichiara quante query può eseguire la vista di endpoint, cache e risposte condizionali
+    comprese. Oltre il budget la vista fallisce con QueryBudgetExceeded o scrive un warning,
+    secondo QUERY_BUDGET_MODE; un N+1 si vede così al primo test che chiama l'endpoint.
+    La vista sincrona e quella asincrona (app/async_views.py) di un endpoint condividono il budget.
+    """
+    QUERY_BUDGETS[endpoint] = max_queries
+
+    def check(counter, mode):
+        if len(counter.queries) > max_queries:
+            message = f'{endpoint}: {len(counter.queries)} query, budget {max_queries}'
+            if mode == 'raise':
+                raise QueryBudgetExceeded('\n'.join([message, *counter.queries]))
+            logger.warning(message)
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                mode = query_budget_mode()
+                if mode is None:
+                    return await view(request, *args, **kwargs)
+                counter = QueryCounter()
+                # L'ORM asincrono esegue le query nel thread della richiesta, con la sua connessione:
+                # il contatore va aggiunto lì, non alla connessione del thread del loop
+                await sync_to_async(add_counter)(counter)
+                try:
+                    response = await view(request, *args, **kwargs)
+                finally:
+                    await sync_to_async(remove_counter)(counter)
+                check(counter, mode)
+                return response
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            mode = query_budget_mode()
+            if mode is None:
+                return view(request, *args, **kwargs)
+            counter = QueryCounter()
+            with connection.execute_wrapper(counter):
+                response = view(request, *args, **kwargs)
+            check(counter, mode)
+            return response
+        return wrapper
+    return decorator
+
+
+class QueryBudgetTestMixin:
+    """Per i test: la richiesta nel blocco resta entro il budget dichiarato per endpoint"""
+
+    @contextmanager
+    def assertQueryBudget(self, endpoint):
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as queries:
+            yield queries
+        budget = QUERY_BUDGETS[endpoint]
+        self.assertLessEqual(
+            len(queries), budget,
+            '\n'.join([f'{endpoint}: {len(queries)} query, budget {budget}', *(q['sql'] for q in queries)])
+        )
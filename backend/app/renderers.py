@@ -0,0 +1,35 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # Dipendenza opzionale, vedi l'extra "fast" di pyproject.toml
+    orjson = None
+
+
+ORJSON_OPTIONS = (
+    # Date, dataclass e sottoclassi passano dall'encoder di DRF come con JSONRenderer
+    orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_PASSTHROUGH_SUBCLASS
+    if orjson else 0
+)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer che codifica con orjson quando è installato. Il risultato è byte per byte
+    quello di JSONRenderer (JSON compatto, UTF-8, U+2028 e U+2029 escapati); con altre impostazioni
+    di DRF, con l'indentazione richiesta dal client o per valori che orjson non gestisce
+    (interi oltre 64 bit, chiavi non stringa) si usa JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None or data is None or self.ensure_ascii or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=JSONEncoder().default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
@@ -0,0 +1,214 @@
+import hashlib
+from functools import wraps
+from asgiref.sync import iscoroutinefunction
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+from .models import DatasetVersion
+
+
+KEY_PREFIX = 'responses'
+
+
+def response_cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def response_cache_enabled():
+    return getattr(settings, 'RESPONSE_CACHE_ENABLED', True)
+
+
+def dataset_version():
+    """Riga con versione e data dell'ultimo aggiornamento dei dati; versione 0 prima della prima sincronizzazione"""
+    return DatasetVersion.objects.filter(pk=1).first() or DatasetVersion(pk=1, version=0, updated_at=None)
+
+
+async def adataset_version():
+    return await DatasetVersion.objects.filter(pk=1).afirst() or DatasetVersion(pk=1, version=0, updated_at=None)
+
+
+def request_dataset_version(request):
+    """Versione dei dati letta una sola volta per richiesta, condivisa da ETag e cache"""
+    if not hasattr(request, '_dataset_version'):
+        request._dataset_version = dataset_version()
+    return request._dataset_version
+
+
+async def arequest_dataset_version(request):
+    if not hasattr(request, '_dataset_version'):
+        request._dataset_version = await adataset_version()
+    return request._dataset_version
+
+
+def bump_dataset_version():
+    """
+    Incrementa la versione dei dati al commit della transazione corrente (subito se non ce n'è una):
+    da quel momento le risposte in cache della versione precedente non vengono più lette
+    """
+    def bump():
+        now = timezone.now()
+        if not DatasetVersion.objects.filter(pk=1).update(version=F('version') + 1, updated_at=now):
+            DatasetVersion.objects.get_or_create(pk=1, defaults={'version': 1, 'updated_at': now})
+    transaction.on_commit(bump)
+
+
+def auth_tier(request):
+    return 'authenticated' if request.user.is_authenticated else 'anonymous'
+
+
+def normalized_query(request):
+    """Parametri della query ordinati, così ?a=1&b=2 e ?b=2&a=1 condividono la stessa voce"""
+    return urlencode(sorted((key, value) for key, values in request.GET.lists() for value in values))
+
+
+def cache_key(endpoint, request, version):
+    query = hashlib.sha1(normalized_query(request).encode()).hexdigest()
+    return f'{KEY_PREFIX}:v{version}:{endpoint}:{auth_tier(request)}:{query}'
+
+
+def count(outcome):
+    cache = response_cache()
+    key = f'{KEY_PREFIX}:stats:{outcome}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Prima richiesta, o contatore espulso dalla cache
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+async def acount(outcome):
+    cache = response_cache()
+    key = f'{KEY_PREFIX}:stats:{outcome}'
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        if not await cache.aadd(key, 1, timeout=None):
+            await cache.aincr(key)
+
+
+def cache_stats():
+    """Hit e miss contati dalla cache (per processo con locmem, condivisi con un backend esterno)"""
+    cache = response_cache()
+    hits = cache.get(f'{KEY_PREFIX}:stats:hit', 0)
+    misses = cache.get(f'{KEY_PREFIX}:stats:miss', 0)
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / (hits + misses) if hits + misses else 0.0,
+    }
+
+
+def cached_response(endpoint):
+    """
+    Mette in cache il corpo delle risposte 200 di una vista in sola lettura, con chiave
+    data da endpoint, parametri della query normalizzati, tipo di utente e versione dei dati.
+    Vale anche per le viste asincrone, con le API asincrone della cache.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if not response_cache_enabled():
+                    return await view(request, *args, **kwargs)
+                cache = response_cache()
+                key = cache_key(endpoint, request, (await arequest_dataset_version(request)).version)
+                data = await cache.aget(key)
+                if data is not None:
+                    await acount('hit')
+                    return Response(data)
+                await acount('miss')
+                response = await view(request, *args, **kwargs)
+                if response.status_code == 200:
+                    await cache.aset(key, response.data)
+                return response
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not response_cache_enabled():
+                return view(request, *args, **kwargs)
+            cache = response_cache()
+            key = cache_key(endpoint, request, request_dataset_version(request).version)
+            data = cache.get(key)
+            if data is not None:
+                count('hit')
+                return Response(data)
+            count('miss')
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data)
+            return response
+        return wrapper
+    return decorator
+
+
+def response_etag(endpoint, request, version):
+    """ETag forte: stessa versione dei dati, endpoint, query e tipo di utente danno lo stesso corpo"""
+    return '"%s"' % hashlib.sha1(cache_key(endpoint, request, version).encode()).hexdigest()
+
+
+def not_modified(request, etag, last_modified):
+    # If-Modified-Since conta solo senza If-None-Match (RFC 9110)
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        etags = parse_etags(if_none_match)
+        return '*' in etags or etag in etags
+    if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since'))
+    return bool(last_modified and if_modified_since and int(last_modified.timestamp()) <= if_modified_since)
+
+
+def conditional_headers(request, response, etag, version):
+    response['ETag'] = etag
+    if version.updated_at:
+        response['Last-Modified'] = http_date(version.updated_at.timestamp())
+    # Il corpo dipende dall'autenticazione; va sempre rivalidato con l'ETag
+    patch_vary_headers(response, ['Authorization'])
+    if request.user.is_authenticated:
+        patch_cache_control(response, no_cache=True, private=True)
+    else:
+        patch_cache_control(response, no_cache=True)
+    return response
+
+
+def conditional_response(endpoint):
+    """
+    ETag e Last-Modified dalla versione dei dati; una richiesta condizionale con la
+    versione corrente riceve un 304 senza che la vista, la cache o i serializer lavorino.
+    Vale anche per le viste asincrone.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                version = await arequest_dataset_version(request)
+                etag = response_etag(endpoint, request, version.version)
+                if not_modified(request, etag, version.updated_at):
+                    response = Response(status=status.HTTP_304_NOT_MODIFIED)
+                else:
+                    response = await view(request, *args, **kwargs)
+                    if response.status_code != 200:
+                        return response
+                return conditional_headers(request, response, etag, version)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            version = request_dataset_version(request)
+            etag = response_etag(endpoint, request, version.version)
+            if not_modified(request, etag, version.updated_at):
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            else:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            return conditional_headers(request, response, etag, version)
+        return wrapper
+    return decorator
@@ -0,0 +1,93 @@
+import re
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db import connection
+from django.db.models import F, FloatField, Q, Value
+from .models import Deal
+
+
+# Oltre questa lunghezza la query è rifiutata: i titoli sono brevi e le parole diventano condizioni
+MAX_QUERY_LENGTH = 100
+
+_trigram_available = {}
+
+
+def trigram_available():
+    """
+    pg_trgm installato nel database: la migrazione 0017 lo crea, con l'indice trigram sul titolo,
+    solo se il server lo mette a disposizione. Senza la ricerca resta solo full-text.
+    """
+    name = connection.settings_dict['NAME']
+    if name not in _trigram_available:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')")
+            _trigram_available[name] = cursor.fetchone()[0]
+    return _trigram_available[name]
+
+
+# Parole più corte sono cercate intere: un prefisso di una o due lettere troverebbe quasi tutti i deal
+MIN_PREFIX_LENGTH = 3
+
+
+def prefix_query(text):
+    """
+    tsquery con tutte le parole del testo, come prefissi dalla terza lettera ('witch 3' ->
+    witch:* & 3), così la ricerca funziona anche mentre si scrive. Solo caratteri di parola:
+    il testo dell'utente non arriva mai alla sintassi di to_tsquery.
+    """
+    words = re.findall(r'\w+', text)
+    if not words:
+        return None
+    terms = [f'{word}:*' if len(word) >= MIN_PREFIX_LENGTH else word for word in words]
+    return SearchQuery(' & '.join(terms), config='simple', search_type='raw')
+
+
+def search_filter(text):
+    """
+    Condizione di ricerca sul titolo: tsvector generato (indice GIN) e, con pg_trgm, similarità
+    trigram per parola (indice GIN trigram) che trova anche i titoli scritti con errori
+    """
+    query = prefix_query(text)
+    condition = Q(search_vector=query) if query is not None else Q(pk__in=[])
+    if trigram_available():
+        condition |= Q(title__trigram_word_similar=text)
+    return condition
+
+
+def search_rank(text):
+    """Rilevanza: ts_rank sulle parole trovate più la similarità trigram, che pesa di più sugli errori"""
+    query = prefix_query(text)
+    rank = SearchRank(F('search_vector'), query) if query is not None else None
+    if trigram_available():
+        similarity = TrigramWordSimilarity(text, 'title')
+        rank = similarity if rank is None else rank + similarity
+    return rank
+
+
+def max_ranked_matches():
+    return getattr(settings, 'SEARCH_MAX_RANKED', 1000)
+
+
+def search_deals(deals, text, max_ranked=None):
+    """
+    Deal che corrispondono al testo, con la rilevanza nell'annotazione relevance.
+    Con max_ranked la rilevanza si calcola solo sulle prime max_ranked corrispondenze lette
+    dagli indici di ricerca, nell'ordine in cui arrivano: una parola comune ne trova decine di
+    migliaia e classificarle tutte prima del LIMIT della pagina costerebbe più di 100 ms. Con
+    meno corrispondenze il risultato non cambia.
+    """
+    rank = search_rank(text)
+    if rank is None:
+        # Nessuna parola e niente trigram: nessun risultato, ma l'ordinamento per rilevanza resta valido
+        return deals.none().annotate(relevance=Value(0.0, output_field=FloatField()))
+    matches = deals.filter(search_filter(text))
+    if max_ranked:
+        # Le condizioni di ricerca restano solo nella sottoquery: ripeterle fuori farebbe
+        # leggere di nuovo l'indice per intero
+        matches = Deal.objects.live().filter(pk__in=matches.order_by().values('pk')[:max_ranked])
+    return matches.annotate(relevance=rank)
+
+
+def order_by_relevance(deals):
+    # Stesso tie-breaker dell'ordinamento predefinito, l'ordine delle pagine resta stabile
+    return deals.order_by('-relevance', '-deal_rating', '-deal_id')
@@ -1,7 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password
 from django.contrib.auth import authenticate
-from .models import DFUser, Store, Deal
+from .models import DFUser, Store, Deal, DealPriceSnapshot, FeaturedDeal
 
     
 class DFUserSerializer(serializers.ModelSerializer):
@@ -66,19 +66,36 @@ class StoreSerializer(serializers.ModelSerializer):
 
 
 class DealSerializer(serializers.ModelSerializer):
-    store_name = serializers.CharField(source='store.store_name', read_only=True)
+    # Copia del nome dello store nel deal: leggerlo dalla FK costerebbe una query per deal
+    store_name = serializers.CharField(read_only=True)
     
     class Meta:
         model = Deal
-        fields = '__all__'
+        # search_vector è solo per la ricerca nel database, non fa parte della risposta
+        exclude = ('search_vector',)
 
 
 class DealPublicSerializer(serializers.ModelSerializer):
     """Serializer per utenti non autenticati - mostra solo informazioni base per disegnare la card"""
-    store_name = serializers.CharField(source='store.store_name', read_only=True)
+    store_name = serializers.CharField(read_only=True)
     
     class Meta:
         model = Deal
         fields = (
             'deal_id', 'title', 'store_name', 'sale_price', 'normal_price', 'thumb'
-        )
\ No newline at end of file
+        )
+
+
+class FeaturedDealSerializer(serializers.ModelSerializer):
+    """Stessi campi di DealPublicSerializer, letti dalla tabella dei deal in evidenza"""
+    class Meta:
+        model = FeaturedDeal
+        fields = (
+            'deal_id', 'title', 'store_name', 'sale_price', 'normal_price', 'thumb'
+        )
+
+
+class DealPriceSnapshotSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DealPriceSnapshot
+        fields = ('sale_price', 'normal_price', 'captured_at')
@@ -14,8 +14,14 @@ urlpatterns = [
     # Data endpoints
     path('deals', views.deals_list, name='deals_list'),
     path('dealsFiltered', views.deals_list_filtered, name='deals_list_filtered'),
+    path('dealsSearch', views.deals_search, name='deals_search'),
+    path('dealsExport', views.deals_export, name='deals_export'),
     path('filtersData', views.filters_data, name='filters_data'),
     path('dealDetail', views.deal_detail, name='deal_detail'),
+    path('dealPriceHistory', views.deal_price_history, name='deal_price_history'),
+
+    path('cacheStats', views.response_cache_stats, name='response_cache_stats'),
+    path('dbPoolStats', views.db_pool_stats, name='db_pool_stats'),
 
     # User endpoints
     path('admin-exist', views.admin_exist, name='admin_exist'),
@@ -1,22 +1,40 @@
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
 from rest_framework import generics, status
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
+from functools import partial
 from django.shortcuts import get_object_or_404
-from django.db.models import F, Window
-from django.db.models.functions import RowNumber
 from rest_framework.serializers import ValidationError
 
-from .models import DFUser, Store, Deal
+from .models import DFUser, Deal, DealPriceSnapshot, FeaturedDeal
 from .serializers import (
     DFUserSerializer, LoginSerializer, StoreSerializer, 
-    DealSerializer, DealPublicSerializer
+    DealSerializer, DealPriceSnapshotSerializer, FeaturedDealSerializer
 )
+from .counts import deal_count
+from .db_pool import pool_stats
+from .deal_details import MAX_DEAL_IDS, deal_details, parse_deal_ids
+from .deal_params import (
+    ALLOWED_ORDERINGS, InvalidParameter, apply_filters, deals_cursor_response, deals_page_response,
+    deals_params, filtered_cursor_response, filtered_page_response, filtered_params, page_bounds,
+    parse_min_price, parse_ordering, parse_page, parse_page_size, parse_query, store_ids_query
+)
+from .deal_rows import InvalidFields, deal_data, deal_rows, parse_fields, with_fields
+from .export import EXPORT_FORMATS, aiter_chunks, export_chunks
+from .filter_stats import MAX_PRICE_BUCKETS, filters_summary, price_buckets
+from .pagination import InvalidCursor, keyset_page, order_deals, sort_fields
+from .response_cache import (
+    cache_stats, cached_response, conditional_response, dataset_version, request_dataset_version
+)
+from .query_budget import query_budget
+from .renderers import FastJSONRenderer
+from .search import max_ranked_matches, order_by_relevance, search_deals
 
 class RegisterView(generics.CreateAPIView):
     users = DFUser.objects.all()
@@ -95,131 +113,277 @@ def delete_account_view(request):
 # API che restituiscono i deals e gli store, con differenziazione tra utenti autenticati e non autenticati
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@renderer_classes([FastJSONRenderer])
+# Versione dei dati, conteggio (in cache dopo la prima pagina) e pagina
+@query_budget('deals', 3)
+@conditional_response('deals')
+@cached_response('deals')
 def deals_list(request):
 
     # API che restituisce deals di gog, steam e humble bundle in base all'autenticazione:
-    # - Utenti non autenticati: i 3 migliori deals per negozio con informazioni limitate, solo per creare la card
+    # - Utenti non autenticati: i primi FEATURED_DEALS_PER_STORE deals per negozio con informazioni limitate,
+    #   solo per creare la card, letti dalla tabella featured_deals ricalcolata a ogni fetch_deals
     # - Utenti autenticati: tutti i deals con informazioni complete, con paginazione a 8 deal per pagina
 
     if not request.user.is_authenticated:
-        deals= Deal.objects.annotate(
-            row_number=Window(
-            expression=RowNumber(),
-            partition_by=[F('store')],
-            order_by='created_at')
-            ).filter(row_number__lte=1)
-        
-        if deals.exists():
-            serializer = DealPublicSerializer(deals, many=True)
-        else:
-            serializer = DealPublicSerializer([], many=True)
+        serializer = FeaturedDealSerializer(FeaturedDeal.objects.all(), many=True)
         
         return Response({
             'authenticated': False,
             'count': len(serializer.data),
             'deals': serializer.data
         })
-    else:
-        deals = Deal.objects.all()
 
-        # Utenti autenticati: tutti i deals con paginazione
-        # Ogni pagina conterrà 8 elementi per rimanere coerente con
-        # la richiesta della parte FE
-        page = request.GET.get('page', 1)
-        page_size = 8
-        
+    try:
+        params = deals_params(request.GET)
+    except (InvalidFields, InvalidParameter) as error:
+        return Response({'error': str(error)}, status=400)
+
+    # Stesso ordinamento (rating, poi prezzo, deal_id come tie-breaker) per pagina e per cursor
+    deals = order_deals(Deal.objects.live(), params.ordering)
+
+    if params.cursor is not None:
         try:
-            page = int(page)
-            start = (page - 1) * page_size
-            end = start + page_size
-            
-            paginated_deals = deals[start:end]
-            serializer = DealSerializer(paginated_deals, many=True)
-            
-            return Response({
-                'authenticated': True,
-                'count': deals.count(),
-                'page': page,
-                'page_size': page_size,
-                'hasNext': end < deals.count(),
-                'deals': serializer.data
-            })
-        except ValueError:
-            return Response({'error': 'Parametro page non valido'}, status=400)
+            # Il cursor si costruisce dalle chiavi di ordinamento e dal deal_id dell'ultima riga
+            fetch = partial(deal_rows, fields=with_fields(params.fields, *sort_fields(params.ordering)))
+            page_deals, next_cursor = keyset_page(
+                deals, params.ordering, params.cursor, params.page_size, fetch=fetch
+            )
+        except InvalidCursor:
+            return Response({'error': 'Parametro cursor non valido'}, status=400)
+        return Response(deals_cursor_response(params, page_deals, next_cursor))
+
+    start, end = page_bounds(params.page, params.page_size)
+    total_count, _ = deal_count(deals, {}, request_dataset_version(request).version)
+    # Righe compatte invece dei modelli, con gli stessi campi e formati di DealSerializer
+    paginated_deals = deal_rows(deals[start:end], fields=params.fields)
+    return Response(deals_page_response(params, total_count, paginated_deals))
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@renderer_classes([FastJSONRenderer])
+# Versione dei dati, id dello store, pg_trgm (una volta per processo), stima e conteggio, pagina
+@query_budget('dealsFiltered', 6)
+@conditional_response('dealsFiltered')
+@cached_response('dealsFiltered')
 def deals_list_filtered(request):
 
-    deals = Deal.objects.all()
+    try:
+        params = filtered_params(request.GET)
+    except (InvalidFields, InvalidParameter) as error:
+        return Response({'error': str(error)}, status=400)
+
+    deals = filter_deals(Deal.objects.live(), params.store, params.min_price)
+    if params.q:
+        deals = search_deals(deals, params.q)
+
+    if params.cursor is not None:
+        try:
+            fetch = partial(deal_rows, fields=with_fields(params.fields, *sort_fields(params.ordering)))
+            page_deals, next_cursor = keyset_page(
+                deals, params.ordering, params.cursor, params.page_size, fetch=fetch
+            )
+        except InvalidCursor:
+            return Response({'error': 'Invalid cursor parameter'}, status=400)
+        return Response(filtered_cursor_response(params, page_deals, next_cursor))
+
+    deals = order_by_relevance(deals) if params.ordering == 'relevance' else order_deals(deals, params.ordering)
+
+    start, end = page_bounds(params.page, params.page_size)
+    # Con count=estimated un totale grande è la stima del planner: has_next si ricava
+    # leggendo un deal in più, così non dipende dal totale
+    total_count, count_exact = deal_count(
+        deals, params.count_signature, request_dataset_version(request).version, estimate=params.estimate
+    )
+    paginated_deals = deal_rows(deals[start:end + 1], fields=params.fields)
+    return Response(filtered_page_response(params, total_count, count_exact, paginated_deals))
+
+    # Paginazione per chiave: il cursor (vuoto per la prima pagina) contiene la chiave di
+    # ordinamento e il deal_id dell'ultimo deal restituito
+    cursor = request.GET.get('cursor')
+    if cursor is not None:
+        # La rilevanza non ha un indice su cui proseguire: per cursor i risultati della
+        # ricerca seguono l'ordinamento predefinito
+        if ordering == 'relevance':
+            ordering = '-deal_rating'
+        try:
+            fetch = partial(deal_rows, fields=with_fields(fields, *sort_fields(ordering)))
+            page_deals, next_cursor = keyset_page(deals, ordering, cursor, page_size, fetch=fetch)
+        except InvalidCursor:
+            return Response({'error': 'Invalid cursor parameter'}, status=400)
+
+        return Response({
+            'page_size': page_size,
+            'has_next': next_cursor is not None,
+            'next_cursor': next_cursor,
+            'deals': deal_data(page_deals, fields),
+            'filters_applied': filters_applied
+        })
+
+    deals = order_by_relevance(deals) if ordering == 'relevance' else order_deals(deals, ordering)
 
-    store = request.GET.get('store')
-    if store:
-        deals = deals.filter(store__store_name=store)
-    
-    min_price = request.GET.get('min_price')
-    if min_price:
-        deals = deals.filter(sale_price__gte=float(min_price))
-    
-    ordering = request.GET.get('ordering', '-deal_rating')
-    allowed_orderings = [
-        'deal_rating', '-deal_rating',
-        'sale_price', '-sale_price',
-        'normal_price', '-normal_price',
-        'title', '-title',
-        'created_at', '-created_at',
-        'metacritic_score', '-metacritic_score'
-    ]
-    
-    if ordering in allowed_orderings:
-        deals = deals.order_by(ordering)
-    else:
-        deals = deals.order_by('-deal_rating')
-    
-    # Pagination
-    page = request.GET.get('page', 1)
-    page_size = request.GET.get('page_size', 8)
-    
     try:
         page = int(page)
-        page_size = min(int(page_size), 50)  # Max 50 items per page
         
         start = (page - 1) * page_size
         end = start + page_size
         
-        total_count = deals.count()
-        paginated_deals = deals[start:end]
-        serializer = DealSerializer(paginated_deals, many=True)
+        # Con count=estimated un totale grande è la stima del planner: has_next si ricava
+        # leggendo un deal in più, così non dipende dal totale
+        total_count, count_exact = deal_count(
+            deals, count_signature, request_dataset_version(request).version,
+            estimate=request.GET.get('count') == 'estimated'
+        )
+        paginated_deals = deal_rows(deals[start:end + 1], fields=fields)
+        has_next = len(paginated_deals) > page_size
         
         return Response({
             'count': total_count,
+            'count_exact': count_exact,
             'page': page,
             'page_size': page_size,
             'total_pages': (total_count + page_size - 1) // page_size,
-            'has_next': end < total_count,
+            'has_next': has_next,
             'has_previous': page > 1,
-            'deals': serializer.data,
-            'filters_applied': {
-                'store': store,
-                'min_price': min_price,
-                'ordering': ordering
-            }
+            'deals': deal_data(paginated_deals[:page_size], fields),
+            'filters_applied': filters_applied
         })
         
     except ValueError:
         return Response({'error': 'Invalid page or page_size parameter'}, status=400)
 
+def filter_deals(deals, store, min_price):
+    """Filtri per store e prezzo minimo (già letto da parse_min_price) comuni a dealsFiltered e dealsSearch"""
+    # Il nome si risolve prima negli id: senza join il filtro usa gli indici con store_id in testa
+    store_ids = list(store_ids_query(store)) if store else None
+    return apply_filters(deals, store_ids, min_price)
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@renderer_classes([FastJSONRenderer])
+# Versione dei dati, id dello store, pg_trgm (una volta per processo), pagina
+@query_budget('dealsSearch', 4)
+@conditional_response('dealsSearch')
+@cached_response('dealsSearch')
+def deals_search(request):
+    """
+    Ricerca dei deal per titolo ordinata per rilevanza (vedi app/search.py), con gli stessi
+    filtri store e min_price di dealsFiltered. Nessun conteggio: has_next si ricava leggendo
+    un deal in più, così ogni pagina è una sola query sugli indici di ricerca. Si classificano
+    solo le prime SEARCH_MAX_RANKED corrispondenze, quindi le pagine si fermano lì.
+    """
+    try:
+        q = parse_query(request.GET.get('q'))
+        if not q:
+            raise InvalidParameter('q parameter required')
+        page = parse_page(request.GET.get('page', 1))
+        page_size = parse_page_size(request.GET.get('page_size', 8))
+        fields = parse_fields(request.GET.get('fields'))
+        min_price = request.GET.get('min_price')
+        price = parse_min_price(min_price)
+    except (InvalidFields, InvalidParameter) as error:
+        return Response({'error': str(error)}, status=400)
+
+    store = request.GET.get('store')
+    deals = filter_deals(Deal.objects.live(), store, price)
+    deals = order_by_relevance(search_deals(deals, q, max_ranked=max_ranked_matches()))
+
+    start, end = page_bounds(page, page_size)
+    page_deals = deal_rows(deals[start:end + 1], 'relevance', fields=fields)
+    rows = [row for row, _ in page_deals[:page_size]]
+    results = [
+        {**data, 'relevance': round(relevance, 4)}
+        for data, (_, (relevance,)) in zip(deal_data(rows, fields), page_deals)
+    ]
+
+    return Response({
+        'q': q,
+        'page': page,
+        'page_size': page_size,
+        'has_next': len(page_deals) > page_size,
+        'has_previous': page > 1,
+        'deals': results,
+        'filters_applied': {'store': store, 'min_price': min_price}
+    })
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+# Id dello store e pg_trgm: la query dei deal è eseguita durante lo streaming, dopo la vista
+@query_budget('dealsExport', 2)
+def deals_export(request):
+    """
+    Tutti i deal dei filtri di dealsFiltered (store, min_price, q, ordering, fields) in un'unica
+    risposta in streaming, NDJSON o CSV con output=csv (vedi app/export.py): per chi deve
+    scaricare l'intero risultato invece di scorrerlo 50 deal per volta. Nessun conteggio e
+    nessuna cache delle risposte.
+    """
+    export_format = request.GET.get('output', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return Response({'error': f'output must be one of: {", ".join(EXPORT_FORMATS)}'}, status=400)
+    try:
+        fields = parse_fields(request.GET.get('fields'))
+        q = parse_query(request.GET.get('q'))
+        min_price = parse_min_price(request.GET.get('min_price'))
+    except (InvalidFields, InvalidParameter) as error:
+        return Response({'error': str(error)}, status=400)
+    deals = filter_deals(Deal.objects.live(), request.GET.get('store'), min_price)
+    if q:
+        deals = search_deals(deals, q)
+
+    _, ordering = parse_ordering(request.GET.get('ordering'), q)
+    deals = order_by_relevance(deals) if ordering == 'relevance' else order_deals(deals, ordering)
+
+    chunks = export_chunks(deals, export_format, fields)
+    if isinstance(request._request, ASGIRequest):
+        chunks = aiter_chunks(chunks)
+    response = StreamingHttpResponse(chunks, content_type=EXPORT_FORMATS[export_format])
+    response['Content-Disposition'] = f'attachment; filename="deals.{export_format}"'
+    return response
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@renderer_classes([FastJSONRenderer])
+# Con deal_ids: versione dei dati, updated_at dei deal, deal non in cache
+@query_budget('dealDetail', 3)
+@conditional_response('dealDetail')
+@cached_response('dealDetail')
 def deal_detail(request):
     """
-    Dettagli di un singolo deal
+    Dettagli di un singolo deal, o di più deal con deal_ids=a,b,c (vedi app/deal_details.py):
+    nell'ordine richiesto, con gli id non trovati in missing invece di un 404.
+    Con fields=a,b,c solo quei campi, anche nella query.
     """
+    try:
+        fields = parse_fields(request.GET.get('fields'))
+    except InvalidFields as error:
+        return Response({'error': str(error)}, status=400)
+
+    deal_ids = request.GET.get('deal_ids')
+    if deal_ids is not None:
+        deal_ids = parse_deal_ids(deal_ids)
+        if not deal_ids:
+            return Response({'error': 'deal_ids parameter required'}, status=400)
+        if len(deal_ids) > MAX_DEAL_IDS:
+            return Response({'error': f'At most {MAX_DEAL_IDS} deal_ids per request'}, status=400)
+        deals, missing = deal_details(deal_ids, fields)
+        return Response({
+            'deals': deals,
+            'missing': missing
+        })
+
     deal_id = request.GET.get('deal_id')
     if not deal_id:
         return JsonResponse({'error': 'deal_id parameter required'}, status=400)
 
-    deal = get_object_or_404(Deal, deal_id=deal_id)
+    if fields is not None:
+        rows = deal_rows(Deal.objects.live().filter(deal_id=deal_id), fields=fields)
+        if not rows:
+            raise Http404
+        return Response({
+            'deal': deal_data(rows)[0]
+        })
+
+    deal = get_object_or_404(Deal.objects.live(), deal_id=deal_id)
     
     serializer = DealSerializer(deal)
     return Response({
@@ -228,22 +392,72 @@ def deal_detail(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@query_budget('dealPriceHistory', 1)
+def deal_price_history(request):
+    """
+    Storico dei prezzi di un deal, dal più vecchio al più recente; una sola query
+    sull'indice (deal_id, captured_at) delle partizioni mensili
+    """
+    deal_id = request.GET.get('deal_id')
+    if not deal_id:
+        return JsonResponse({'error': 'deal_id parameter required'}, status=400)
+
+    snapshots = DealPriceSnapshot.objects.filter(deal_id=deal_id).order_by('captured_at').values(
+        'sale_price', 'normal_price', 'captured_at'
+    )
+    serializer = DealPriceSnapshotSerializer(snapshots, many=True)
+    return Response({
+        'deal_id': deal_id,
+        'history': serializer.data
+    })
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@query_budget('filtersData', 2)
+@conditional_response('filtersData')
+@cached_response('filtersData')
 def filters_data(request):
-    from django.db.models import Min, Max
-    
-    stores = Deal.objects.values('store_name').values_list('store_name', flat=True )
-    stores = set(stores)
-    list(dict.fromkeys(stores))
-    sale_prices = Deal.objects.values('sale_price').values_list('sale_price', flat=True )
-    sale_prices = sorted(set(sale_prices))
+    """
+    Dati per i filtri calcolati con una sola query aggregata (vedi app/filter_stats.py);
+    stores e prices restano per il frontend, prices sono gli estremi inferiori dell'istogramma
+    """
+    try:
+        buckets = int(request.GET.get('buckets', price_buckets()))
+        if not 1 <= buckets <= MAX_PRICE_BUCKETS:
+            raise ValueError(buckets)
+    except ValueError:
+        return Response({'error': f'buckets must be between 1 and {MAX_PRICE_BUCKETS}'}, status=400)
 
+    summary = filters_summary(buckets)
     return Response({
-        'stores': list(stores),
-        'prices': list(sale_prices),
+        'stores': [store['store_name'] for store in summary['stores']],
+        'prices': [bucket['min'] for bucket in summary['price_histogram']],
+        'store_counts': summary['stores'],
+        'min_price': summary['min_price'],
+        'max_price': summary['max_price'],
+        'price_histogram': summary['price_histogram'],
         })
 
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+@query_budget('cacheStats', 1)
+def response_cache_stats(request):
+    """Hit e miss della cache delle risposte e versione corrente dei dati"""
+    return Response({
+        **cache_stats(),
+        'dataset_version': dataset_version().version
+    })
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+@query_budget('dbPoolStats', 1)
+def db_pool_stats(request):
+    """Statistiche del pool di connessioni del processo che risponde e connessioni su Postgres"""
+    return Response(pool_stats())
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@query_budget('admin-exist', 1)
 def admin_exist(request):
     """
     Verifica che non ci siano profili registrati
@@ -0,0 +1,161 @@
+"""
+Benchmark del throughput con richieste concorrenti: l'applicazione WSGI (viste sincrone) chiamata
+da un pool di --threads thread, come un worker WSGI con thread, contro l'applicazione ASGI (viste
+di app/async_views.py) con --concurrency richieste in corso su un solo event loop, come un worker
+di uvicorn. Nessun server HTTP in mezzo: si confrontano gli stack di Django, sugli stessi dati e
+con le stesse richieste. Con --no-cache ogni richiesta arriva al database; --db-latency aggiunge
+a ogni query il tempo di andata e ritorno di un database in rete; --no-pool apre una connessione
+a Postgres per richiesta invece di prenderla dal pool (DATABASE_POOL).
+
+Uso (dalla cartella backend, con Postgres raggiungibile):
+    python -m benchmarks.concurrency --deals 100000 --requests 2000 --threads 8 --concurrency 64 --db-latency 20
+"""
+import argparse
+import asyncio
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.util import setup_testing_defaults
+
+from benchmarks.serialization import seed
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test.utils import setup_databases, teardown_databases
+from rest_framework_simplejwt.tokens import RefreshToken
+from conf.asgi import application as asgi_application
+from conf.wsgi import application as wsgi_application
+
+
+# Richieste a rotazione: pagine e filtri diversi, come un frontend che scorre i deal
+REQUESTS = [
+    ('/api/dealsFiltered', f'page={page}&ordering={ordering}')
+    for page in range(1, 6) for ordering in ('-deal_rating', 'sale_price', 'title')
+] + [
+    ('/api/dealDetail', f'deal_id=D{i}') for i in range(1, 6)
+] + [
+    ('/api/filtersData', ''),
+]
+
+
+def wsgi_request(path, query, token):
+    environ = {
+        'PATH_INFO': path, 'QUERY_STRING': query, 'SERVER_NAME': 'localhost', 'HTTP_HOST': 'localhost',
+        'HTTP_AUTHORIZATION': token, 'wsgi.input': io.BytesIO(),
+    }
+    setup_testing_defaults(environ)
+    statuses = []
+    body = wsgi_application(environ, lambda status, headers: statuses.append(status))
+    try:
+        b''.join(body)
+    finally:
+        body.close()
+    return statuses[0]
+
+
+async def asgi_request(path, query, token):
+    scope = {
+        'type': 'http', 'http_version': '1.1', 'method': 'GET', 'scheme': 'http', 'path': path,
+        'raw_path': path.encode(), 'root_path': '', 'query_string': query.encode(),
+        'headers': [(b'host', b'localhost'), (b'authorization', token.encode())],
+        'server': ('localhost', 80), 'client': ('127.0.0.1', 12345),
+    }
+    messages = []
+    received = False
+
+    async def receive():
+        nonlocal received
+        if received:
+            await asyncio.Event().wait()
+        received = True
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    await asgi_application(scope, receive, send)
+    return messages[0]['status']
+
+
+def add_latency(seconds):
+    """Ogni connessione aperta da qui in poi attende seconds prima di ogni query"""
+    def delay(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    def on_connection(sender, connection, **kwargs):
+        # Il segnale arriva a ogni riconnessione dello stesso oggetto connessione
+        if delay not in connection.execute_wrappers:
+            connection.execute_wrappers.append(delay)
+    connection_created.connect(on_connection, weak=False)
+
+
+def run_wsgi(requests, threads, token):
+    with ThreadPoolExecutor(threads) as pool:
+        return list(pool.map(lambda request: wsgi_request(*request, token), requests))
+
+
+async def run_asgi(requests, concurrency, token):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(request):
+        async with semaphore:
+            return await asgi_request(*request, token)
+    return await asyncio.gather(*(one(request) for request in requests))
+
+
+def measure(label, function, requests):
+    start = time.perf_counter()
+    statuses = function()
+    elapsed = time.perf_counter() - start
+    errors = sum(1 for status in statuses if str(status)[:3] != '200')
+    print(f'{label:>5}: {len(requests) / elapsed:7.0f} richieste/s ({elapsed:.2f}s, {errors} errori)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--deals', type=int, default=100_000)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--no-cache', action='store_true')
+    parser.add_argument('--no-pool', action='store_true')
+    parser.add_argument('--db-latency', type=float, default=0, help='millisecondi per query')
+    args = parser.parse_args()
+
+    # Come in produzione: niente DEBUG (che conserva ogni query) né conteggio delle query
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = ['localhost']
+    settings.QUERY_BUDGET_MODE = None
+    settings.RESPONSE_CACHE_ENABLED = not args.no_cache
+    if args.no_pool:
+        connections['default'].settings_dict['OPTIONS'].pop('pool', None)
+
+    # Database di test usa e getta, come per la suite: i dati reali non vengono toccati
+    config = setup_databases(verbosity=0, interactive=False)
+    try:
+        seed(args.deals)
+        user = get_user_model().objects.create_user(username='benchmark', password='benchmark')
+        token = f'Bearer {RefreshToken.for_user(user).access_token}'
+        requests = [REQUESTS[i % len(REQUESTS)] for i in range(args.requests)]
+        if args.db_latency:
+            add_latency(args.db_latency / 1000)
+
+        # Un giro di riscaldamento per parte: connessioni, cache dei piani e, senza --no-cache, le risposte
+        run_wsgi(REQUESTS, args.threads, token)
+        asyncio.run(run_asgi(REQUESTS, args.concurrency, token))
+
+        print(
+            f'{args.requests} richieste, WSGI con {args.threads} thread, ASGI con {args.concurrency} concorrenti, '
+            f'cache {"no" if args.no_cache else "sì"}, pool {"no" if args.no_pool else "sì"}, '
+            f'latenza del database {args.db_latency:g} ms'
+        )
+        measure('WSGI', lambda: run_wsgi(requests, args.threads, token), requests)
+        measure('ASGI', lambda: asyncio.run(run_asgi(requests, args.concurrency, token)), requests)
+    finally:
+        teardown_databases(config, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
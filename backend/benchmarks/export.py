@@ -0,0 +1,64 @@
+"""
+Benchmark di dealsExport (app/export.py): tempo al primo blocco, tempo totale e memoria di
+picco dell'export NDJSON e CSV di una tabella di deal seminata in un database di test.
+La memoria di picco (tracemalloc) deve restare la stessa al crescere del numero di deal.
+
+Uso (dalla cartella backend, con Postgres raggiungibile):
+    python -m benchmarks.export --deals 1000000
+"""
+import argparse
+import time
+import tracemalloc
+
+from benchmarks.serialization import seed
+from django.test.utils import setup_databases, teardown_databases
+from app.export import EXPORT_FORMATS, export_chunks
+from app.models import Deal
+from app.pagination import order_deals
+
+
+def stream(export_format):
+    """Tempo al primo blocco con dei deal, tempo totale e byte dell'export"""
+    deals = order_deals(Deal.objects.live(), '-deal_rating')
+    start = time.perf_counter()
+    first_chunk = None
+    size = 0
+    for chunk in export_chunks(deals, export_format):
+        if first_chunk is None and chunk.count(b'\n') > 1:
+            first_chunk = time.perf_counter() - start
+        size += len(chunk)
+    total = time.perf_counter() - start
+    return first_chunk or total, total, size
+
+
+def peak_memory(export_format):
+    # In un passaggio separato: tracemalloc rallenta molto l'interprete e falserebbe i tempi
+    tracemalloc.start()
+    stream(export_format)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--deals', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    # Database di test usa e getta, come per la suite: i dati reali non vengono toccati
+    config = setup_databases(verbosity=0, interactive=False)
+    try:
+        seed(args.deals)
+        for export_format in EXPORT_FORMATS:
+            first_chunk, total, size = stream(export_format)
+            peak = peak_memory(export_format)
+            print(
+                f'{export_format:>6}: primo blocco {first_chunk * 1000:.0f} ms, totale {total:.1f}s, '
+                f'{size / 2 ** 20:.0f} MiB, memoria di picco {peak / 2 ** 20:.1f} MiB'
+            )
+    finally:
+        teardown_databases(config, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark della latenza della ricerca per titolo (app/search.py): semina una tabella di deal
+in un database di test, poi misura p50/p95/p99 della prima pagina di ricerca per query
+specifiche, prefissi e parole comuni, come la esegue dealsSearch. Con --max-ranked 0 la
+rilevanza si calcola su tutte le corrispondenze, come prima di SEARCH_MAX_RANKED.
+
+Uso (dalla cartella backend, con Postgres raggiungibile):
+    python -m benchmarks.search_latency --deals 1000000 --repeat 50
+"""
+import argparse
+import os
+import statistics
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'conf.settings')
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.test.utils import setup_databases, teardown_databases  # noqa: E402
+from app.models import Deal, Store  # noqa: E402
+from app.search import max_ranked_matches, order_by_relevance, search_deals, trigram_available  # noqa: E402
+
+
+FIRST_WORDS = ['The', 'Super', 'Dark', 'Space', 'Dragon', 'Legend', 'Witcher', 'Quest', 'War', 'City']
+SECOND_WORDS = ['Hunt', 'Souls', 'Knight', 'Empire', 'Racer', 'Tales', 'Saga', 'Zero', 'Rise', 'Fall']
+
+QUERIES = {
+    'titolo esatto': 'Witcher Souls 4821',
+    'prefissi': 'witch soul',
+    'parola comune': 'dragon',
+    'errore di battitura': 'wticher',
+}
+
+
+def seed(count):
+    Store.objects.create(store_id=1, store_name='Steam')
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO deals (deal_id, thumb, title, store_id, store_name, sale_price, normal_price,"
+            "  deal_rating, expired_at, created_at, updated_at) "
+            "SELECT 'D' || i, '', (%s::text[])[i %% 10 + 1] || ' ' || (%s::text[])[i / 10 %% 10 + 1] || ' ' || i,"
+            "  1, 'Steam', (i %% 5000) / 100.0, 60, (i %% 101) / 10.0,"
+            "  CASE WHEN i %% 20 = 0 THEN now() END, now(), now() "
+            "FROM generate_series(1, %s) AS i",
+            [FIRST_WORDS, SECOND_WORDS, count]
+        )
+        # Come farebbe autovacuum: svuota la pending list degli indici GIN dopo l'inserimento
+        cursor.execute('VACUUM ANALYZE deals')
+
+
+def percentile(samples, fraction):
+    return sorted(samples)[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--deals', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--page-size', type=int, default=8)
+    parser.add_argument('--max-ranked', type=int, default=max_ranked_matches())
+    args = parser.parse_args()
+
+    # Database di test usa e getta, come per la suite: i dati reali non vengono toccati
+    config = setup_databases(verbosity=0, interactive=False)
+    try:
+        start = time.perf_counter()
+        seed(args.deals)
+        print(f'{args.deals} deal seminati in {time.perf_counter() - start:.1f}s, pg_trgm: {trigram_available()}')
+
+        for label, text in QUERIES.items():
+            deals = order_by_relevance(search_deals(Deal.objects.live(), text, max_ranked=args.max_ranked))
+            samples = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                list(deals.all()[:args.page_size + 1])
+                samples.append((time.perf_counter() - start) * 1000)
+            print(
+                f'{label:>20}: p50 {statistics.median(samples):.1f} ms, '
+                f'p95 {percentile(samples, 0.95):.1f} ms, p99 {percentile(samples, 0.99):.1f} ms'
+            )
+    finally:
+        teardown_databases(config, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
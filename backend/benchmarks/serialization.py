@@ -0,0 +1,98 @@
+"""
+Benchmark della serializzazione di una pagina di deal: DealSerializer con JSONRenderer
+contro le righe compatte di app/deal_rows.py con FastJSONRenderer (orjson se installato).
+Misura lettura dal database, conversione e codifica JSON, come nelle viste; DealSerializer
+anche con select_related('store'), per separare il guadagno della serializzazione da quello
+della query per store di ogni deal.
+
+Uso (dalla cartella backend, con Postgres raggiungibile):
+    python -m benchmarks.serialization --repeat 200
+"""
+import argparse
+import os
+import statistics
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'conf.settings')
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.test.utils import setup_databases, teardown_databases  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+from app.deal_rows import deal_data, deal_rows  # noqa: E402
+from app.models import Deal, Store  # noqa: E402
+from app.pagination import order_deals  # noqa: E402
+from app.renderers import FastJSONRenderer, orjson  # noqa: E402
+from app.serializers import DealSerializer  # noqa: E402
+
+
+PAGE_SIZES = (8, 50, 1000)
+
+
+def seed(count):
+    Store.objects.create(store_id=1, store_name='Steam')
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO deals (deal_id, thumb, title, store_id, store_name, sale_price, normal_price,"
+            "  deal_rating, steam_app_id, steam_rating_text, metacritic_score, release_date, last_change,"
+            "  created_at, updated_at) "
+            "SELECT 'D' || i, 'https://example.com/thumbs/' || i || '.jpg', 'Benchmark Game ' || i, 1, 'Steam',"
+            "  (i %% 5000) / 100.0, 60, (i %% 101) / 10.0, i, 'Very Positive', i %% 100,"
+            "  now() - make_interval(days => i %% 10000), now(), now(), now() "
+            "FROM generate_series(1, %s) AS i",
+            [count]
+        )
+        cursor.execute('ANALYZE deals')
+
+
+# all(): ogni misura esegue di nuovo la query invece di riusare la cache del queryset
+def serializer_page(deals):
+    return JSONRenderer().render({'deals': DealSerializer(list(deals.all()), many=True).data})
+
+
+def joined_serializer_page(deals):
+    # Senza la query per store di ogni deal: separa il costo della serializzazione da quello delle query
+    return JSONRenderer().render({'deals': DealSerializer(list(deals.select_related('store')), many=True).data})
+
+
+def rows_page(deals):
+    return FastJSONRenderer().render({'deals': deal_data(deal_rows(deals.all()))})
+
+
+def measure(function, deals, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(deals)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=100)
+    args = parser.parse_args()
+
+    # Database di test usa e getta, come per la suite: i dati reali non vengono toccati
+    config = setup_databases(verbosity=0, interactive=False)
+    try:
+        seed(max(PAGE_SIZES))
+        print(f'orjson: {"sì" if orjson else "no"}')
+        for page_size in PAGE_SIZES:
+            deals = order_deals(Deal.objects.all(), '-deal_rating')[:page_size]
+            assert serializer_page(deals) == rows_page(deals)
+            before = measure(serializer_page, deals, args.repeat)
+            joined = measure(joined_serializer_page, deals, args.repeat)
+            after = measure(rows_page, deals, args.repeat)
+            print(
+                f'{page_size:>5} deal: DealSerializer {before:.2f} ms, con select_related {joined:.2f} ms, '
+                f'righe compatte {after:.2f} ms ({before / after:.1f}x, {joined / after:.1f}x)'
+            )
+    finally:
+        teardown_databases(config, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark della memoria di picco nel parsing di una pagina di deal: response.json()
+con tutti gli oggetti Deal in memoria contro la pipeline in streaming a blocchi.
+
+Uso (dalla cartella backend):
+    python -m benchmarks.stream_memory --deals 200000 --batch-size 500
+"""
+import argparse
+import gc
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'conf.settings')
+django.setup()
+
+from app.ingestion import build_deal, iter_json_array  # noqa: E402
+from app.models import Store  # noqa: E402
+
+
+def write_payload(path, count):
+    with open(path, 'w') as payload:
+        payload.write('[')
+        for i in range(count):
+            if i:
+                payload.write(',')
+            json.dump({
+                'dealID': f'DEAL{i:08d}',
+                'title': f'Benchmark Game {i}',
+                'storeID': '1',
+                'salePrice': '4.99',
+                'normalPrice': '19.99',
+                'dealRating': '8.0',
+                'thumb': f'https://example.com/thumbs/{i}.jpg',
+                'metacriticScore': '80',
+                'releaseDate': '1640995200',
+                'lastChange': '1640995200',
+            }, payload)
+        payload.write(']')
+
+
+def read_chunks(path, chunk_size=64 * 1024):
+    with open(path, 'rb') as payload:
+        while chunk := payload.read(chunk_size):
+            yield chunk
+
+
+def load_all(path, store, batch_size):
+    # Percorso classico: tutto il payload e tutti gli oggetti Deal in memoria
+    with open(path, 'rb') as payload:
+        deals_data = json.loads(payload.read())
+    deals = [build_deal(deal_data, store) for deal_data in deals_data]
+    return len(deals)
+
+
+def stream(path, store, batch_size):
+    # Pipeline in streaming: al massimo un blocco di oggetti Deal alla volta
+    count = 0
+    batch = []
+    for deal_data in iter_json_array(read_chunks(path)):
+        batch.append(build_deal(deal_data, store))
+        if len(batch) >= batch_size:
+            count += len(batch)
+            batch = []
+    return count + len(batch)
+
+
+def measure(function, *args):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    count = function(*args)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return count, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--deals', type=int, default=100_000)
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    store = Store(store_id=1, store_name='Steam')
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'deals.json')
+        write_payload(path, args.deals)
+        size = os.path.getsize(path) / 1024 / 1024
+        print(f'Payload: {args.deals} deals, {size:.1f} MB')
+
+        for name, function in (('response.json()', load_all), ('streaming', stream)):
+            count, elapsed, peak = measure(function, path, store, args.batch_size)
+            print(f'{name:>16}: {count} deals in {elapsed:.2f}s, peak {peak / 1024 / 1024:.1f} MB')
+
+
+if __name__ == '__main__':
+    main()
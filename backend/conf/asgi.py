@@ -9,8 +9,25 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'conf.settings')
 
-application = get_asgi_application()
+# URL di ASGI_URLCONF: sotto ASGI gli endpoint in lettura usano le viste asincrone
+ASGI_URLCONF = 'conf.asgi_urls'
+
+
+class AsyncViewsHandler(ASGIHandler):
+    """ASGIHandler che risolve le URL con ASGI_URLCONF invece di ROOT_URLCONF"""
+
+    def create_request(self, scope, body_file):
+        request, error_response = super().create_request(scope, body_file)
+        if request is not None:
+            request.urlconf = ASGI_URLCONF
+        return request, error_response
+
+
+# Come get_asgi_application(), con l'handler qui sopra
+django.setup(set_prefix=False)
+application = AsyncViewsHandler()
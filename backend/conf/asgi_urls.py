@@ -0,0 +1,11 @@
+"""
+URL sotto ASGI (vedi conf/asgi.py): le stesse di conf/urls.py, con le versioni asincrone
+degli endpoint in lettura di app/async_urls.py
+"""
+from django.contrib import admin
+from django.urls import path, include
+
+urlpatterns = [
+    path('admin/', admin.site.urls),
+    path('api/', include('app.async_urls')),
+]
@@ -41,6 +41,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework_simplejwt',
     'rest_framework_simplejwt.token_blacklist',
@@ -57,6 +58,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'app.db_pool.PoolTimeoutMiddleware',
 ]
 
 ROOT_URLCONF = 'conf.urls'
@@ -82,6 +84,17 @@ WSGI_APPLICATION = 'conf.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Pool di connessioni per processo (psycopg_pool.ConnectionPool): ogni worker apre da min_size a
+# max_size connessioni, quindi worker * max_size deve restare sotto max_connections di Postgres
+# (vedi /api/dbPoolStats). Una richiesta che non ottiene una connessione entro timeout secondi
+# riceve un 503 (app/db_pool.py); le connessioni inattive da max_idle secondi vengono chiuse
+DATABASE_POOL = {
+    'min_size': 2,
+    'max_size': 10,
+    'timeout': 5,
+    'max_idle': 600,
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -90,6 +103,14 @@ DATABASES = {
         'PASSWORD': 'password123',
         'HOST': '127.0.0.1',
         'PORT': '5432',
+        # Connessioni prese dal pool di psycopg (DATABASE_POOL) e restituite a fine richiesta;
+        # col pool CONN_MAX_AGE deve restare 0. Con i controlli di salute attivi ogni connessione
+        # viene verificata quando esce dal pool, e una caduta nel frattempo viene sostituita
+        'CONN_MAX_AGE': 0,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'pool': DATABASE_POOL,
+        },
     }
 }
 
@@ -163,3 +184,54 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
     'ROTATE_REFRESH_TOKENS': True,
 }
+
+# CheapShark HTTP client (app/cheapshark.py)
+CHEAPSHARK_CLIENT = {
+    'CONNECT_TIMEOUT': 5,
+    'READ_TIMEOUT': 30,
+    'MAX_RETRIES': 4,
+    'BACKOFF_FACTOR': 0.5,
+    'BACKOFF_MAX': 30,
+    'RETRY_AFTER_MAX': 120,
+    'REQUESTS_PER_SECOND': 4.0,
+    'POOL_SIZE': 10,
+    'CIRCUIT_FAILURE_THRESHOLD': 5,
+    'CIRCUIT_RESET_TIMEOUT': 60,
+}
+
+# Deal per store mostrati agli utenti non autenticati (app/featured.py)
+FEATURED_DEALS_PER_STORE = 1
+
+# Cache delle risposte delle API in lettura (app/response_cache.py), invalidata da fetch_deals
+# incrementando la versione dei dati. Con più processi conviene un backend condiviso, ad esempio
+# 'django.core.cache.backends.filebased.FileBasedCache' con LOCATION una cartella, oppure
+# 'django.core.cache.backends.redis.RedisCache' verso Redis o un server compatibile (Valkey, KeyDB)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'dealsfinder-responses',
+        'TIMEOUT': 24 * 60 * 60,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+RESPONSE_CACHE_ALIAS = 'responses'
+RESPONSE_CACHE_ENABLED = True
+
+# Intervalli dell'istogramma dei prezzi restituito da filtersData (app/filter_stats.py)
+FILTERS_PRICE_BUCKETS = 10
+
+# Con count=estimated, dealsFiltered restituisce la stima del planner oltre questo numero di righe (app/counts.py)
+ESTIMATED_COUNT_THRESHOLD = 10000
+
+# dealsSearch calcola la rilevanza solo sulle prime corrispondenze lette dagli indici (app/search.py)
+SEARCH_MAX_RANKED = 1000
+
+# Deal letti per volta dal cursor lato server di dealsExport (app/export.py)
+DEALS_EXPORT_CHUNK_SIZE = 2000
+
+# Budget di query degli endpoint (app/query_budget.py): in sviluppo un warning nel log, nei test
+# un errore (tests/conftest.py), in produzione le query non vengono contate
+QUERY_BUDGET_MODE = 'log' if DEBUG else None
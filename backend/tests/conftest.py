@@ -0,0 +1,16 @@
+import pytest
+from django.core.cache import caches
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    # La versione dei dati torna la stessa a ogni test (rollback): la cache non deve sopravvivere
+    for cache in caches.all(initialized_only=True):
+        cache.clear()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def enforce_query_budgets(settings):
+    # Un endpoint che supera il suo budget di query fa fallire il test (vedi app/query_budget.py)
+    settings.QUERY_BUDGET_MODE = 'raise'
@@ -0,0 +1,157 @@
+import io
+from decimal import Decimal
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import resolve, reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from app.async_urls import ASYNC_VIEWS
+from app.models import Store, Deal, FeaturedDeal
+from app.response_cache import cache_stats
+from conf.asgi import ASGI_URLCONF, AsyncViewsHandler
+
+
+def create_catalog():
+    steam = Store.objects.create(store_id=1, store_name='Steam')
+    gog = Store.objects.create(store_id=7, store_name='GOG')
+    for i in range(12):
+        store = steam if i % 3 else gog
+        Deal.objects.create(
+            deal_id=f'D{i}', title=f'Portal {i}' if i % 2 else f'Doom {i}', store=store,
+            store_name=store.store_name, sale_price=Decimal(i), normal_price=Decimal('20.00'),
+            deal_rating=Decimal(i % 5), thumb=f'https://example.com/{i}.jpg'
+        )
+    Deal.objects.filter(deal_id='D11').update(expired_at=timezone.now())
+    FeaturedDeal.objects.create(
+        deal_id='D1', store_id=1, rank=1, title='Portal 1', store_name='Steam',
+        sale_price=Decimal('1.00'), normal_price=Decimal('20.00'), thumb=''
+    )
+
+
+class AsyncViewsTest(TestCase):
+    # Ogni richiesta passa anche per i budget di query, in modalità 'raise' (tests/conftest.py)
+
+    def setUp(self):
+        create_catalog()
+        self.user = get_user_model().objects.create_user(username='testuser', password='testpass123')
+        self.token = f'Bearer {RefreshToken.for_user(self.user).access_token}'
+        self.sync_client = APIClient()
+
+    def sync_get(self, url, params, headers):
+        return self.sync_client.get(url, params, headers=headers)
+
+    def async_get(self, url, params, headers):
+        with override_settings(ROOT_URLCONF=ASGI_URLCONF):
+            return async_to_sync(self.async_client.get)(url, params, headers=headers)
+
+    def assertSameResponse(self, url, params, headers):
+        expected = self.sync_get(url, params, headers)
+        response = self.async_get(url, params, headers)
+        # Corpo confrontato come JSON: qualche errore della vista sincrona è un JsonResponse, con gli spazi
+        self.assertEqual(
+            (response.status_code, response.json() if response.content else None),
+            (expected.status_code, expected.json() if expected.content else None)
+        )
+        for header in ('Content-Type', 'ETag', 'Cache-Control', 'WWW-Authenticate'):
+            self.assertEqual(response.get(header), expected.get(header), header)
+        return response
+
+    @override_settings(RESPONSE_CACHE_ENABLED=False)
+    def test_async_views_answer_like_the_sync_ones(self):
+        authorized = {'Authorization': self.token}
+        for url, params, headers in (
+            (reverse('deals_list'), {}, {}),
+            (reverse('deals_list'), {}, authorized),
+            (reverse('deals_list'), {'page': 2, 'fields': 'title,sale_price'}, authorized),
+            (reverse('deals_list'), {'cursor': ''}, authorized),
+            (reverse('deals_list'), {'page': 'x'}, authorized),
+            (reverse('deals_list'), {'page': 0}, authorized),
+            (reverse('deals_list'), {'page': -3, 'cursor': ''}, authorized),
+            (reverse('deals_list_filtered'), {'store': 'Steam', 'min_price': '2', 'ordering': 'title'}, authorized),
+            (reverse('deals_list_filtered'), {'q': 'portal', 'page_size': 3, 'page': 2}, authorized),
+            (reverse('deals_list_filtered'), {'count': 'estimated', 'fields': 'deal_id'}, authorized),
+            (reverse('deals_list_filtered'), {'cursor': '', 'ordering': 'sale_price', 'page_size': 4}, authorized),
+            (reverse('deals_list_filtered'), {'cursor': 'nope'}, authorized),
+            (reverse('deals_list_filtered'), {'page_size': 0}, authorized),
+            (reverse('deals_list_filtered'), {'page': 0}, authorized),
+            (reverse('deals_list_filtered'), {'page': -3, 'q': 'doom'}, authorized),
+            (reverse('deals_list_filtered'), {'fields': 'nope'}, authorized),
+            (reverse('deals_list_filtered'), {}, {}),
+            (reverse('deals_list_filtered'), {}, {'Authorization': 'Bearer not-a-token'}),
+            (reverse('deal_detail'), {'deal_id': 'D3'}, authorized),
+            (reverse('deal_detail'), {'deal_id': 'D3', 'fields': 'thumb'}, authorized),
+            (reverse('deal_detail'), {'deal_id': 'D11'}, authorized),
+            (reverse('deal_detail'), {'deal_ids': 'D4,NOPE,D2,D11'}, authorized),
+            (reverse('deal_detail'), {}, authorized),
+            (reverse('filters_data'), {}, authorized),
+            (reverse('filters_data'), {'buckets': 3}, authorized),
+            (reverse('filters_data'), {'buckets': 0}, authorized),
+        ):
+            with self.subTest(url=url, params=params, headers=headers):
+                self.assertSameResponse(url, params, headers)
+
+    def test_pages_before_the_first_are_rejected(self):
+        authorized = {'Authorization': self.token}
+        for url, error in (
+            (reverse('deals_list'), 'Parametro page non valido'),
+            (reverse('deals_list_filtered'), 'Invalid page or page_size parameter'),
+        ):
+            for page in (0, -1):
+                with self.subTest(url=url, page=page):
+                    response = self.async_get(url, {'page': page}, authorized)
+                    self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                    self.assertEqual(response.json(), {'error': error})
+
+    def test_cursor_pages_chain(self):
+        url = reverse('deals_list_filtered')
+        params = {'ordering': 'sale_price', 'page_size': 4, 'fields': 'deal_id'}
+        authorized = {'Authorization': self.token}
+        cursor, deal_ids = '', []
+        while cursor is not None:
+            data = self.async_get(url, {**params, 'cursor': cursor}, authorized).json()
+            deal_ids += [deal['deal_id'] for deal in data['deals']]
+            cursor = data['next_cursor']
+        self.assertEqual(deal_ids, [f'D{i}' for i in range(11)])
+
+    def test_session_authentication(self):
+        self.async_client.force_login(self.user)
+        response = self.async_get(reverse('deals_list'), {}, {})
+        self.assertTrue(response.json()['authenticated'])
+
+    def test_cached_and_conditional_responses(self):
+        url = reverse('deals_list_filtered')
+        authorized = {'Authorization': self.token}
+        first = self.async_get(url, {'ordering': 'title'}, authorized)
+        second = self.async_get(url, {'ordering': 'title'}, authorized)
+
+        self.assertEqual(second.content, first.content)
+        self.assertEqual((cache_stats()['hits'], cache_stats()['misses']), (1, 1))
+        # Stessa chiave della vista sincrona: le due strade condividono cache ed ETag
+        self.assertEqual(self.sync_get(url, {'ordering': 'title'}, authorized).content, first.content)
+        self.assertEqual(cache_stats()['hits'], 2)
+
+        response = self.async_get(url, {'ordering': 'title'}, {**authorized, 'If-None-Match': first['ETag']})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+    def test_only_get_is_allowed(self):
+        with override_settings(ROOT_URLCONF=ASGI_URLCONF):
+            response = async_to_sync(self.async_client.post)(reverse('deals_list'))
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+        self.assertEqual(response.json(), {'detail': 'Method "POST" not allowed.'})
+
+
+class AsgiUrlconfTest(TestCase):
+    def test_asgi_requests_use_the_async_views(self):
+        scope = {'type': 'http', 'method': 'GET', 'path': '/api/deals', 'query_string': b'', 'headers': []}
+        request, error = AsyncViewsHandler().create_request(scope, io.BytesIO())
+        self.assertIsNone(error)
+        self.assertEqual(request.urlconf, ASGI_URLCONF)
+
+        with override_settings(ROOT_URLCONF=ASGI_URLCONF):
+            for name, view in ASYNC_VIEWS.items():
+                with self.subTest(name=name):
+                    self.assertIs(resolve(reverse(name)).func, view)
@@ -0,0 +1,190 @@
+import json
+import requests
+from django.test import TestCase
+from django.core.management import call_command
+from unittest.mock import patch, Mock
+from io import StringIO
+from app.cheapshark import CheapSharkClient, CircuitBreaker, CircuitOpenError, parse_retry_after
+from app.models import Store, HttpValidator
+
+
+def build_response(status_code=200, body=None, headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    response._content = json.dumps(body).encode() if body is not None else b''
+    response._content_consumed = True
+    return response
+
+
+@patch('app.cheapshark.time.sleep')
+class CheapSharkClientTest(TestCase):
+    def make_client(self, *responses, **options):
+        session = Mock()
+        session.get.side_effect = list(responses)
+        options.setdefault('requests_per_second', 0)
+        return CheapSharkClient(session=session, **options), session
+
+    def test_timeouts_are_always_sent(self, mock_sleep):
+        client, session = self.make_client(
+            build_response(200, []), connect_timeout=2, read_timeout=10
+        )
+        client.get('stores')
+
+        self.assertEqual(session.get.call_args.kwargs['timeout'], (2, 10))
+
+    def test_retries_server_errors_with_backoff(self, mock_sleep):
+        client, session = self.make_client(
+            build_response(503), build_response(502), build_response(200, [{'storeID': '1'}])
+        )
+        response = client.get('stores')
+
+        self.assertEqual(response.json(), [{'storeID': '1'}])
+        self.assertEqual(session.get.call_count, 3)
+        self.assertEqual(mock_sleep.call_count, 2)
+        # Backoff con jitter: mai oltre factor * 2^attempt
+        self.assertLessEqual(mock_sleep.call_args_list[1][0][0], 0.5 * 2)
+
+    def test_honours_retry_after_on_429(self, mock_sleep):
+        client, session = self.make_client(
+            build_response(429, headers={'Retry-After': '7'}), build_response(200, [])
+        )
+        client.get('deals')
+
+        mock_sleep.assert_called_once_with(7.0)
+
+    def test_retry_after_is_capped(self, mock_sleep):
+        client, session = self.make_client(
+            build_response(429, headers={'Retry-After': '3600'}), build_response(200, []),
+            retry_after_max=30
+        )
+        client.get('deals')
+
+        mock_sleep.assert_called_once_with(30)
+
+    def test_retries_connection_errors(self, mock_sleep):
+        client, session = self.make_client(
+            requests.ConnectionError('reset'), requests.Timeout('slow'), build_response(200, [])
+        )
+        client.get('deals')
+
+        self.assertEqual(session.get.call_count, 3)
+
+    def test_gives_up_after_max_retries(self, mock_sleep):
+        client, session = self.make_client(
+            *[build_response(500) for _ in range(3)], max_retries=2
+        )
+        with self.assertRaises(requests.HTTPError):
+            client.get('deals')
+        self.assertEqual(session.get.call_count, 3)
+
+    def test_client_errors_are_not_retried(self, mock_sleep):
+        client, session = self.make_client(build_response(404))
+        with self.assertRaises(requests.HTTPError):
+            client.get('deals')
+        self.assertEqual(session.get.call_count, 1)
+
+    def test_circuit_opens_after_repeated_failures(self, mock_sleep):
+        client, session = self.make_client(
+            *[build_response(503) for _ in range(3)],
+            max_retries=2, circuit_failure_threshold=3, circuit_reset_timeout=60
+        )
+        with self.assertRaises(requests.HTTPError):
+            client.get('deals')
+
+        # Il circuito è aperto: la richiesta fallisce senza toccare la rete
+        with self.assertRaises(CircuitOpenError):
+            client.get('deals')
+        self.assertEqual(session.get.call_count, 3)
+
+    def test_circuit_lets_a_probe_through_after_reset_timeout(self, mock_sleep):
+        client, session = self.make_client(
+            build_response(503), build_response(200, []),
+            max_retries=0, circuit_failure_threshold=1, circuit_reset_timeout=0
+        )
+        with self.assertRaises(requests.HTTPError):
+            client.get('deals')
+
+        client.get('deals')
+        self.assertFalse(client.breaker.is_open)
+
+    def test_half_open_circuit_lets_a_single_probe_through(self, mock_sleep):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+
+        breaker.before_request()
+        # La prova è in corso: le altre richieste falliscono senza toccare la rete
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_request()
+
+        breaker.record_failure()
+        self.assertTrue(breaker.is_open)
+        breaker.before_request()
+        breaker.record_success()
+        breaker.before_request()
+        self.assertFalse(breaker.is_open)
+
+    def test_client_errors_do_not_reset_failures(self, mock_sleep):
+        client, session = self.make_client(
+            build_response(503), build_response(404), build_response(503),
+            max_retries=0, circuit_failure_threshold=2, circuit_reset_timeout=60
+        )
+        for _ in range(3):
+            with self.assertRaises(requests.HTTPError):
+                client.get('deals')
+
+        self.assertTrue(client.breaker.is_open)
+
+    def test_conditional_request_uses_stored_validators(self, mock_sleep):
+        client, session = self.make_client(
+            build_response(200, [], headers={'ETag': '"v1"', 'Last-Modified': 'Wed, 01 Jan 2025 00:00:00 GMT'}),
+            build_response(304),
+        )
+        response = client.stores()
+        client.remember_validators('stores', response)
+
+        self.assertIsNone(client.stores())
+        headers = session.get.call_args.kwargs['headers']
+        self.assertEqual(headers['If-None-Match'], '"v1"')
+        self.assertEqual(headers['If-Modified-Since'], 'Wed, 01 Jan 2025 00:00:00 GMT')
+
+    def test_records_latency_per_request(self, mock_sleep):
+        client, session = self.make_client(build_response(503), build_response(200, []))
+        client.get('deals')
+
+        self.assertEqual([stat.status for stat in client.stats], [503, 200])
+        self.assertEqual([stat.attempt for stat in client.stats], [0, 1])
+        self.assertIn('2 requests (1 retries)', client.latency_summary())
+
+    def test_parse_retry_after(self, mock_sleep):
+        self.assertEqual(parse_retry_after('12'), 12.0)
+        self.assertEqual(parse_retry_after('Wed, 01 Jan 2020 00:00:00 GMT'), 0.0)
+        self.assertIsNone(parse_retry_after('soon'))
+        self.assertIsNone(parse_retry_after(None))
+
+
+class FetchStoresConditionalTest(TestCase):
+    @patch('app.cheapshark.requests.Session.get')
+    def test_unchanged_stores_list_is_skipped(self, mock_get):
+        mock_get.side_effect = [
+            build_response(200, [{'storeID': '1', 'storeName': 'Steam', 'isActive': 1}], headers={'ETag': '"v1"'}),
+            build_response(304),
+        ]
+
+        call_command('fetch_deals', '--stores-only', stdout=StringIO())
+        self.assertEqual(HttpValidator.objects.get().etag, '"v1"')
+
+        out = StringIO()
+        call_command('fetch_deals', '--stores-only', stdout=out)
+
+        self.assertEqual(mock_get.call_args.kwargs['headers']['If-None-Match'], '"v1"')
+        self.assertIn('Stores list not modified since last fetch', out.getvalue())
+        self.assertEqual(Store.objects.count(), 1)
+
+    @patch('app.cheapshark.requests.Session.get')
+    def test_validators_not_saved_when_processing_fails(self, mock_get):
+        mock_get.return_value = build_response(200, [{'storeID': 'not-a-number'}], headers={'ETag': '"v1"'})
+
+        with self.assertRaises(Exception):
+            call_command('fetch_deals', '--stores-only', stdout=StringIO())
+        self.assertFalse(HttpValidator.objects.exists())
@@ -0,0 +1,71 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.test import APITestCase
+from app.models import Store, Deal, DatasetVersion
+from app.response_cache import bump_dataset_version
+
+
+class ConditionalGetTest(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='testuser', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        store = Store.objects.create(store_id=1, store_name='Steam')
+        Deal.objects.create(
+            deal_id='DEAL1', title='Game 1', store=store, store_name='Steam',
+            sale_price=Decimal('9.99'), normal_price=Decimal('19.99')
+        )
+        self.synced_at = timezone.now() - timedelta(hours=1)
+        DatasetVersion.objects.create(pk=1, version=3, updated_at=self.synced_at)
+
+    def test_validators_are_sent(self):
+        response = self.client.get(reverse('deals_list_filtered'), {'ordering': 'title'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertRegex(response['ETag'], r'^"[0-9a-f]{40}"$')
+        self.assertEqual(response['Last-Modified'], http_date(self.synced_at.timestamp()))
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertIn('Authorization', response['Vary'])
+
+    def test_matching_etag_is_answered_before_any_work(self):
+        url = reverse('deals_list_filtered')
+        etag = self.client.get(url, {'ordering': 'title'})['ETag']
+
+        # Solo la lettura della versione dei dati, niente cache né serializer
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'ordering': 'title'}, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+    def test_etag_depends_on_query_tier_and_version(self):
+        url = reverse('deals_list')
+        etag = self.client.get(url)['ETag']
+
+        self.assertNotEqual(self.client.get(url, {'page': 2})['ETag'], etag)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+        self.client.force_authenticate(user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_dataset_version()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_if_modified_since(self):
+        url = reverse('filters_data')
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=http_date(timezone.now().timestamp()))
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        earlier = http_date((self.synced_at - timedelta(minutes=1)).timestamp())
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=earlier).status_code, status.HTTP_200_OK)
+
+    def test_unauthorized_requests_get_no_304(self):
+        self.client.force_authenticate(user=None)
+        response = self.client.get(reverse('deals_list_filtered'), HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
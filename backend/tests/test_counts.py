@@ -0,0 +1,72 @@
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from unittest.mock import patch
+from app.counts import planner_estimate
+from app.models import Store, Deal
+
+
+class FilteredCountTest(APITestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(username='testuser', password='testpass123')
+        self.client.force_authenticate(user=user)
+        steam = Store.objects.create(store_id=1, store_name='Steam')
+        gog = Store.objects.create(store_id=7, store_name='GOG')
+        for i in range(30):
+            store = steam if i % 3 else gog
+            Deal.objects.create(
+                deal_id=f'D{i:02d}', title=f'Game {i}', store=store, store_name=store.store_name,
+                sale_price=Decimal(i), normal_price=Decimal('60.00')
+            )
+        self.url = reverse('deals_list_filtered')
+
+    def count_queries(self, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, params)
+        return response, [query['sql'] for query in queries if 'COUNT(*)' in query['sql']]
+
+    def test_count_is_shared_by_pages_and_orderings_of_a_filter(self):
+        response, counts = self.count_queries({'store': 'Steam', 'page_size': 5})
+        self.assertEqual((response.data['count'], response.data['count_exact']), (20, True))
+        self.assertEqual(len(counts), 1)
+
+        for params in ({'page': 3}, {'ordering': 'title'}, {'ordering': '-sale_price', 'page': 4}):
+            with self.subTest(params=params):
+                response, counts = self.count_queries({'store': 'Steam', 'page_size': 5, **params})
+                self.assertEqual(response.data['count'], 20)
+                self.assertEqual(response.data['total_pages'], 4)
+                self.assertEqual(counts, [])
+
+        # Un altro filtro ha un altro conteggio
+        response, counts = self.count_queries({'store': 'Steam', 'min_price': '10'})
+        self.assertEqual(response.data['count'], 14)
+        self.assertEqual(len(counts), 1)
+
+    @override_settings(ESTIMATED_COUNT_THRESHOLD=5)
+    def test_estimated_count_above_threshold(self):
+        with patch('app.counts.planner_estimate', return_value=1234) as estimate:
+            response, counts = self.count_queries({'count': 'estimated', 'page_size': 8, 'page': 4})
+
+        estimate.assert_called_once()
+        self.assertEqual(counts, [])
+        self.assertEqual((response.data['count'], response.data['count_exact']), (1234, False))
+        # has_next non dipende dalla stima
+        self.assertFalse(response.data['has_next'])
+        self.assertEqual(len(response.data['deals']), 6)
+
+    def test_small_estimates_are_counted_exactly(self):
+        with patch('app.counts.planner_estimate', return_value=30):
+            response, counts = self.count_queries({'count': 'estimated'})
+
+        self.assertEqual((response.data['count'], response.data['count_exact']), (30, True))
+        self.assertEqual(len(counts), 1)
+
+    def test_planner_estimate(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE deals')
+        self.assertGreater(planner_estimate(Deal.objects.live()), 0)
+        self.assertEqual(planner_estimate(Deal.objects.filter(store_id__in=[])), 0)
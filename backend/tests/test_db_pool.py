@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import OperationalError, connection
+from django.urls import reverse
+from psycopg_pool import ConnectionPool, PoolTimeout
+from rest_framework import status
+from rest_framework.test import APITestCase
+from unittest.mock import patch
+from app.db_pool import connection_pool, is_pool_timeout
+
+
+def pool_timeout_error():
+    # Come lo rilancia Django quando getconn() del pool scade
+    try:
+        with connection.wrap_database_errors:
+            raise PoolTimeout("couldn't get a connection after 5.00 sec")
+    except OperationalError as error:
+        return error
+
+
+class DbPoolTest(APITestCase):
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser(
+            username='admin', password='adminpass123', is_staff=True
+        )
+        self.url = reverse('db_pool_stats')
+
+    def test_connections_come_from_the_configured_pool(self):
+        pool = connection_pool()
+        self.assertIsNotNone(pool)
+        self.assertEqual((pool.min_size, pool.max_size), (
+            settings.DATABASE_POOL['min_size'], settings.DATABASE_POOL['max_size']
+        ))
+        self.assertEqual(pool.timeout, settings.DATABASE_POOL['timeout'])
+        # CONN_HEALTH_CHECKS: ogni connessione viene verificata quando esce dal pool
+        self.assertEqual(pool._check, ConnectionPool.check_connection)
+
+    def test_stats_endpoint_is_admin_only(self):
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+        user = get_user_model().objects.create_user(username='testuser', password='testpass123')
+        self.client.force_authenticate(user=user)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_stats_endpoint(self):
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['pooled'])
+        self.assertEqual(response.data['pool']['pool_max'], settings.DATABASE_POOL['max_size'])
+        self.assertIn('pool_available', response.data['pool'])
+        self.assertGreater(response.data['max_connections'], 0)
+        self.assertGreaterEqual(response.data['database_connections'], 1)
+
+    def test_exhausted_pool_answers_503(self):
+        self.assertTrue(is_pool_timeout(pool_timeout_error()))
+        self.assertFalse(is_pool_timeout(OperationalError('server closed the connection unexpectedly')))
+
+        self.client.force_authenticate(user=self.admin)
+        with patch('app.views.pool_stats', side_effect=pool_timeout_error()):
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(response.json(), {'detail': 'Database busy, retry later'})
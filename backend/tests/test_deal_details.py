@@ -0,0 +1,72 @@
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from app.deal_details import MAX_DEAL_IDS
+from app.models import Store, Deal
+from app.response_cache import bump_dataset_version
+from app.serializers import DealSerializer
+
+
+class DealDetailBatchTest(APITestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(username='testuser', password='testpass123')
+        self.client.force_authenticate(user=user)
+        store = Store.objects.create(store_id=1, store_name='Steam')
+        for deal_id in ('A', 'B', 'C', 'OLD'):
+            Deal.objects.create(
+                deal_id=deal_id, title=f'Game {deal_id}', store=store, store_name='Steam',
+                sale_price=Decimal('4.99'), normal_price=Decimal('9.99')
+            )
+        Deal.objects.filter(deal_id='OLD').update(expired_at=timezone.now())
+        self.url = reverse('deal_detail')
+
+    def get(self, deal_ids):
+        response = self.client.get(self.url, {'deal_ids': deal_ids})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def bump(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_dataset_version()
+
+    def test_deals_keep_the_request_order_and_missing_ids_are_reported(self):
+        data = self.get('C,NOPE,A,OLD,C')
+
+        self.assertEqual([deal['deal_id'] for deal in data['deals']], ['C', 'A'])
+        self.assertEqual(data['missing'], ['NOPE', 'OLD'])
+        self.assertEqual(data['deals'][0], DealSerializer(Deal.objects.get(deal_id='C')).data)
+
+    def test_invalid_lists(self):
+        self.assertEqual(self.client.get(self.url, {'deal_ids': ' , '}).status_code, status.HTTP_400_BAD_REQUEST)
+        too_many = ','.join(f'D{i}' for i in range(MAX_DEAL_IDS + 1))
+        self.assertEqual(self.client.get(self.url, {'deal_ids': too_many}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_deals_are_cached_across_dataset_versions(self):
+        self.get('A,B')
+        self.bump()
+
+        # Versione dei dati e updated_at: i deal arrivano dalla cache
+        with self.assertNumQueries(2):
+            data = self.get('B,A')
+        self.assertEqual([deal['deal_id'] for deal in data['deals']], ['B', 'A'])
+
+        # Solo il deal non in cache viene letto
+        self.bump()
+        with self.assertNumQueries(3):
+            data = self.get('A,C')
+        self.assertEqual([deal['title'] for deal in data['deals']], ['Game A', 'Game C'])
+
+    def test_updated_deals_are_read_again(self):
+        self.get('A')
+        deal = Deal.objects.get(deal_id='A')
+        deal.title = 'Renamed'
+        deal.save()
+        self.bump()
+
+        self.assertEqual(self.get('A')['deals'][0]['title'], 'Renamed')
+
+    def test_single_deal_still_answers_404(self):
+        self.assertEqual(self.client.get(self.url, {'deal_id': 'NOPE'}).status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,140 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from unittest.mock import patch, Mock
+from app.featured import refresh_featured_deals
+from app.models import Store, Deal, IngestionRun
+
+
+def make_deal_data(deal_id, sale_price='9.99'):
+    return {
+        'dealID': deal_id,
+        'title': f'Game {deal_id}',
+        'storeID': '1',
+        'salePrice': sale_price,
+        'normalPrice': '19.99',
+        'dealRating': '8.0',
+        'lastChange': '1640995200',
+    }
+
+
+@patch('app.cheapshark.requests.Session.get')
+class MarkAndSweepTest(TestCase):
+    def setUp(self):
+        Store.objects.create(store_id=1, store_name='Steam', is_active=True)
+
+    def run_fetch(self, mock_get, deal_ids, *options, total_pages=1):
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.headers = {'X-Total-Page-Count': str(total_pages)}
+        mock_response.json.return_value = [make_deal_data(deal_id) for deal_id in deal_ids]
+        mock_get.return_value = mock_response
+        out = StringIO()
+        call_command('fetch_deals', '--deals-only', '--stores', '1', '--rps', '0', *options, stdout=out)
+        return out.getvalue()
+
+    def test_full_sync_expires_unseen_deals(self, mock_get):
+        self.run_fetch(mock_get, ['A', 'B', 'C'])
+        output = self.run_fetch(mock_get, ['A', 'C'], '--full')
+
+        self.assertIn('Expired deals: 1 no longer listed', output)
+        self.assertEqual(list(Deal.objects.live().order_by('deal_id').values_list('deal_id', flat=True)), ['A', 'C'])
+        self.assertIsNotNone(Deal.objects.get(deal_id='B').expired_at)
+        # Anche i deal invariati, non riscritti, sono marcati con l'ultima esecuzione
+        last_run = IngestionRun.objects.order_by('-pk').first()
+        self.assertEqual(Deal.objects.get(deal_id='A').last_seen_run, last_run.pk)
+        self.assertEqual(last_run.expired_count, 1)
+
+    def test_incremental_sync_does_not_expire(self, mock_get):
+        self.run_fetch(mock_get, ['A', 'B'])
+        # Con il watermark la seconda esecuzione usa maxAge e riceve solo i deal cambiati
+        self.run_fetch(mock_get, ['A'])
+
+        self.assertEqual(Deal.objects.live().count(), 2)
+
+    def test_interrupted_walk_does_not_expire(self, mock_get):
+        self.run_fetch(mock_get, ['A', 'B'])
+        self.run_fetch(mock_get, [], '--full', '--max-pages', '1', total_pages=3)
+
+        self.assertEqual(Deal.objects.live().count(), 2)
+
+    def test_expired_deal_comes_back(self, mock_get):
+        self.run_fetch(mock_get, ['A', 'B'])
+        self.run_fetch(mock_get, ['A'], '--full')
+        self.run_fetch(mock_get, ['A', 'B'], '--full')
+
+        self.assertEqual(Deal.objects.live().count(), 2)
+
+
+class PurgeExpiredDealsTest(TestCase):
+    def setUp(self):
+        store = Store.objects.create(store_id=1, store_name='Steam')
+        now = timezone.now()
+        for i in range(5):
+            Deal.objects.create(
+                deal_id=f'OLD{i}', title='Old', store=store, sale_price=Decimal('1.00'),
+                normal_price=Decimal('2.00'), expired_at=now - timedelta(days=40)
+            )
+        Deal.objects.create(
+            deal_id='RECENT', title='Recent', store=store, sale_price=Decimal('1.00'),
+            normal_price=Decimal('2.00'), expired_at=now - timedelta(days=1)
+        )
+        Deal.objects.create(
+            deal_id='LIVE', title='Live', store=store, sale_price=Decimal('1.00'), normal_price=Decimal('2.00')
+        )
+
+    def test_purge_deletes_old_expired_deals_in_batches(self):
+        out = StringIO()
+        call_command('purge_expired_deals', '--batch-size', '2', stdout=out)
+
+        self.assertEqual(sorted(Deal.objects.values_list('deal_id', flat=True)), ['LIVE', 'RECENT'])
+        output = out.getvalue()
+        self.assertIn('Batch 3: 1 expired deals deleted', output)
+        self.assertIn('Expired deals purged: 5 deals', output)
+
+    def test_retention_is_configurable(self):
+        call_command('purge_expired_deals', '--older-than-days', '0', stdout=StringIO())
+        self.assertEqual(list(Deal.objects.values_list('deal_id', flat=True)), ['LIVE'])
+
+
+class ExpiredDealsHiddenTest(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='testuser', password='testpass123')
+        store = Store.objects.create(store_id=1, store_name='Steam')
+        Deal.objects.create(
+            deal_id='LIVE', title='Live', store=store, store_name='Steam',
+            sale_price=Decimal('5.00'), normal_price=Decimal('10.00')
+        )
+        Deal.objects.create(
+            deal_id='GONE', title='Gone', store=store, store_name='Expired Store',
+            sale_price=Decimal('1.00'), normal_price=Decimal('10.00'), expired_at=timezone.now()
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_lists_skip_expired_deals(self):
+        for name in ('deals_list', 'deals_list_filtered'):
+            response = self.client.get(reverse(name))
+            self.assertEqual(response.data['count'], 1)
+            self.assertEqual([deal['deal_id'] for deal in response.data['deals']], ['LIVE'])
+
+    def test_public_list_skips_expired_deals(self):
+        refresh_featured_deals()
+        self.client.force_authenticate(user=None)
+        response = self.client.get(reverse('deals_list'))
+        self.assertEqual(response.data['count'], 1)
+
+    def test_detail_of_expired_deal_is_not_found(self):
+        response = self.client.get(reverse('deal_detail'), {'deal_id': 'GONE'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_filters_ignore_expired_deals(self):
+        response = self.client.get(reverse('filters_data'))
+        self.assertEqual(response.data['stores'], ['Steam'])
+        self.assertEqual(response.data['prices'], [Decimal('5.00')])
@@ -0,0 +1,178 @@
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+from unittest.mock import patch
+from app.deal_rows import InvalidFields, deal_data, deal_rows, parse_fields, with_fields
+from app.models import Store, Deal
+from app.pagination import order_deals
+from app.renderers import FastJSONRenderer
+from app.serializers import DealSerializer
+
+
+def create_deals():
+    steam = Store.objects.create(store_id=1, store_name='Steam')
+    gog = Store.objects.create(store_id=7, store_name='GOG')
+    Deal.objects.create(
+        deal_id='FULL', title='Ōkami HD \u2028 "Edition"', store=steam, store_name='Steam',
+        sale_price=Decimal('9.9'), normal_price=Decimal('19.99'), deal_rating=Decimal('8'),
+        steam_app_id=587620, steam_rating_text='Very Positive', metacritic_score=91,
+        release_date=datetime(2017, 12, 12, 0, 0, tzinfo=dt_timezone.utc),
+        last_change=datetime(2026, 3, 1, 10, 30, 15, 123456, tzinfo=dt_timezone.utc),
+        last_seen_run=12, thumb='https://example.com/okami.jpg'
+    )
+    Deal.objects.create(
+        deal_id='EMPTY', title='Game', store=gog, store_name='GOG',
+        sale_price=Decimal('0'), normal_price=Decimal('0.50')
+    )
+
+
+class DealRowsTest(TestCase):
+    def setUp(self):
+        create_deals()
+        self.deals = order_deals(Deal.objects.all(), 'title')
+
+    def test_data_matches_the_serializer(self):
+        expected = DealSerializer(self.deals, many=True).data
+        self.assertEqual(deal_data(deal_rows(self.deals)), expected)
+        # Stesso ordine delle chiavi, che il JSON conserva
+        self.assertEqual([list(deal) for deal in deal_data(deal_rows(self.deals))], [list(deal) for deal in expected])
+
+    def test_rendered_bytes_match_the_serializer(self):
+        expected = JSONRenderer().render({'deals': DealSerializer(self.deals, many=True).data})
+        data = {'deals': deal_data(deal_rows(self.deals))}
+
+        self.assertEqual(FastJSONRenderer().render(data), expected)
+        with patch('app.renderers.orjson', None):
+            self.assertEqual(FastJSONRenderer().render(data), expected)
+
+    def test_renderer_falls_back_to_drf(self):
+        renderer = FastJSONRenderer()
+        data = {'big': 2 ** 70, 'price': Decimal('1.50'), 'date': datetime(2026, 1, 1, 0, 0, 0, 123456)}
+        self.assertEqual(renderer.render(data), JSONRenderer().render(data))
+        self.assertEqual(
+            renderer.render(data, 'application/json; indent=4'), JSONRenderer().render(data, 'application/json; indent=4')
+        )
+        self.assertEqual(renderer.render(None), b'')
+
+    def test_rows_carry_the_ordering_keys(self):
+        row = deal_rows(self.deals.filter(deal_id='FULL'))[0]
+        self.assertEqual((row.deal_id, row.sale_price, row.store_name, row.store), ('FULL', Decimal('9.90'), 'Steam', 1))
+
+
+class DealListRenderingTest(APITestCase):
+    def setUp(self):
+        create_deals()
+        user = get_user_model().objects.create_user(username='testuser', password='testpass123')
+        self.client.force_authenticate(user=user)
+
+    def test_list_endpoints_return_the_serializer_format(self):
+        expected = DealSerializer(order_deals(Deal.objects.all(), '-deal_rating'), many=True).data
+        for url, params in (
+            (reverse('deals_list'), {}),
+            (reverse('deals_list'), {'cursor': ''}),
+            (reverse('deals_list_filtered'), {}),
+            (reverse('deals_list_filtered'), {'cursor': ''}),
+        ):
+            with self.subTest(url=url, params=params):
+                response = self.client.get(url, params)
+                self.assertIn(b'"deals":' + JSONRenderer().render(expected), response.content)
+
+
+class ParseFieldsTest(TestCase):
+    def test_fields_follow_the_serializer_order(self):
+        self.assertIsNone(parse_fields(None))
+        self.assertEqual(parse_fields(' sale_price,deal_id,,deal_id '), ('deal_id', 'sale_price'))
+
+    def test_unknown_or_empty_fields_are_rejected(self):
+        with self.assertRaisesMessage(InvalidFields, 'Unknown fields: password, search_vector'):
+            parse_fields('deal_id,search_vector,password')
+        with self.assertRaises(InvalidFields):
+            parse_fields(' , ')
+
+    def test_required_fields_are_added_only_to_sparse_fieldsets(self):
+        self.assertIsNone(with_fields(None, 'deal_id'))
+        self.assertEqual(with_fields(('title',), 'deal_rating', 'deal_id'), ('deal_id', 'title', 'deal_rating'))
+
+
+class SparseRowsTest(TestCase):
+    def setUp(self):
+        create_deals()
+        self.deals = order_deals(Deal.objects.all(), 'title')
+
+    def test_only_the_requested_columns_are_read(self):
+        with CaptureQueriesContext(connection) as queries:
+            rows = deal_rows(self.deals, fields=('deal_id', 'sale_price'))
+        select = queries[0]['sql'].split(' FROM ')[0]
+        self.assertIn('"sale_price"', select)
+        self.assertNotIn('"thumb"', select)
+        self.assertNotIn('"title"', select)
+        self.assertEqual(rows[0]._fields, ('deal_id', 'sale_price'))
+
+    def test_data_is_the_serializer_output_restricted_to_fields(self):
+        fields = ('deal_id', 'sale_price', 'last_change')
+        expected = [
+            {name: deal[name] for name in fields} for deal in DealSerializer(self.deals, many=True).data
+        ]
+        self.assertEqual(deal_data(deal_rows(self.deals, fields=fields)), expected)
+        # Colonne lette in più per il cursor non finiscono nella risposta
+        rows = deal_rows(self.deals, fields=with_fields(fields, 'title'))
+        self.assertEqual(deal_data(rows, fields), expected)
+
+
+class SparseFieldsEndpointTest(APITestCase):
+    def setUp(self):
+        create_deals()
+        user = get_user_model().objects.create_user(username='testuser', password='testpass123')
+        self.client.force_authenticate(user=user)
+
+    def test_list_endpoints_return_only_the_requested_fields(self):
+        for url, params in (
+            (reverse('deals_list'), {}),
+            (reverse('deals_list'), {'cursor': ''}),
+            (reverse('deals_list_filtered'), {}),
+            (reverse('deals_list_filtered'), {'cursor': '', 'ordering': 'title'}),
+            (reverse('deals_search'), {'q': 'game'}),
+        ):
+            with self.subTest(url=url, params=params):
+                response = self.client.get(url, {**params, 'fields': 'sale_price,deal_id'})
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                for deal in response.data['deals']:
+                    self.assertLessEqual(set(deal), {'deal_id', 'sale_price', 'relevance'})
+                    self.assertIn('sale_price', deal)
+
+    def test_cursor_pages_work_without_the_ordering_key(self):
+        url = reverse('deals_list_filtered')
+        params = {'fields': 'title', 'ordering': 'sale_price', 'page_size': 1}
+        first = self.client.get(url, {**params, 'cursor': ''}).data
+        second = self.client.get(url, {**params, 'cursor': first['next_cursor']}).data
+
+        self.assertEqual([first['deals'], second['deals']], [[{'title': 'Game'}], [{'title': 'Ōkami HD   "Edition"'}]])
+        self.assertFalse(second['has_next'])
+
+    def test_deal_detail(self):
+        url = reverse('deal_detail')
+        response = self.client.get(url, {'deal_id': 'FULL', 'fields': 'title,thumb'})
+        self.assertEqual(response.data['deal'], {'title': 'Ōkami HD   "Edition"', 'thumb': 'https://example.com/okami.jpg'})
+        self.assertEqual(
+            self.client.get(url, {'deal_id': 'NOPE', 'fields': 'title'}).status_code, status.HTTP_404_NOT_FOUND
+        )
+
+        data = self.client.get(url, {'deal_ids': 'EMPTY,FULL', 'fields': 'deal_id'}).data
+        self.assertEqual(data['deals'], [{'deal_id': 'EMPTY'}, {'deal_id': 'FULL'}])
+        # La voce in cache con pochi campi non è restituita a chi chiede il deal completo
+        full = self.client.get(url, {'deal_ids': 'EMPTY'}).data['deals'][0]
+        self.assertEqual(full, DealSerializer(Deal.objects.get(deal_id='EMPTY')).data)
+
+    def test_invalid_fields(self):
+        for url in (reverse('deals_list'), reverse('deals_list_filtered'), reverse('deal_detail')):
+            with self.subTest(url=url):
+                response = self.client.get(url, {'deal_id': 'FULL', 'fields': 'deal_id,nope'})
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertEqual(response.data, {'error': 'Unknown fields: nope'})
@@ -0,0 +1,89 @@
+import csv
+import io
+import json
+from decimal import Decimal
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from app.models import Store, Deal
+from app.pagination import order_deals
+from app.serializers import DealSerializer
+
+
+class DealsExportTest(APITestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(username='testuser', password='testpass123')
+        self.client.force_authenticate(user=user)
+        steam = Store.objects.create(store_id=1, store_name='Steam')
+        gog = Store.objects.create(store_id=7, store_name='GOG')
+        for i in range(5):
+            Deal.objects.create(
+                deal_id=f'D{i}', title=f'Portal {i}' if i % 2 else f'Doom {i}', store=steam if i < 3 else gog,
+                store_name='Steam' if i < 3 else 'GOG', sale_price=Decimal(i), normal_price=Decimal('20.00'),
+                deal_rating=Decimal(i)
+            )
+        Deal.objects.filter(deal_id='D4').update(expired_at=timezone.now())
+        self.url = reverse('deals_export')
+
+    def get(self, params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return response
+
+    def test_ndjson_has_one_serialized_deal_per_line(self):
+        response = self.get({})
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        expected = DealSerializer(order_deals(Deal.objects.live(), '-deal_rating'), many=True).data
+        self.assertEqual([json.loads(line) for line in lines], json.loads(json.dumps(expected)))
+
+    @override_settings(DEALS_EXPORT_CHUNK_SIZE=2)
+    def test_csv_is_streamed_in_chunks(self):
+        response = self.get({'output': 'csv', 'fields': 'deal_id,sale_price', 'ordering': 'sale_price'})
+
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="deals.csv"')
+        chunks = list(response.streaming_content)
+        # Intestazione e due blocchi da due deal
+        self.assertEqual(len(chunks), 3)
+        rows = list(csv.reader(io.StringIO(b''.join(chunks).decode())))
+        self.assertEqual(rows, [
+            ['deal_id', 'sale_price'], ['D0', '0.00'], ['D1', '1.00'], ['D2', '2.00'], ['D3', '3.00']
+        ])
+
+    def test_filters_of_deals_filtered_apply(self):
+        response = self.get({'store': 'Steam', 'q': 'portal', 'fields': 'deal_id'})
+        self.assertEqual(b''.join(response.streaming_content), b'{"deal_id":"D1"}\n')
+
+        response = self.get({'min_price': '3', 'fields': 'deal_id'})
+        self.assertEqual(b''.join(response.streaming_content), b'{"deal_id":"D3"}\n')
+
+        response = self.get({'output': 'csv', 'store': 'Nope'})
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 1)
+
+    def test_invalid_requests(self):
+        for params in ({'output': 'xml'}, {'fields': 'nope'}, {'q': 'x' * 101}, {'min_price': 'abc'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(self.url, params).status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(DEALS_EXPORT_CHUNK_SIZE=2)
+    def test_export_streams_under_asgi(self):
+        self.async_client.force_login(get_user_model().objects.get())
+
+        async def export():
+            response = await self.async_client.get(self.url, {'fields': 'deal_id', 'ordering': 'sale_price'})
+            self.assertTrue(response.is_async)
+            return [chunk async for chunk in response.streaming_content]
+
+        self.assertEqual(async_to_sync(export)(), [
+            b'{"deal_id":"D0"}\n{"deal_id":"D1"}\n', b'{"deal_id":"D2"}\n{"deal_id":"D3"}\n'
+        ])
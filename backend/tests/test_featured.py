@@ -0,0 +1,135 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.migrations.loader import MigrationLoader
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from unittest.mock import patch, Mock
+from app.featured import refresh_featured_deals
+from app.models import Store, Deal, FeaturedDeal
+
+
+def create_deals(store, count, **fields):
+    start = timezone.now() - timedelta(days=1)
+    for i in range(count):
+        deal = Deal.objects.create(
+            deal_id=f'{store.store_id}-{i}', title=f'{store.store_name} {i}', store=store,
+            store_name=store.store_name, sale_price=Decimal('5.00'), normal_price=Decimal('10.00'), **fields
+        )
+        # created_at è auto_now_add, l'ordine di inserimento va fissato a mano
+        Deal.objects.filter(pk=deal.pk).update(created_at=start + timedelta(minutes=i))
+
+
+class RefreshFeaturedDealsTest(TestCase):
+    def setUp(self):
+        self.steam = Store.objects.create(store_id=1, store_name='Steam')
+        self.gog = Store.objects.create(store_id=7, store_name='GOG')
+        create_deals(self.steam, 4)
+        create_deals(self.gog, 2)
+
+    def test_top_n_per_store_in_insertion_order(self):
+        self.assertEqual(refresh_featured_deals(3), 5)
+
+        self.assertEqual(
+            list(FeaturedDeal.objects.values_list('store_id', 'rank', 'deal_id')),
+            [(1, 1, '1-0'), (1, 2, '1-1'), (1, 3, '1-2'), (7, 1, '7-0'), (7, 2, '7-1')]
+        )
+
+    def test_refresh_replaces_previous_selection(self):
+        refresh_featured_deals(3)
+        Deal.objects.filter(deal_id='1-0').update(expired_at=timezone.now())
+        Store.objects.filter(store_id=7).update(store_name='GOG.com')
+
+        refresh_featured_deals(1)
+
+        self.assertEqual(
+            list(FeaturedDeal.objects.values_list('deal_id', 'store_name')),
+            [('1-1', 'Steam'), ('7-0', 'GOG.com')]
+        )
+
+    @override_settings(FEATURED_DEALS_PER_STORE=2)
+    def test_default_comes_from_settings(self):
+        out = StringIO()
+        call_command('refresh_featured_deals', stdout=out)
+        self.assertEqual(FeaturedDeal.objects.count(), 4)
+        self.assertIn('4 deals, up to 2 per store', out.getvalue())
+
+    @patch('app.cheapshark.requests.Session.get')
+    def test_fetch_deals_refreshes_featured_deals(self, mock_get):
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.headers = {}
+        mock_response.json.return_value = []
+        mock_get.return_value = mock_response
+
+        out = StringIO()
+        call_command('fetch_deals', '--deals-only', '--stores', '1', '--rps', '0', stdout=out)
+
+        # La lettura completa di Steam senza deal li fa scadere tutti, resta solo GOG
+        self.assertEqual(list(FeaturedDeal.objects.values_list('deal_id', flat=True)), ['7-0'])
+        self.assertIn('Featured deals: 1 deals selected', out.getvalue())
+
+
+    @patch('app.cheapshark.requests.Session.get')
+    def test_stores_only_refreshes_store_names(self, mock_get):
+        refresh_featured_deals(1)
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.headers = {}
+        mock_response.json.return_value = [{'storeID': '7', 'storeName': 'GOG.com', 'isActive': 1}]
+        mock_get.return_value = mock_response
+
+        call_command('fetch_deals', '--stores-only', '--rps', '0', stdout=StringIO())
+
+        self.assertEqual(FeaturedDeal.objects.get(deal_id='7-0').store_name, 'GOG.com')
+
+
+class FeaturedDealsMigrationTest(TransactionTestCase):
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate([('app', target)])
+        return executor.loader.project_state([('app', target)]).apps
+
+    def test_migration_populates_featured_deals(self):
+        apps = self.migrate('0013_deal_expiry')
+        self.addCleanup(self.migrate, MigrationLoader(connection).graph.leaf_nodes('app')[0][1])
+        store = apps.get_model('app', 'Store').objects.create(store_id=1, store_name='Steam')
+        apps.get_model('app', 'Deal').objects.create(
+            deal_id='D1', title='Game', store=store, sale_price=Decimal('5.00'), normal_price=Decimal('10.00')
+        )
+
+        apps = self.migrate('0014_featureddeal')
+
+        self.assertEqual(
+            list(apps.get_model('app', 'FeaturedDeal').objects.values_list('deal_id', 'store_name')),
+            [('D1', 'Steam')]
+        )
+
+
+class FeaturedDealsViewTest(APITestCase):
+    def setUp(self):
+        create_deals(Store.objects.create(store_id=1, store_name='Steam'), 3)
+        create_deals(Store.objects.create(store_id=7, store_name='GOG'), 3)
+        refresh_featured_deals(2)
+
+    def test_anonymous_list_is_a_single_query(self):
+        # Oltre alla lettura della versione dei dati, usata da ETag e cache delle risposte
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('deals_list'))
+
+        self.assertFalse(response.data['authenticated'])
+        self.assertEqual(response.data['count'], 4)
+        self.assertEqual(
+            [(deal['deal_id'], deal['store_name']) for deal in response.data['deals']],
+            [('1-0', 'Steam'), ('1-1', 'Steam'), ('7-0', 'GOG'), ('7-1', 'GOG')]
+        )
+        self.assertEqual(
+            set(response.data['deals'][0]),
+            {'deal_id', 'title', 'store_name', 'sale_price', 'normal_price', 'thumb'}
+        )
@@ -0,0 +1,88 @@
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from app.filter_stats import filters_summary
+from app.models import Store, Deal
+
+
+def create_deal(deal_id, store, sale_price, **fields):
+    return Deal.objects.create(
+        deal_id=deal_id, title=deal_id, store=store, store_name=store.store_name,
+        sale_price=Decimal(sale_price), normal_price=Decimal('60.00'), **fields
+    )
+
+
+class FiltersSummaryTest(TestCase):
+    def setUp(self):
+        self.steam = Store.objects.create(store_id=1, store_name='Steam')
+        self.gog = Store.objects.create(store_id=7, store_name='GOG')
+
+    def test_stores_bounds_and_histogram(self):
+        for i, price in enumerate(['0.00', '4.99', '5.00', '9.99', '20.00']):
+            create_deal(f'S{i}', self.steam, price)
+        create_deal('G0', self.gog, '12.50')
+        create_deal('GONE', self.gog, '99.00', expired_at=timezone.now())
+
+        summary = filters_summary(4)
+
+        self.assertEqual(summary['stores'], [
+            {'store_id': 7, 'store_name': 'GOG', 'count': 1},
+            {'store_id': 1, 'store_name': 'Steam', 'count': 5},
+        ])
+        self.assertEqual((summary['min_price'], summary['max_price']), (Decimal('0.00'), Decimal('20.00')))
+        self.assertEqual(
+            [(bucket['min'], bucket['max'], bucket['count']) for bucket in summary['price_histogram']],
+            [
+                (Decimal('0.00'), Decimal('5.00'), 2),
+                (Decimal('5.00'), Decimal('10.00'), 2),
+                (Decimal('10.00'), Decimal('15.00'), 1),
+                # Il massimo finisce nell'ultimo intervallo, non in uno in più
+                (Decimal('15.00'), Decimal('20.00'), 1),
+            ]
+        )
+
+    def test_single_price_and_empty_table(self):
+        self.assertEqual(
+            filters_summary(5), {'stores': [], 'min_price': None, 'max_price': None, 'price_histogram': []}
+        )
+
+        create_deal('S0', self.steam, '7.00')
+        create_deal('S1', self.steam, '7.00')
+        self.assertEqual(
+            filters_summary(5)['price_histogram'], [{'min': Decimal('7.00'), 'max': Decimal('7.00'), 'count': 2}]
+        )
+
+    def test_single_query(self):
+        create_deal('S0', self.steam, '7.00')
+        with self.assertNumQueries(1):
+            filters_summary()
+
+
+class FiltersDataViewTest(APITestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(username='testuser', password='testpass123')
+        self.client.force_authenticate(user=user)
+        steam = Store.objects.create(store_id=1, store_name='Steam')
+        for i in range(100):
+            create_deal(f'S{i}', steam, f'{i}.00')
+
+    def test_response_size_does_not_grow_with_prices(self):
+        response = self.client.get(reverse('filters_data'), {'buckets': 5})
+
+        self.assertEqual(response.data['stores'], ['Steam'])
+        self.assertEqual(response.data['store_counts'], [{'store_id': 1, 'store_name': 'Steam', 'count': 100}])
+        self.assertEqual(
+            response.data['prices'],
+            [Decimal('0.00'), Decimal('19.80'), Decimal('39.60'), Decimal('59.40'), Decimal('79.20')]
+        )
+        self.assertEqual(sum(bucket['count'] for bucket in response.data['price_histogram']), 100)
+
+    def test_invalid_buckets(self):
+        for buckets in ('0', '51', 'many'):
+            with self.subTest(buckets=buckets):
+                response = self.client.get(reverse('filters_data'), {'buckets': buckets})
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
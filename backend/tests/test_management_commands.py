@@ -2,6 +2,7 @@ from django.test import TestCase
 from django.core.management import call_command
 from django.core.management.base import CommandError
 from unittest.mock import patch, Mock, MagicMock
+from urllib.parse import urlparse, parse_qs
 from io import StringIO
 from decimal import Decimal
 from app.models import Store, Deal
@@ -37,10 +38,12 @@ class FetchDealsCommandTest(TestCase):
             }
         ]
 
-    @patch('app.management.commands.fetch_deals.requests.get')
+    @patch('app.cheapshark.requests.Session.get')
     def test_fetch_stores_success(self, mock_get):
         # Mock response
         mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.headers = {}
         mock_response.json.return_value = self.mock_stores_response
         mock_response.raise_for_status.return_value = None
         mock_get.return_value = mock_response
@@ -60,7 +63,7 @@ class FetchDealsCommandTest(TestCase):
         self.assertIn('Created store: Steam', output)
         self.assertIn('Stores fetch completed', output)
 
-    @patch('app.management.commands.fetch_deals.requests.get')
+    @patch('app.cheapshark.requests.Session.get')
     def test_fetch_deals_success(self, mock_get):
         # Create a store first
         store = Store.objects.create(
@@ -71,12 +74,14 @@ class FetchDealsCommandTest(TestCase):
         
         # Mock response
         mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.headers = {}
         mock_response.json.return_value = self.mock_deals_response
         mock_response.raise_for_status.return_value = None
         mock_get.return_value = mock_response
         
         out = StringIO()
-        call_command('fetch_deals', '--deals-only', stdout=out)
+        call_command('fetch_deals', '--deals-only', '--stores', '1', stdout=out)
         
         # Verify deal was created
         self.assertEqual(Deal.objects.count(), 1)
@@ -87,13 +92,16 @@ class FetchDealsCommandTest(TestCase):
         self.assertEqual(deal.metacritic_score, 85)
         
         output = out.getvalue()
-        self.assertIn('Created deal: Test Game', output)
+        self.assertIn('Batch 1: 1 deals processed (1 created, 0 updated, 0 skipped)', output)
+        self.assertIn('Deals fetch completed: 1 created, 0 updated', output)
 
-    @patch('app.management.commands.fetch_deals.requests.get')
+    @patch('app.cheapshark.requests.Session.get')
     def test_fetch_both_stores_and_deals(self, mock_get):
         # Mock responses for both calls
-        def side_effect(url):
+        def side_effect(url, **kwargs):
             mock_response = Mock()
+            mock_response.status_code = 200
+            mock_response.headers = {}
             mock_response.raise_for_status.return_value = None
             if 'stores' in url:
                 mock_response.json.return_value = self.mock_stores_response
@@ -104,7 +112,7 @@ class FetchDealsCommandTest(TestCase):
         mock_get.side_effect = side_effect
         
         out = StringIO()
-        call_command('fetch_deals', stdout=out)
+        call_command('fetch_deals', '--stores', '1', stdout=out)
         
         # Verify both stores and deals were created
         self.assertEqual(Store.objects.count(), 2)
@@ -112,23 +120,23 @@ class FetchDealsCommandTest(TestCase):
         
         output = out.getvalue()
         self.assertIn('Created store: Steam', output)
-        self.assertIn('Created deal: Test Game', output)
+        self.assertIn('Deals fetch completed: 1 created, 0 updated', output)
 
-    @patch('app.management.commands.fetch_deals.requests.get')
+    @patch('app.cheapshark.requests.Session.get')
     def test_fetch_stores_network_error(self, mock_get):
         mock_get.side_effect = Exception('Network error')
         
         with self.assertRaises(CommandError):
             call_command('fetch_deals', '--stores-only')
 
-    @patch('app.management.commands.fetch_deals.requests.get')
+    @patch('app.cheapshark.requests.Session.get')
     def test_fetch_deals_network_error(self, mock_get):
         mock_get.side_effect = Exception('Network error')
         
         with self.assertRaises(CommandError):
             call_command('fetch_deals', '--deals-only')
 
-    @patch('app.management.commands.fetch_deals.requests.get')
+    @patch('app.cheapshark.requests.Session.get')
     def test_update_existing_store(self, mock_get):
         # Create existing store
         Store.objects.create(
@@ -138,6 +146,8 @@ class FetchDealsCommandTest(TestCase):
         )
         
         mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.headers = {}
         mock_response.json.return_value = self.mock_stores_response
         mock_response.raise_for_status.return_value = None
         mock_get.return_value = mock_response
@@ -153,7 +163,7 @@ class FetchDealsCommandTest(TestCase):
         output = out.getvalue()
         self.assertIn('Updated store: Steam', output)
 
-    @patch('app.management.commands.fetch_deals.requests.get')
+    @patch('app.cheapshark.requests.Session.get')
     def test_update_existing_deal(self, mock_get):
         # Create store and existing deal
         store = Store.objects.create(
@@ -172,12 +182,14 @@ class FetchDealsCommandTest(TestCase):
         )
         
         mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.headers = {}
         mock_response.json.return_value = self.mock_deals_response
         mock_response.raise_for_status.return_value = None
         mock_get.return_value = mock_response
         
         out = StringIO()
-        call_command('fetch_deals', '--deals-only', stdout=out)
+        call_command('fetch_deals', '--deals-only', '--stores', '1', stdout=out)
         
         # Verify deal was updated
         deal = Deal.objects.get(deal_id='DEAL123')
@@ -185,9 +197,9 @@ class FetchDealsCommandTest(TestCase):
         self.assertEqual(deal.sale_price, Decimal('19.99'))
         
         output = out.getvalue()
-        self.assertIn('Updated deal: Test Game', output)
+        self.assertIn('Batch 1: 1 deals processed (0 created, 1 updated, 0 skipped)', output)
 
-    @patch('app.management.commands.fetch_deals.requests.get')
+    @patch('app.cheapshark.requests.Session.get')
     def test_deal_with_missing_optional_fields(self, mock_get):
         # Create store first
         Store.objects.create(
@@ -211,12 +223,14 @@ class FetchDealsCommandTest(TestCase):
         }
         
         mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.headers = {}
         mock_response.json.return_value = [deal_data]
         mock_response.raise_for_status.return_value = None
         mock_get.return_value = mock_response
         
         out = StringIO()
-        call_command('fetch_deals', '--deals-only', stdout=out)
+        call_command('fetch_deals', '--deals-only', '--stores', '1', stdout=out)
         
         # Verify deal was created with None values for optional fields
         deal = Deal.objects.get(deal_id='DEAL124')
@@ -225,7 +239,7 @@ class FetchDealsCommandTest(TestCase):
         self.assertIsNone(deal.release_date)
         self.assertIsNone(deal.last_change)
 
-    @patch('app.management.commands.fetch_deals.requests.get')
+    @patch('app.cheapshark.requests.Session.get')
     def test_deal_with_invalid_data_continues_processing(self, mock_get):
         # Create store first
         Store.objects.create(
@@ -244,12 +258,14 @@ class FetchDealsCommandTest(TestCase):
         valid_deal['dealID'] = 'VALID123'
         
         mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.headers = {}
         mock_response.json.return_value = [invalid_deal, valid_deal]
         mock_response.raise_for_status.return_value = None
         mock_get.return_value = mock_response
         
         out = StringIO()
-        call_command('fetch_deals', '--deals-only', stdout=out)
+        call_command('fetch_deals', '--deals-only', '--stores', '1', stdout=out)
         
         # Verify valid deal was created despite invalid one
         self.assertEqual(Deal.objects.count(), 1)
@@ -258,4 +274,282 @@ class FetchDealsCommandTest(TestCase):
         
         output = out.getvalue()
         self.assertIn('Error processing deal INVALID', output)
-        self.assertIn('Created deal: Test Game', output)
\ No newline at end of file
+        self.assertIn('Deals fetch completed: 1 created, 0 updated', output)
+
+    @patch('app.cheapshark.requests.Session.get')
+    def test_deals_written_in_batches(self, mock_get):
+        Store.objects.create(
+            store_id=1,
+            store_name='Steam',
+            is_active=True
+        )
+        
+        deals = []
+        for i in range(5):
+            deal = self.mock_deals_response[0].copy()
+            deal['dealID'] = f'DEAL{i}'
+            deals.append(deal)
+        
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.headers = {}
+        mock_response.json.return_value = deals
+        mock_response.raise_for_status.return_value = None
+        mock_get.return_value = mock_response
+        
+        out = StringIO()
+        call_command('fetch_deals', '--deals-only', '--stores', '1', '--batch-size', '2', stdout=out)
+        
+        self.assertEqual(Deal.objects.count(), 5)
+        output = out.getvalue()
+        self.assertIn('Batch 1: 2 deals processed', output)
+        self.assertIn('Batch 3: 1 deals processed', output)
+        self.assertNotIn('Batch 4', output)
+        self.assertIn('Deals fetch completed: 5 created, 0 updated', output)
+
+    @patch('app.cheapshark.requests.Session.get')
+    def test_duplicate_deals_in_batch_keep_row_by_row_counts(self, mock_get):
+        Store.objects.create(
+            store_id=1,
+            store_name='Steam',
+            is_active=True
+        )
+        
+        first = self.mock_deals_response[0].copy()
+        second = self.mock_deals_response[0].copy()
+        second['salePrice'] = '14.99'
+        
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.headers = {}
+        mock_response.json.return_value = [first, second]
+        mock_response.raise_for_status.return_value = None
+        mock_get.return_value = mock_response
+        
+        out = StringIO()
+        call_command('fetch_deals', '--deals-only', '--stores', '1', stdout=out)
+        
+        # Come nel vecchio percorso: la prima occorrenza crea, la seconda aggiorna
+        deal = Deal.objects.get(deal_id='DEAL123')
+        self.assertEqual(deal.sale_price, Decimal('14.99'))
+        self.assertIn('Deals fetch completed: 1 created, 1 updated', out.getvalue())
+
+    @patch('app.cheapshark.requests.Session.get')
+    def test_update_keeps_created_at(self, mock_get):
+        store = Store.objects.create(
+            store_id=1,
+            store_name='Steam',
+            is_active=True
+        )
+        existing = Deal.objects.create(
+            deal_id='DEAL123',
+            title='Old Title',
+            store=store,
+            store_name='Steam',
+            sale_price=Decimal('9.99'),
+            normal_price=Decimal('19.99')
+        )
+        
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.headers = {}
+        mock_response.json.return_value = self.mock_deals_response
+        mock_response.raise_for_status.return_value = None
+        mock_get.return_value = mock_response
+        
+        call_command('fetch_deals', '--deals-only', '--stores', '1', stdout=StringIO())
+        
+        deal = Deal.objects.get(deal_id='DEAL123')
+        self.assertEqual(deal.created_at, existing.created_at)
+        self.assertGreater(deal.updated_at, existing.updated_at)
+
+class FetchDealsPaginationTest(TestCase):
+    def setUp(self):
+        Store.objects.create(store_id=1, store_name='Steam', is_active=True)
+        Store.objects.create(store_id=7, store_name='GOG', is_active=True)
+        self.requested = []
+
+    def paged_response(self, url, **kwargs):
+        # Ogni store ha 3 pagine con 2 deal ciascuna
+        params = parse_qs(urlparse(url).query)
+        store_id = params['storeID'][0]
+        page_number = params['pageNumber'][0]
+        self.requested.append((store_id, page_number))
+        
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.headers = {}
+        mock_response.raise_for_status.return_value = None
+        mock_response.headers = {'X-Total-Page-Count': '3'}
+        mock_response.json.return_value = [
+            {
+                'dealID': f'DEAL-{store_id}-{page_number}-{i}',
+                'title': f'Game {store_id} {page_number} {i}',
+                'storeID': store_id,
+                'salePrice': '4.99',
+                'normalPrice': '9.99',
+                'dealRating': '7.0',
+            }
+            for i in range(2)
+        ]
+        return mock_response
+
+    @patch('app.cheapshark.requests.Session.get')
+    def test_walks_every_page_of_every_store(self, mock_get):
+        mock_get.side_effect = self.paged_response
+        
+        out = StringIO()
+        call_command('fetch_deals', '--deals-only', '--stores', '1,7', '--rps', '0', stdout=out)
+        
+        self.assertEqual(len(self.requested), 6)
+        self.assertEqual(Deal.objects.count(), 12)
+        self.assertEqual(Deal.objects.filter(store_id=7).count(), 6)
+        self.assertIn('Deals fetch completed: 12 created, 0 updated, 0 skipped from 6 pages', out.getvalue())
+
+    @patch('app.cheapshark.requests.Session.get')
+    def test_max_pages_limits_the_walk(self, mock_get):
+        mock_get.side_effect = self.paged_response
+        
+        out = StringIO()
+        call_command(
+            'fetch_deals', '--deals-only', '--stores', '1,7', '--max-pages', '2', '--rps', '0',
+            stdout=out
+        )
+        
+        self.assertEqual(sorted(self.requested), [('1', '0'), ('1', '1'), ('7', '0'), ('7', '1')])
+        self.assertEqual(Deal.objects.count(), 8)
+
+    @patch('app.cheapshark.requests.Session.get')
+    def test_page_size_is_sent_upstream(self, mock_get):
+        mock_get.side_effect = self.paged_response
+        
+        call_command(
+            'fetch_deals', '--deals-only', '--stores', '1', '--page-size', '25', '--max-pages', '1',
+            stdout=StringIO()
+        )
+        
+        url = mock_get.call_args[0][0]
+        self.assertEqual(parse_qs(urlparse(url).query)['pageSize'], ['25'])
+
+    @patch('app.cheapshark.requests.Session.get')
+    def test_page_error_fails_the_fetch(self, mock_get):
+        def side_effect(url, **kwargs):
+            if 'pageNumber=2' in url:
+                raise Exception('Network error')
+            return self.paged_response(url)
+        
+        mock_get.side_effect = side_effect
+        
+        with self.assertRaises(CommandError):
+            call_command('fetch_deals', '--deals-only', '--stores', '1', '--rps', '0', stdout=StringIO())
+
+    def test_invalid_store_list(self):
+        with self.assertRaises(CommandError):
+            call_command('fetch_deals', '--deals-only', '--stores', 'steam')
+
+
+class RateLimiterTest(TestCase):
+    def test_spaces_out_requests(self):
+        from app.cheapshark import RateLimiter
+        import time
+        
+        limiter = RateLimiter(20)
+        start = time.monotonic()
+        for _ in range(5):
+            limiter.wait()
+        
+        # 5 richieste a 20 rps: la prima subito, le altre distanziate di 50ms
+        self.assertGreaterEqual(time.monotonic() - start, 0.19)
+
+
+class IncrementalSyncTest(TestCase):
+    def setUp(self):
+        self.store = Store.objects.create(store_id=1, store_name='Steam', is_active=True)
+        self.deal_data = {
+            'dealID': 'DEAL123',
+            'title': 'Test Game',
+            'storeID': '1',
+            'salePrice': '19.99',
+            'normalPrice': '29.99',
+            'dealRating': '8.5',
+            'lastChange': '1640995200'
+        }
+
+    def run_fetch(self, mock_get, deals, *args, total_pages='1'):
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.headers = {'X-Total-Page-Count': total_pages}
+        mock_response.json.return_value = deals
+        mock_get.return_value = mock_response
+        
+        out = StringIO()
+        call_command('fetch_deals', '--deals-only', '--stores', '1', '--rps', '0', *args, stdout=out)
+        return out.getvalue()
+
+    @patch('app.cheapshark.requests.Session.get')
+    def test_unchanged_deal_is_not_rewritten(self, mock_get):
+        self.run_fetch(mock_get, [self.deal_data])
+        before = Deal.objects.get(deal_id='DEAL123')
+        
+        output = self.run_fetch(mock_get, [self.deal_data], '--full')
+        
+        after = Deal.objects.get(deal_id='DEAL123')
+        self.assertEqual(after.updated_at, before.updated_at)
+        self.assertIn('Deals fetch completed: 0 created, 0 updated, 1 skipped', output)
+
+    @patch('app.cheapshark.requests.Session.get')
+    def test_price_change_is_written(self, mock_get):
+        self.run_fetch(mock_get, [self.deal_data])
+        
+        changed = dict(self.deal_data, salePrice='9.99')
+        output = self.run_fetch(mock_get, [changed], '--full')
+        
+        self.assertEqual(Deal.objects.get(deal_id='DEAL123').sale_price, Decimal('9.99'))
+        self.assertIn('Deals fetch completed: 0 created, 1 updated, 0 skipped', output)
+
+    @patch('app.cheapshark.requests.Session.get')
+    def test_last_change_is_written(self, mock_get):
+        self.run_fetch(mock_get, [self.deal_data])
+        
+        changed = dict(self.deal_data, lastChange='1641000000')
+        output = self.run_fetch(mock_get, [changed], '--full')
+        
+        self.assertIn('0 created, 1 updated, 0 skipped', output)
+
+    @patch('app.cheapshark.requests.Session.get')
+    def test_watermark_limits_next_fetch(self, mock_get):
+        self.run_fetch(mock_get, [self.deal_data])
+        self.assertNotIn('maxAge', mock_get.call_args[0][0])
+        
+        self.store.refresh_from_db()
+        self.assertIsNotNone(self.store.deals_synced_at)
+        
+        output = self.run_fetch(mock_get, [])
+        self.assertEqual(parse_qs(urlparse(mock_get.call_args[0][0]).query)['maxAge'], ['2'])
+        self.assertIn('Store 1: incremental sync', output)
+
+    @patch('app.cheapshark.requests.Session.get')
+    def test_full_ignores_watermark(self, mock_get):
+        self.run_fetch(mock_get, [self.deal_data])
+        self.run_fetch(mock_get, [self.deal_data], '--full')
+        
+        self.assertNotIn('maxAge', mock_get.call_args[0][0])
+
+    @patch('app.cheapshark.requests.Session.get')
+    def test_truncated_walk_does_not_advance_watermark(self, mock_get):
+        self.run_fetch(mock_get, [self.deal_data], '--max-pages', '1', total_pages='5')
+        
+        self.store.refresh_from_db()
+        self.assertIsNone(self.store.deals_synced_at)
+
+
+class MaxAgeHoursTest(TestCase):
+    def test_rounds_up_with_margin(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from app.ingestion import max_age_hours
+        
+        now = timezone.now()
+        self.assertIsNone(max_age_hours(None, now))
+        self.assertEqual(max_age_hours(now - timedelta(minutes=5), now), 2)
+        self.assertEqual(max_age_hours(now - timedelta(hours=3, minutes=1), now), 5)
@@ -0,0 +1,154 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone as dt_timezone
+from django.test import TestCase, SimpleTestCase
+from django.contrib.admin.sites import AdminSite
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from unittest import skipUnless
+from unittest.mock import patch, Mock
+from io import StringIO
+from app.admin import IngestionRunAdmin
+from app.metrics import IngestionMetrics, prometheus_metrics, write_prometheus_textfile
+from app.models import Store, IngestionRun
+
+
+def deals_response(url, **kwargs):
+    mock_response = Mock()
+    mock_response.status_code = 200
+    mock_response.headers = {'X-Total-Page-Count': '2'}
+    page_number = url.split('pageNumber=')[1].split('&')[0]
+    mock_response.json.return_value = [
+        {
+            'dealID': f'DEAL{page_number}',
+            'title': f'Game {page_number}',
+            'storeID': '1',
+            'salePrice': '9.99',
+            'normalPrice': '19.99',
+            'dealRating': '8.0',
+        },
+        {'dealID': f'BROKEN{page_number}', 'storeID': '1', 'salePrice': 'not a price'},
+    ]
+    return mock_response
+
+
+class IngestionMetricsTest(SimpleTestCase):
+    @patch('app.metrics.time.perf_counter', side_effect=[0, 1, 3, 10, 14, 20])
+    def test_phase_durations_accumulate(self, mock_clock):
+        metrics = IngestionMetrics()
+        with metrics.phase('parse'):
+            pass
+        with metrics.phase('parse'):
+            pass
+        metrics.stop()
+
+        self.assertEqual(metrics.phases['parse'], 6)
+        self.assertEqual(metrics.phases['db_write'], 0)
+        self.assertEqual(metrics.duration, 20)
+
+    @skipUnless(os.access('/proc/self/clear_refs', os.W_OK), 'il picco della memoria residente si azzera solo su Linux')
+    def test_peak_memory_is_measured_per_run(self):
+        first = IngestionMetrics()
+        # Pagine scritte davvero: bytearray(n) da solo non verrebbe mappato in memoria
+        buffer = b'x' * (64 * 1024 * 1024)
+        del buffer
+        first.stop()
+
+        second = IngestionMetrics()
+        second.stop()
+
+        # Il picco della prima esecuzione non si porta nella seconda
+        self.assertGreaterEqual(first.peak_memory_kb - second.peak_memory_kb, 48 * 1024)
+        self.assertGreater(second.peak_memory_kb, 0)
+
+    def test_prometheus_textfile_format(self):
+        run = IngestionRun(
+            status=IngestionRun.STATUS_SUCCESS, finished_at=datetime(2025, 1, 1, tzinfo=dt_timezone.utc),
+            duration_seconds=2.5, db_write_seconds=1.25, created_count=3, peak_memory_kb=2048
+        )
+        text = prometheus_metrics(run.summary())
+
+        self.assertIn('dealsfinder_ingestion_phase_seconds{phase="db_write"} 1.250000\n', text)
+        self.assertIn('dealsfinder_ingestion_deals{outcome="created"} 3\n', text)
+        self.assertIn('dealsfinder_ingestion_success 1\n', text)
+        self.assertIn('dealsfinder_ingestion_peak_memory_bytes 2097152\n', text)
+        self.assertIn('dealsfinder_ingestion_last_run_timestamp_seconds 1735689600.0\n', text)
+        for line in text.splitlines():
+            if not line.startswith('#'):
+                name, value = line.rsplit(' ', 1)
+                float(value)
+
+    def test_textfile_is_replaced_atomically(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'dealsfinder.prom')
+        summary = IngestionRun(finished_at=datetime(2025, 1, 1, tzinfo=dt_timezone.utc)).summary()
+
+        write_prometheus_textfile(path, summary)
+        write_prometheus_textfile(path, summary)
+
+        self.assertEqual(os.listdir(directory), ['dealsfinder.prom'])
+
+
+@patch('app.cheapshark.requests.Session.get', side_effect=deals_response)
+class IngestionRunRecordingTest(TestCase):
+    def setUp(self):
+        Store.objects.create(store_id=1, store_name='Steam', is_active=True)
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_successful_run_is_saved_with_counters(self, mock_get):
+        out = StringIO()
+        call_command('fetch_deals', '--deals-only', '--stores', '1', '--rps', '0', stdout=out)
+
+        run = IngestionRun.objects.get()
+        self.assertEqual(run.status, IngestionRun.STATUS_SUCCESS)
+        self.assertIsNotNone(run.finished_at)
+        self.assertEqual(run.pages, 2)
+        self.assertEqual(run.http_requests, 2)
+        self.assertEqual(run.created_count, 2)
+        self.assertEqual(run.invalid_count, 2)
+        self.assertEqual(run.errors, 2)
+        self.assertGreater(run.peak_memory_kb, 0)
+        self.assertGreaterEqual(
+            run.duration_seconds, run.deal_fetch_seconds + run.parse_seconds + run.db_write_seconds
+        )
+        self.assertEqual(run.options['stores'], [1])
+        self.assertIn('Phases: stores 0.00s, deal fetch', out.getvalue())
+
+    def test_summaries_are_written_on_request(self, mock_get):
+        json_path = os.path.join(self.directory, 'run.json')
+        prom_path = os.path.join(self.directory, 'dealsfinder.prom')
+        call_command(
+            'fetch_deals', '--deals-only', '--stores', '1', '--rps', '0',
+            '--metrics-json', json_path, '--prometheus-textfile', prom_path, stdout=StringIO()
+        )
+
+        with open(json_path) as f:
+            summary = json.load(f)
+        self.assertEqual(summary['id'], IngestionRun.objects.get().pk)
+        self.assertEqual(summary['deals_processed'], 2)
+        self.assertEqual(set(summary['phases']), {'stores', 'deal_fetch', 'parse', 'db_write'})
+        with open(prom_path) as f:
+            self.assertIn('dealsfinder_ingestion_pages 2', f.read())
+
+    def test_failed_run_is_saved(self, mock_get):
+        mock_get.side_effect = ValueError('boom')
+        with self.assertRaises(CommandError):
+            call_command('fetch_deals', '--deals-only', '--stores', '1', '--rps', '0', stdout=StringIO())
+
+        run = IngestionRun.objects.get()
+        self.assertEqual(run.status, IngestionRun.STATUS_FAILED)
+        self.assertIn('boom', run.error_message)
+
+
+class IngestionRunAdminTest(TestCase):
+    def setUp(self):
+        self.admin = IngestionRunAdmin(IngestionRun, AdminSite())
+
+    def test_runs_are_read_only(self):
+        self.assertFalse(self.admin.has_add_permission(None))
+        self.assertIn('db_write_seconds', self.admin.readonly_fields)
+        self.assertIn('errors', self.admin.list_display)
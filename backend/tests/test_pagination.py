@@ -0,0 +1,125 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from app.models import Store, Deal
+from app.pagination import InvalidCursor, decode_cursor, encode_cursor, ordering_keys
+from app.views import ALLOWED_ORDERINGS
+
+
+class KeysetPaginationTest(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='testuser', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        steam = Store.objects.create(store_id=1, store_name='Steam')
+        gog = Store.objects.create(store_id=7, store_name='GOG')
+        start = timezone.now() - timedelta(days=1)
+        # Chiavi ripetute e metacritic_score a NULL per verificare tie-breaker e ordinamento dei NULL
+        for i in range(13):
+            store = steam if i % 2 else gog
+            Deal.objects.create(
+                deal_id=f'D{i:02d}', title=f'Game {i % 4}', store=store, store_name=store.store_name,
+                sale_price=Decimal(f'{i % 3}.99'), normal_price=Decimal('19.99'),
+                deal_rating=Decimal(f'{i % 5}.0'), metacritic_score=None if i % 3 == 0 else 60 + i % 4
+            )
+        Deal.objects.update(created_at=start)
+        Deal.objects.filter(deal_id__in=['D03', 'D04']).update(created_at=start + timedelta(minutes=1))
+        Deal.objects.filter(deal_id='D12').update(expired_at=timezone.now())
+
+    def walk(self, url, params, next_key):
+        deal_ids, cursor = [], ''
+        while cursor is not None:
+            response = self.client.get(url, {**params, 'cursor': cursor})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            deal_ids += [deal['deal_id'] for deal in response.data['deals']]
+            cursor = response.data[next_key]
+        return deal_ids
+
+    def test_every_ordering_walks_all_live_deals_once(self):
+        url = reverse('deals_list_filtered')
+        for ordering in ALLOWED_ORDERINGS:
+            with self.subTest(ordering=ordering):
+                expected = list(
+                    Deal.objects.live().order_by(*ordering_keys(ordering)).values_list('deal_id', flat=True)
+                )
+                self.assertEqual(self.walk(url, {'ordering': ordering, 'page_size': 3}, 'next_cursor'), expected)
+
+    def test_cursor_keeps_filters(self):
+        url = reverse('deals_list_filtered')
+        deal_ids = self.walk(url, {'store': 'Steam', 'min_price': '1', 'page_size': 2}, 'next_cursor')
+        self.assertEqual(
+            sorted(deal_ids),
+            list(Deal.objects.live().filter(store_name='Steam', sale_price__gte=1).order_by('deal_id')
+                 .values_list('deal_id', flat=True))
+        )
+
+    def test_last_page_has_no_next_cursor(self):
+        response = self.client.get(reverse('deals_list_filtered'), {'cursor': '', 'page_size': 50})
+        self.assertEqual(len(response.data['deals']), 12)
+        self.assertFalse(response.data['has_next'])
+        self.assertIsNone(response.data['next_cursor'])
+        self.assertNotIn('count', response.data)
+
+    def test_deals_list_cursor(self):
+        response = self.client.get(reverse('deals_list'), {'cursor': ''})
+        self.assertEqual(len(response.data['deals']), 8)
+        self.assertTrue(response.data['hasNext'])
+
+        deal_ids = self.walk(reverse('deals_list'), {}, 'nextCursor')
+        self.assertEqual(
+            deal_ids,
+            list(Deal.objects.live().order_by('-deal_rating', 'sale_price', '-deal_id').values_list('deal_id', flat=True))
+        )
+        # La paginazione per numero di pagina restituisce lo stesso ordine
+        paged = []
+        for page in (1, 2):
+            paged += [deal['deal_id'] for deal in self.client.get(reverse('deals_list'), {'page': page}).data['deals']]
+        self.assertEqual(paged, deal_ids)
+
+    def test_rating_ties_are_broken_by_price(self):
+        # Come l'ordinamento originale delle liste: a parità di rating prima il più economico
+        self.assertEqual(ordering_keys('-deal_rating'), ('-deal_rating', 'sale_price', '-deal_id'))
+        self.assertEqual(ordering_keys('deal_rating'), ('deal_rating', '-sale_price', 'deal_id'))
+        self.assertEqual(ordering_keys('title'), ('title', 'deal_id'))
+
+        deals = self.client.get(reverse('deals_list'), {'page': 1}).data['deals']
+        # D03 e D08 hanno rating 3.0, D03 costa meno: deal_id da solo li metterebbe al contrario
+        self.assertEqual([deal['deal_id'] for deal in deals[:4]], ['D09', 'D04', 'D03', 'D08'])
+        response = self.client.get(reverse('deals_list_filtered'), {'ordering': 'deal_rating', 'page_size': 3})
+        self.assertEqual([deal['deal_id'] for deal in response.data['deals']], ['D05', 'D10', 'D00'])
+
+    def test_invalid_cursor(self):
+        for cursor in ['not-a-cursor', encode_cursor('sale_price', Deal.objects.get(deal_id='D01'))]:
+            with self.subTest(cursor=cursor):
+                response = self.client.get(
+                    reverse('deals_list_filtered'), {'cursor': cursor, 'ordering': '-deal_rating'}
+                )
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(reverse('deals_list'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cursor_round_trip(self):
+        deal = Deal.objects.get(deal_id='D05')
+        self.assertEqual(decode_cursor('-sale_price', encode_cursor('-sale_price', deal)), (deal.sale_price, 'D05'))
+        self.assertEqual(
+            decode_cursor('-deal_rating', encode_cursor('-deal_rating', deal)), (deal.deal_rating, deal.sale_price, 'D05')
+        )
+        self.assertEqual(decode_cursor('created_at', encode_cursor('created_at', deal)), (deal.created_at, 'D05'))
+        with self.assertRaises(InvalidCursor):
+            decode_cursor('title', encode_cursor('-title', deal))
+
+    def test_page_mode_still_supported(self):
+        response = self.client.get(reverse('deals_list_filtered'), {'page': 2, 'page_size': 5})
+        self.assertEqual(response.data['count'], 12)
+        self.assertEqual(response.data['total_pages'], 3)
+        self.assertEqual(len(response.data['deals']), 5)
+        self.assertTrue(response.data['has_previous'])
+
+    def test_invalid_page_size(self):
+        for page_size in ['0', 'abc']:
+            with self.subTest(page_size=page_size):
+                response = self.client.get(reverse('deals_list_filtered'), {'cursor': '', 'page_size': page_size})
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,154 @@
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from unittest.mock import patch, Mock
+from app.models import Store, Deal, DealPriceSnapshot
+from app.price_history import (
+    add_months, drop_partitions_before, ensure_partition, list_partitions, month_start, partition_name
+)
+
+
+class PartitionHelpersTest(TestCase):
+    def test_month_arithmetic(self):
+        start = month_start(datetime(2025, 12, 31, 23, 30, tzinfo=dt_timezone.utc))
+        self.assertEqual(start, datetime(2025, 12, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(add_months(start, 1), datetime(2026, 1, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(add_months(start, -12), datetime(2024, 12, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(partition_name(start), 'deal_price_snapshots_p202512')
+
+    def test_snapshots_are_routed_to_monthly_partitions(self):
+        store = Store.objects.create(store_id=1, store_name='Steam')
+        Deal.objects.create(
+            deal_id='DEAL1', title='Game', store=store, store_name='Steam',
+            sale_price=Decimal('9.99'), normal_price=Decimal('19.99')
+        )
+        for month in (1, 2):
+            captured_at = datetime(2025, month, 15, tzinfo=dt_timezone.utc)
+            ensure_partition(captured_at)
+            DealPriceSnapshot.objects.create(
+                deal_id='DEAL1', sale_price=Decimal('9.99'), normal_price=Decimal('19.99'), captured_at=captured_at
+            )
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT count(*) FROM deal_price_snapshots_p202501')
+            self.assertEqual(cursor.fetchone()[0], 1)
+        self.assertEqual(
+            [name for _, name in list_partitions()],
+            ['deal_price_snapshots_p202501', 'deal_price_snapshots_p202502']
+        )
+
+    def test_drop_partitions_before_cutoff(self):
+        for month in (1, 2, 3):
+            ensure_partition(datetime(2025, month, 1, tzinfo=dt_timezone.utc))
+
+        dropped = drop_partitions_before(datetime(2025, 3, 10, tzinfo=dt_timezone.utc))
+
+        self.assertEqual(dropped, ['deal_price_snapshots_p202501', 'deal_price_snapshots_p202502'])
+        self.assertEqual([name for _, name in list_partitions()], ['deal_price_snapshots_p202503'])
+
+    def test_prune_command_keeps_recent_months(self):
+        now = datetime(2025, 6, 15, tzinfo=dt_timezone.utc)
+        for month in range(1, 7):
+            ensure_partition(datetime(2025, month, 1, tzinfo=dt_timezone.utc))
+
+        out = StringIO()
+        with patch('app.management.commands.prune_price_history.timezone.now', return_value=now):
+            call_command('prune_price_history', '--keep-months', '3', stdout=out)
+
+        self.assertEqual(
+            [name for _, name in list_partitions()],
+            ['deal_price_snapshots_p202504', 'deal_price_snapshots_p202505', 'deal_price_snapshots_p202506']
+        )
+        self.assertIn('3 partitions older than 2025-04 dropped', out.getvalue())
+
+
+@patch('app.cheapshark.requests.Session.get')
+class PriceSnapshotIngestionTest(TestCase):
+    def setUp(self):
+        Store.objects.create(store_id=1, store_name='Steam', is_active=True)
+        self.deal_data = {
+            'dealID': 'DEAL123',
+            'title': 'Test Game',
+            'storeID': '1',
+            'salePrice': '19.99',
+            'normalPrice': '29.99',
+            'dealRating': '8.5',
+            'lastChange': '1640995200'
+        }
+
+    def run_fetch(self, mock_get, deal_data):
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.headers = {}
+        mock_response.json.return_value = [deal_data]
+        mock_get.return_value = mock_response
+        out = StringIO()
+        call_command('fetch_deals', '--deals-only', '--stores', '1', '--full', '--rps', '0', stdout=out)
+        return out.getvalue()
+
+    def test_new_deal_gets_a_first_snapshot(self, mock_get):
+        output = self.run_fetch(mock_get, self.deal_data)
+
+        snapshot = DealPriceSnapshot.objects.get()
+        self.assertEqual(snapshot.deal_id, 'DEAL123')
+        self.assertEqual(snapshot.sale_price, Decimal('19.99'))
+        self.assertIn('Price history: 1 price changes recorded', output)
+
+    def test_only_price_changes_are_recorded(self, mock_get):
+        self.run_fetch(mock_get, self.deal_data)
+        self.run_fetch(mock_get, self.deal_data)
+        self.run_fetch(mock_get, dict(self.deal_data, lastChange='1641000000'))
+        self.assertEqual(DealPriceSnapshot.objects.count(), 1)
+
+        self.run_fetch(mock_get, dict(self.deal_data, salePrice='9.99', lastChange='1642000000'))
+
+        prices = list(DealPriceSnapshot.objects.order_by('id').values_list('sale_price', flat=True))
+        self.assertEqual(prices, [Decimal('19.99'), Decimal('9.99')])
+
+
+class DealPriceHistoryViewTest(APITestCase):
+    def setUp(self):
+        self.url = reverse('deal_price_history')
+        self.user = get_user_model().objects.create_user(username='testuser', password='testpass123')
+        store = Store.objects.create(store_id=1, store_name='Steam')
+        Deal.objects.create(
+            deal_id='DEAL1', title='Game', store=store, store_name='Steam',
+            sale_price=Decimal('4.99'), normal_price=Decimal('19.99')
+        )
+        for month, price in ((3, '9.99'), (1, '14.99'), (2, '4.99')):
+            captured_at = datetime(2025, month, 1, tzinfo=dt_timezone.utc)
+            ensure_partition(captured_at)
+            DealPriceSnapshot.objects.create(
+                deal_id='DEAL1', sale_price=Decimal(price), normal_price=Decimal('19.99'), captured_at=captured_at
+            )
+
+    def test_history_is_ordered_by_capture_time(self):
+        self.client.force_authenticate(user=self.user)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'deal_id': 'DEAL1'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['deal_id'], 'DEAL1')
+        self.assertEqual([row['sale_price'] for row in response.data['history']], ['14.99', '4.99', '9.99'])
+
+    def test_unknown_deal_has_empty_history(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(self.url, {'deal_id': 'NONEXISTENT'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['history'], [])
+
+    def test_missing_deal_id(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_requires_authentication(self):
+        response = self.client.get(self.url, {'deal_id': 'DEAL1'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
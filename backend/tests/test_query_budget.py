@@ -0,0 +1,105 @@
+from decimal import Decimal
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from app import urls
+from app.ingestion import sync_deal_store_names
+from app.models import Store, Deal
+from app.query_budget import QUERY_BUDGETS, QueryBudgetExceeded, QueryBudgetTestMixin, query_budget
+from app.serializers import DealSerializer, DealPublicSerializer
+
+
+@query_budget('test', 1)
+def two_queries(request):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.execute('SELECT 2')
+    return 'ok'
+
+
+@query_budget('test-async', 1)
+async def two_async_queries(request):
+    await Store.objects.acount()
+    await Deal.objects.acount()
+    return 'ok'
+
+
+class QueryBudgetTest(TestCase):
+    def setUp(self):
+        self.request = RequestFactory().get('/')
+
+    def test_exceeding_the_budget_fails_in_tests(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'test: 2 query, budget 1'):
+            two_queries(self.request)
+
+    def test_async_views_count_the_queries_of_the_async_orm(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'test-async: 2 query, budget 1'):
+            async_to_sync(two_async_queries)(self.request)
+
+    def test_exceeding_the_budget_is_logged_in_debug(self):
+        with override_settings(QUERY_BUDGET_MODE='log'), self.assertLogs('app.query_budget', 'WARNING') as logs:
+            self.assertEqual(two_queries(self.request), 'ok')
+        self.assertIn('test: 2 query, budget 1', logs.output[0])
+
+    def test_queries_are_not_counted_in_production(self):
+        with override_settings(QUERY_BUDGET_MODE=None):
+            self.assertEqual(two_queries(self.request), 'ok')
+
+    def test_every_read_endpoint_declares_a_budget(self):
+        for pattern in urls.urlpatterns:
+            if hasattr(pattern.callback.cls, 'get'):
+                with self.subTest(endpoint=str(pattern.pattern)):
+                    self.assertIn(str(pattern.pattern), QUERY_BUDGETS)
+
+
+class DealEndpointBudgetTest(QueryBudgetTestMixin, APITestCase):
+    """Molti deal su molti store: il numero di query non deve dipendere dalla pagina"""
+
+    def setUp(self):
+        user = get_user_model().objects.create_user(username='testuser', password='testpass123')
+        self.client.force_authenticate(user=user)
+        for store_id in range(1, 6):
+            store = Store.objects.create(store_id=store_id, store_name=f'Store {store_id}')
+            for i in range(10):
+                Deal.objects.create(
+                    deal_id=f'D{store_id}-{i}', title=f'Game {i}', store=store, store_name=store.store_name,
+                    sale_price=Decimal(i), normal_price=Decimal('60.00')
+                )
+
+    def test_deal_endpoints_stay_within_budget(self):
+        for endpoint, url, params in (
+            ('deals', reverse('deals_list'), {}),
+            ('deals', reverse('deals_list'), {'cursor': ''}),
+            ('dealsFiltered', reverse('deals_list_filtered'), {'page_size': 50}),
+            ('dealsFiltered', reverse('deals_list_filtered'), {'store': 'Store 2', 'count': 'estimated'}),
+            ('dealsFiltered', reverse('deals_list_filtered'), {'q': 'game', 'page_size': 50}),
+            ('dealsSearch', reverse('deals_search'), {'q': 'game', 'page_size': 50}),
+            ('dealDetail', reverse('deal_detail'), {'deal_id': 'D3-4'}),
+            ('filtersData', reverse('filters_data'), {}),
+            ('dealPriceHistory', reverse('deal_price_history'), {'deal_id': 'D3-4'}),
+        ):
+            with self.subTest(url=url, params=params), self.assertQueryBudget(endpoint):
+                self.assertEqual(self.client.get(url, params).status_code, 200)
+
+    def test_serializers_do_not_query_the_store(self):
+        deals = list(Deal.objects.all())
+        with self.assertNumQueries(0):
+            DealSerializer(deals, many=True).data
+            DealPublicSerializer(deals, many=True).data
+
+
+class DealStoreNameTest(TestCase):
+    def test_store_renames_reach_the_deals(self):
+        store = Store.objects.create(store_id=7, store_name='Store 7')
+        Deal.objects.create(
+            deal_id='D1', title='Game', store=store, store_name='Store 7',
+            sale_price=Decimal('1.00'), normal_price=Decimal('2.00')
+        )
+        Store.objects.filter(store_id=7).update(store_name='GOG')
+
+        self.assertEqual(sync_deal_store_names(), 1)
+        self.assertEqual(Deal.objects.get().store_name, 'GOG')
+        self.assertEqual(sync_deal_store_names(), 0)
@@ -0,0 +1,126 @@
+import hashlib
+import json
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from app.models import Deal, Store
+from app.views import ALLOWED_ORDERINGS
+
+
+SEED_DEALS = 20000
+
+FILTERS = {
+    'no filter': {},
+    'store': {'store': 'Steam'},
+    'min_price': {'min_price': '1'},
+    'store and min_price': {'store': 'GOG', 'min_price': '1'},
+}
+
+
+def plan_nodes(plan):
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from plan_nodes(child)
+
+
+class DealQueryPlanTest(APITestCase):
+    """
+    Piani di esecuzione delle liste di deal su una tabella abbastanza grande da rendere
+    conveniente la scansione sequenziale: ogni filtro e ordinamento deve leggere un indice
+    nell'ordine richiesto, senza un nodo Sort separato
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        for store_id, store_name in ((1, 'Steam'), (7, 'GOG'), (11, 'Humble'), (25, 'Epic')):
+            Store.objects.create(store_id=store_id, store_name=store_name)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO deals (deal_id, thumb, title, store_id, store_name, sale_price, normal_price,"
+                "  deal_rating, metacritic_score, expired_at, created_at, updated_at) "
+                "SELECT 'D' || lpad(i::text, 6, '0'), '', 'Game ' || md5(i::text),"
+                "  (ARRAY[1, 7, 11, 25])[i %% 4 + 1], '',"
+                "  (i %% 5000) / 100.0, (i %% 5000) / 100.0 + 10, (i %% 101) / 10.0,"
+                "  CASE WHEN i %% 7 = 0 THEN NULL ELSE i %% 100 END,"
+                "  CASE WHEN i %% 20 = 0 THEN now() END,"
+                "  now() - make_interval(secs => i), now() "
+                "FROM generate_series(1, %s) AS i",
+                [SEED_DEALS]
+            )
+            cursor.execute('ANALYZE deals')
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='testuser', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+
+    def list_query(self, url, params):
+        """La query ordinata sui deal eseguita dalla vista, quella della pagina"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        sql = [query['sql'] for query in queries if 'FROM "deals"' in query['sql'] and 'ORDER BY' in query['sql']]
+        self.assertEqual(len(sql), 1)
+        return sql[0], response
+
+    def assert_index_scan_without_sort(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        nodes = list(plan_nodes(plan[0]['Plan']))
+        node_types = [node['Node Type'] for node in nodes]
+        self.assertNotIn('Sort', node_types)
+        self.assertNotIn('Incremental Sort', node_types)
+        self.assertNotIn('Seq Scan', node_types)
+        index_names = [
+            node.get('Index Name', '') for node in nodes if node['Node Type'] in ('Index Scan', 'Index Only Scan')
+        ]
+        self.assertTrue(any(name.startswith('deal_live_') for name in index_names), node_types)
+
+    def test_filtered_pages_use_an_index_in_order(self):
+        url = reverse('deals_list_filtered')
+        for label, filters in FILTERS.items():
+            for ordering in ALLOWED_ORDERINGS:
+                with self.subTest(filters=label, ordering=ordering):
+                    sql, _ = self.list_query(url, {**filters, 'ordering': ordering, 'page': 40})
+                    self.assert_index_scan_without_sort(sql)
+
+    def test_cursor_pages_seek_on_an_index(self):
+        url = reverse('deals_list_filtered')
+        for label, filters in FILTERS.items():
+            for ordering in ALLOWED_ORDERINGS:
+                with self.subTest(filters=label, ordering=ordering):
+                    params = {**filters, 'ordering': ordering}
+                    _, first_page = self.list_query(url, {**params, 'cursor': ''})
+                    sql, _ = self.list_query(url, {**params, 'cursor': first_page.data['next_cursor']})
+                    self.assert_index_scan_without_sort(sql)
+
+    def test_deals_list_uses_an_index_in_order(self):
+        url = reverse('deals_list')
+        for params in ({'page': 40}, {'cursor': ''}):
+            with self.subTest(params=params):
+                sql, _ = self.list_query(url, params)
+                self.assert_index_scan_without_sort(sql)
+
+    def test_search_can_read_the_search_index(self):
+        # Su 20000 righe la stima dei prefissi è generica e leggere per intero uno degli indici
+        # parziali sui deal vivi può costare meno: qui conta che la condizione corrisponda
+        # all'indice GIN sul tsvector. Gli altri indici spariscono solo in questa transazione.
+        prefix = hashlib.md5(b'12345').hexdigest()[:8]
+        sql, response = self.list_query(reverse('deals_search'), {'q': prefix})
+        self.assertEqual(response.data['deals'][0]['deal_id'], 'D012345')
+        self.assertNotIn('"deals"."updated_at", "deals"."search_vector"', sql)
+        with connection.cursor() as cursor:
+            for index in Deal._meta.indexes:
+                if index.name.startswith('deal_live_'):
+                    cursor.execute(f'DROP INDEX {index.name}')
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        nodes = list(plan_nodes(plan[0]['Plan']))
+        self.assertIn('deal_search_vector_idx', [node.get('Index Name') for node in nodes])
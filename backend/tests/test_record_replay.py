@@ -0,0 +1,128 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import requests
+from django.test import TestCase
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from unittest.mock import patch, Mock
+from io import StringIO
+from app.cheapshark import CheapSharkClient, CheapSharkError, RecordingSession, ReplaySession
+from app.models import Store, Deal, HttpValidator
+
+
+def upstream_response(url, **kwargs):
+    response = requests.Response()
+    response.url = url
+    response.status_code = 200
+    response.reason = 'OK'
+    if 'stores' in url:
+        body = [{'storeID': '1', 'storeName': 'Steam', 'isActive': 1}]
+        response.headers['ETag'] = '"stores-v1"'
+    else:
+        page_number = url.split('pageNumber=')[1].split('&')[0]
+        body = [{
+            'dealID': f'DEAL{page_number}-{i}',
+            'title': f'Game {page_number} {i}',
+            'storeID': '1',
+            'salePrice': '9.99',
+            'normalPrice': '19.99',
+            'dealRating': '8.0',
+        } for i in range(3)]
+        response.headers['X-Total-Page-Count'] = '2'
+    response.headers['Content-Encoding'] = 'gzip'
+    response.raw = io.BytesIO(json.dumps(body).encode())
+    return response
+
+
+class RecordReplaySessionTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_recorded_response_is_replayed(self):
+        upstream = Mock()
+        upstream.get.side_effect = upstream_response
+        url = 'https://www.cheapshark.com/api/1.0/deals?storeID=1&pageNumber=0'
+
+        recorded = RecordingSession(self.directory, upstream).get(url, timeout=(1, 1))
+        replayed = ReplaySession(self.directory).get(url)
+
+        self.assertEqual(replayed.status_code, 200)
+        self.assertEqual(replayed.json(), recorded.json())
+        self.assertEqual(replayed.headers['X-Total-Page-Count'], '2')
+        # Il corpo è salvato già decodificato, la codifica di trasporto non serve più
+        self.assertNotIn('Content-Encoding', replayed.headers)
+        self.assertTrue(any(name.endswith('.body.gz') for name in os.listdir(self.directory)))
+
+    def test_replayed_response_can_be_streamed(self):
+        upstream = Mock()
+        upstream.get.side_effect = upstream_response
+        url = 'https://www.cheapshark.com/api/1.0/deals?storeID=1&pageNumber=1'
+        RecordingSession(self.directory, upstream).get(url)
+
+        response = ReplaySession(self.directory).get(url, stream=True)
+        self.assertEqual(json.loads(b''.join(response.iter_content(4))), upstream_response(url).json())
+
+    def test_missing_recording_fails_without_retries(self):
+        client = CheapSharkClient(replay_dir=self.directory)
+        with self.assertRaises(CheapSharkError):
+            client.get('deals')
+        self.assertEqual(len(client.stats), 0)
+
+    @patch('app.cheapshark.time.sleep')
+    def test_replay_at_recorded_latency(self, mock_sleep):
+        upstream = Mock()
+        upstream.get.side_effect = upstream_response
+        url = 'https://www.cheapshark.com/api/1.0/stores'
+        RecordingSession(self.directory, upstream).get(url)
+
+        ReplaySession(self.directory, latency=True).get(url)
+        mock_sleep.assert_called_once()
+
+        mock_sleep.reset_mock()
+        ReplaySession(self.directory).get(url)
+        mock_sleep.assert_not_called()
+
+
+class RecordReplayCommandTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    @patch('app.cheapshark.requests.Session.get', side_effect=upstream_response)
+    def test_replay_reproduces_recorded_sync_offline(self, mock_get):
+        call_command('fetch_deals', '--stores', '1', '--rps', '0', '--record', self.directory, stdout=StringIO())
+        recorded = sorted(Deal.objects.values_list('deal_id', 'sale_price'))
+        self.assertEqual(len(recorded), 6)
+        requests_made = mock_get.call_count
+
+        Deal.objects.all().delete()
+        Store.objects.all().delete()
+        for options in ([], ['--stream']):
+            out = StringIO()
+            call_command('fetch_deals', '--stores', '1', '--replay', self.directory, *options, stdout=out)
+
+            self.assertEqual(mock_get.call_count, requests_made)
+            self.assertEqual(sorted(Deal.objects.values_list('deal_id', 'sale_price')), recorded)
+            self.assertEqual(Store.objects.get(store_id=1).store_name, 'Steam')
+
+    @patch('app.cheapshark.requests.Session.get', side_effect=upstream_response)
+    def test_record_ignores_stored_validators(self, mock_get):
+        # Un DB già sincronizzato ha i validatori degli store: in registrazione non vanno inviati
+        HttpValidator.objects.create(url='https://www.cheapshark.com/api/1.0/stores', etag='"stores-v1"')
+        call_command(
+            'fetch_deals', '--stores-only', '--rps', '0', '--record', self.directory, stdout=StringIO()
+        )
+        self.assertEqual(mock_get.call_args.kwargs['headers'], {})
+
+        Store.objects.all().delete()
+        HttpValidator.objects.all().delete()
+        call_command('fetch_deals', '--stores-only', '--replay', self.directory, stdout=StringIO())
+        self.assertEqual(Store.objects.get(store_id=1).store_name, 'Steam')
+
+    def test_record_and_replay_are_exclusive(self):
+        with self.assertRaises(CommandError):
+            call_command('fetch_deals', '--record', self.directory, '--replay', self.directory)
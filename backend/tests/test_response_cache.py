@@ -0,0 +1,108 @@
+import shutil
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from unittest.mock import patch, Mock
+from app.models import Store, Deal, DatasetVersion
+from app.response_cache import bump_dataset_version, cache_stats, dataset_version
+
+
+class ResponseCacheTest(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='testuser', password='testpass123')
+        self.store = Store.objects.create(store_id=1, store_name='Steam')
+        self.deal = Deal.objects.create(
+            deal_id='DEAL1', title='Game 1', store=self.store, store_name='Steam',
+            sale_price=Decimal('9.99'), normal_price=Decimal('19.99'), deal_rating=Decimal('8.0')
+        )
+
+    def bump(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_dataset_version()
+
+    def test_second_request_is_served_from_cache(self):
+        self.client.force_authenticate(user=self.user)
+        url = reverse('deals_list_filtered')
+        first = self.client.get(url, {'store': 'Steam', 'ordering': 'title'})
+
+        # Solo la lettura della versione dei dati
+        with self.assertNumQueries(1):
+            second = self.client.get(url, {'ordering': 'title', 'store': 'Steam'})
+
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(cache_stats()['hits'], 1)
+        self.assertEqual(cache_stats()['misses'], 1)
+
+    def test_cache_is_split_by_auth_tier(self):
+        anonymous = self.client.get(reverse('deals_list'))
+        self.client.force_authenticate(user=self.user)
+        authenticated = self.client.get(reverse('deals_list'))
+
+        self.assertFalse(anonymous.data['authenticated'])
+        self.assertTrue(authenticated.data['authenticated'])
+        self.assertEqual(cache_stats()['misses'], 2)
+
+    def test_new_dataset_version_invalidates_responses(self):
+        self.client.force_authenticate(user=self.user)
+        url = reverse('deal_detail')
+        self.client.get(url, {'deal_id': 'DEAL1'})
+        Deal.objects.filter(deal_id='DEAL1').update(title='Renamed')
+
+        self.assertEqual(self.client.get(url, {'deal_id': 'DEAL1'}).data['deal']['title'], 'Game 1')
+        self.bump()
+        self.assertEqual(self.client.get(url, {'deal_id': 'DEAL1'}).data['deal']['title'], 'Renamed')
+        self.assertEqual(dataset_version().version, 1)
+
+    def test_errors_are_not_cached(self):
+        self.client.force_authenticate(user=self.user)
+        url = reverse('deal_detail')
+        self.assertEqual(self.client.get(url, {'deal_id': 'DEAL2'}).status_code, status.HTTP_404_NOT_FOUND)
+        Deal.objects.create(
+            deal_id='DEAL2', title='Game 2', store=self.store, store_name='Steam',
+            sale_price=Decimal('4.99'), normal_price=Decimal('9.99')
+        )
+        self.assertEqual(self.client.get(url, {'deal_id': 'DEAL2'}).status_code, status.HTTP_200_OK)
+
+    @patch('app.cheapshark.requests.Session.get')
+    def test_fetch_deals_bumps_dataset_version(self, mock_get):
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.headers = {}
+        mock_response.json.return_value = []
+        mock_get.return_value = mock_response
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('fetch_deals', '--deals-only', '--stores', '1', '--rps', '0', stdout=StringIO())
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('refresh_featured_deals', stdout=StringIO())
+
+        self.assertEqual(DatasetVersion.objects.get().version, 2)
+
+    def test_file_based_cache(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        caches = {
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'responses': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory},
+        }
+        with override_settings(CACHES=caches):
+            self.client.get(reverse('deals_list'))
+            self.client.get(reverse('deals_list'))
+            self.assertEqual(cache_stats(), {'hits': 1, 'misses': 1, 'hit_ratio': 0.5})
+
+    def test_stats_endpoint_is_admin_only(self):
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(self.client.get(reverse('response_cache_stats')).status_code, status.HTTP_403_FORBIDDEN)
+
+        admin = get_user_model().objects.create_superuser(username='admin', password='adminpass123', is_staff=True)
+        self.client.force_authenticate(user=admin)
+        response = self.client.get(reverse('response_cache_stats'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['dataset_version'], 0)
+        self.assertIn('hit_ratio', response.data)
@@ -0,0 +1,113 @@
+import os
+import signal
+import psycopg
+from django.test import TestCase
+from django.core.management import call_command
+from django.db import connection
+from unittest.mock import patch, Mock
+from io import StringIO
+from app.management.commands import fetch_deals, run_fetcher
+from app.models import Store, Deal, IngestionRun
+
+
+def deals_response(url, **kwargs):
+    mock_response = Mock()
+    mock_response.status_code = 200
+    mock_response.headers = {'X-Total-Page-Count': '3'}
+    page_number = url.split('pageNumber=')[1].split('&')[0]
+    mock_response.json.return_value = [{
+        'dealID': f'DEAL{page_number}',
+        'title': f'Game {page_number}',
+        'storeID': '1',
+        'salePrice': '9.99',
+        'normalPrice': '19.99',
+        'dealRating': '8.0',
+    }]
+    return mock_response
+
+
+@patch('app.cheapshark.requests.Session.get', side_effect=deals_response)
+class RunFetcherCommandTest(TestCase):
+    def setUp(self):
+        Store.objects.create(store_id=1, store_name='Steam', is_active=True)
+
+    def test_once_runs_a_single_fetch(self, mock_get):
+        out = StringIO()
+        call_command('run_fetcher', '--once', '--deals-only', '--stores', '1', '--rps', '0', stdout=out)
+
+        self.assertEqual(Deal.objects.count(), 3)
+        output = out.getvalue()
+        self.assertIn('Acquired fetcher lock', output)
+        self.assertIn('Successfully completed data fetch', output)
+        self.assertIn('Fetcher stopped', output)
+
+    def test_lock_is_released_on_exit(self, mock_get):
+        call_command('run_fetcher', '--once', '--deals-only', '--stores', '1', '--rps', '0', stdout=StringIO())
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT count(*) FROM pg_locks WHERE locktype = 'advisory' AND classid = %s AND objid = %s",
+                [run_fetcher.LOCK_NAMESPACE, run_fetcher.LOCK_ID]
+            )
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_standby_when_another_replica_holds_the_lock(self, mock_get):
+        # Un'altra "replica": connessione separata allo stesso database
+        with psycopg.connect(**connection.get_connection_params()) as other:
+            other.execute('SELECT pg_advisory_lock(%s, %s)', [run_fetcher.LOCK_NAMESPACE, run_fetcher.LOCK_ID])
+
+            out = StringIO()
+            call_command('run_fetcher', '--once', '--deals-only', '--stores', '1', stdout=out)
+
+        self.assertIn('Another replica holds the fetcher lock, standing by', out.getvalue())
+        self.assertFalse(mock_get.called)
+        self.assertEqual(Deal.objects.count(), 0)
+
+    def test_failed_fetch_does_not_stop_the_daemon(self, mock_get):
+        mock_get.side_effect = Exception('Network error')
+
+        err = StringIO()
+        call_command('run_fetcher', '--once', '--deals-only', '--stores', '1', stdout=StringIO(), stderr=err)
+
+        self.assertIn('Error during data fetch', err.getvalue())
+
+    def test_sigterm_stops_the_loop(self, mock_get):
+        def fetch_then_terminate(command, options):
+            os.kill(os.getpid(), signal.SIGTERM)
+
+        out = StringIO()
+        with patch.object(run_fetcher.Command, 'run_iteration', fetch_then_terminate):
+            # Senza --once il ciclo termina solo grazie al SIGTERM
+            call_command('run_fetcher', '--interval', '3600', '--jitter', '0', stdout=out)
+
+        self.assertIn('Received signal', out.getvalue())
+        self.assertIn('Fetcher stopped', out.getvalue())
+        self.assertIsNot(signal.getsignal(signal.SIGTERM), None)
+
+    def test_stop_request_interrupts_between_pages(self, mock_get):
+        command = fetch_deals.Command(stdout=StringIO())
+        parser = command.create_parser('manage.py', 'fetch_deals')
+        options = vars(parser.parse_args(['--deals-only', '--stores', '1', '--workers', '1', '--rps', '0']))
+        command.run_fetch(options, should_stop=lambda: True)
+
+        # La prima pagina viene comunque scritta, le altre no
+        self.assertEqual(Deal.objects.count(), 1)
+        self.assertIn('Stop requested', command.stdout.getvalue())
+        self.assertIsNone(Store.objects.get(store_id=1).deals_synced_at)
+        self.assertEqual(IngestionRun.objects.get().status, IngestionRun.STATUS_INTERRUPTED)
+
+
+class FetcherLockTest(TestCase):
+    def test_leader_keeps_a_single_lock_across_iterations(self):
+        command = run_fetcher.Command(stdout=StringIO())
+        command.is_leader = False
+
+        self.assertTrue(command.acquire_lock())
+        self.assertTrue(command.acquire_lock())
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_unlock(%s, %s)', [run_fetcher.LOCK_NAMESPACE, run_fetcher.LOCK_ID])
+            self.assertTrue(cursor.fetchone()[0])
+            # Un solo unlock basta: il lock non è stato preso due volte
+            cursor.execute('SELECT pg_advisory_unlock(%s, %s)', [run_fetcher.LOCK_NAMESPACE, run_fetcher.LOCK_ID])
+            self.assertFalse(cursor.fetchone()[0])
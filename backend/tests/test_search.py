@@ -0,0 +1,137 @@
+from decimal import Decimal
+from django.contrib.admin.sites import AdminSite
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from app.admin import DealAdmin
+from app.models import Store, Deal
+from app.search import MAX_QUERY_LENGTH, trigram_available
+
+
+class DealSearchTest(APITestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(username='testuser', password='testpass123')
+        self.client.force_authenticate(user=user)
+        self.steam = Store.objects.create(store_id=1, store_name='Steam')
+        self.gog = Store.objects.create(store_id=7, store_name='GOG')
+        for deal_id, title, store, price, rating in (
+            ('W3', 'The Witcher 3: Wild Hunt', self.gog, '9.99', '9.0'),
+            ('W2', 'The Witcher 2: Assassins of Kings', self.gog, '2.99', '7.0'),
+            ('W3S', 'The Witcher 3: Wild Hunt', self.steam, '14.99', '8.0'),
+            ('HL2', 'Half-Life 2', self.steam, '1.99', '9.5'),
+            ('OLD', 'The Witcher', self.steam, '0.99', '5.0'),
+        ):
+            Deal.objects.create(
+                deal_id=deal_id, title=title, store=store, store_name=store.store_name,
+                sale_price=Decimal(price), normal_price=Decimal('39.99'), deal_rating=Decimal(rating)
+            )
+        Deal.objects.filter(deal_id='OLD').update(expired_at='2026-01-01T00:00:00Z')
+
+    def search(self, params):
+        response = self.client.get(reverse('deals_search'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [deal['deal_id'] for deal in response.data['deals']], response
+
+    def test_results_are_ranked_by_relevance(self):
+        ids, response = self.search({'q': 'witcher 3 wild'})
+
+        # Titoli identici: a parità di rilevanza vince il rating
+        self.assertEqual(ids[:2], ['W3', 'W3S'])
+        self.assertNotIn('OLD', ids)
+        relevances = [deal['relevance'] for deal in response.data['deals']]
+        self.assertEqual(relevances, sorted(relevances, reverse=True))
+
+    def test_words_match_as_prefixes(self):
+        ids, _ = self.search({'q': 'witch assass'})
+        self.assertEqual(ids[0], 'W2')
+        ids, _ = self.search({'q': 'half life'})
+        self.assertEqual(ids, ['HL2'])
+
+    def test_search_combines_with_store_and_price_filters(self):
+        ids, _ = self.search({'q': 'witcher', 'store': 'GOG'})
+        self.assertEqual(sorted(ids), ['W2', 'W3'])
+        ids, _ = self.search({'q': 'witcher', 'store': 'GOG', 'min_price': '5'})
+        self.assertEqual(ids, ['W3'])
+
+    def test_pages(self):
+        ids, response = self.search({'q': 'witcher', 'page_size': 2})
+        self.assertEqual(len(ids), 2)
+        self.assertTrue(response.data['has_next'])
+        next_ids, response = self.search({'q': 'witcher', 'page_size': 2, 'page': 2})
+        self.assertFalse(response.data['has_next'])
+        self.assertFalse(set(ids) & set(next_ids))
+
+    def test_only_the_first_matches_are_ranked(self):
+        ids, _ = self.search({'q': 'witcher'})
+        self.assertEqual(sorted(ids), ['W2', 'W3', 'W3S'])
+
+        with override_settings(SEARCH_MAX_RANKED=2):
+            # Un'altra chiave della cache delle risposte
+            ranked, response = self.search({'q': 'witcher', 'page_size': 10})
+            self.assertEqual(len(ranked), 2)
+            self.assertFalse(response.data['has_next'])
+            self.assertEqual(ranked, [deal_id for deal_id in ids if deal_id in ranked])
+            # Il conteggio di dealsFiltered resta quello di tutte le corrispondenze
+            response = self.client.get(reverse('deals_list_filtered'), {'q': 'witcher'})
+            self.assertEqual(response.data['count'], 3)
+
+    def test_typos_match_with_trigrams(self):
+        if not trigram_available():
+            self.skipTest('pg_trgm non disponibile in questo database')
+        ids, _ = self.search({'q': 'wticher'})
+        self.assertIn('W3', ids)
+
+    def test_invalid_queries(self):
+        url = reverse('deals_search')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            self.client.get(url, {'q': 'x' * (MAX_QUERY_LENGTH + 1)}).status_code, status.HTTP_400_BAD_REQUEST
+        )
+        self.assertEqual(self.client.get(url, {'q': 'witcher', 'page': 0}).status_code, status.HTTP_400_BAD_REQUEST)
+        for min_price in ('abc', 'nan', 'inf'):
+            with self.subTest(min_price=min_price):
+                for endpoint in (url, reverse('deals_list_filtered')):
+                    response = self.client.get(endpoint, {'q': 'witcher', 'min_price': min_price})
+                    self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                    self.assertEqual(response.data, {'error': 'min_price must be a number'})
+        # Solo punteggiatura: nessuna parola da cercare, nessun errore di sintassi di to_tsquery
+        ids, _ = self.search({'q': "'&!:*"})
+        if not trigram_available():
+            self.assertEqual(ids, [])
+
+    def test_filtered_list_accepts_q(self):
+        url = reverse('deals_list_filtered')
+        response = self.client.get(url, {'q': 'witcher', 'store': 'GOG'})
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(response.data['filters_applied']['ordering'], 'relevance')
+        self.assertEqual(response.data['filters_applied']['q'], 'witcher')
+
+        response = self.client.get(url, {'q': 'witcher', 'ordering': 'sale_price'})
+        self.assertEqual([deal['deal_id'] for deal in response.data['deals']], ['W2', 'W3', 'W3S'])
+
+        response = self.client.get(url, {'q': 'witcher', 'cursor': '', 'page_size': 2})
+        self.assertEqual([deal['deal_id'] for deal in response.data['deals']], ['W3', 'W3S'])
+        response = self.client.get(url, {'q': 'witcher', 'cursor': response.data['next_cursor'], 'page_size': 2})
+        self.assertEqual([deal['deal_id'] for deal in response.data['deals']], ['W2'])
+
+    def test_search_vector_is_not_serialized(self):
+        response = self.client.get(reverse('deal_detail'), {'deal_id': 'W3'})
+        self.assertNotIn('search_vector', response.data['deal'])
+
+
+class DealAdminSearchTest(APITestCase):
+    def test_admin_search_uses_title_search_and_deal_id(self):
+        store = Store.objects.create(store_id=1, store_name='Steam')
+        for deal_id, title in (('W3', 'The Witcher 3'), ('HL2', 'Half-Life 2')):
+            Deal.objects.create(
+                deal_id=deal_id, title=title, store=store, sale_price=Decimal('1.00'), normal_price=Decimal('2.00')
+            )
+        admin = DealAdmin(Deal, AdminSite())
+        request = RequestFactory().get('/')
+
+        queryset, _ = admin.get_search_results(request, Deal.objects.all(), 'witch')
+        self.assertEqual([deal.deal_id for deal in queryset], ['W3'])
+        queryset, _ = admin.get_search_results(request, Deal.objects.all(), 'HL2')
+        self.assertEqual([deal.deal_id for deal in queryset], ['HL2'])
@@ -0,0 +1,120 @@
+import gc
+import io
+import json
+import tracemalloc
+import requests
+from django.test import TestCase, SimpleTestCase
+from django.core.management import call_command
+from unittest.mock import patch
+from io import StringIO
+from app.ingestion import iter_json_array, iter_response_array
+from app.models import Store, Deal
+
+
+def make_deal(i):
+    return {
+        'dealID': f'DEAL{i:08d}',
+        'title': f'Streaming Game {i}',
+        'storeID': '1',
+        'salePrice': '4.99',
+        'normalPrice': '19.99',
+        'dealRating': '8.0',
+        'thumb': f'https://example.com/thumbs/{i}.jpg',
+        'lastChange': '1640995200',
+    }
+
+
+def chunked(data, size):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+class IterJsonArrayTest(SimpleTestCase):
+    def test_every_split_point(self):
+        items = [{'a': 1, 'b': 'x,]y'}, {'c': [1, 2, {'d': None}]}, 12345, 'text', True]
+        payload = json.dumps(items).encode()
+
+        for size in range(1, len(payload) + 1):
+            self.assertEqual(list(iter_json_array(chunked(payload, size))), items)
+
+    def test_whitespace_and_empty_array(self):
+        self.assertEqual(list(iter_json_array([b' \n [ ', b' ] '])), [])
+        self.assertEqual(list(iter_json_array([b'[\n  {"a": 1} ,\n  {"a": 2}\n]'])), [{'a': 1}, {'a': 2}])
+
+    def test_multibyte_characters_split_across_chunks(self):
+        payload = json.dumps([{'title': 'Café – 東京'}], ensure_ascii=False).encode()
+
+        self.assertEqual(list(iter_json_array(chunked(payload, 1))), [{'title': 'Café – 東京'}])
+
+    def test_truncated_payload_raises(self):
+        with self.assertRaises(ValueError):
+            list(iter_json_array([b'[{"a": 1}, {"a":']))
+
+    def test_non_array_payload_raises(self):
+        with self.assertRaises(ValueError):
+            list(iter_json_array([b'{"error": "rate limited"}']))
+
+    def test_items_are_yielded_before_the_payload_ends(self):
+        def chunks():
+            yield b'[{"a": 1}, '
+            raise AssertionError('read past the first item')
+
+        self.assertEqual(next(iter_json_array(chunks())), {'a': 1})
+
+    def test_peak_memory_does_not_grow_with_payload(self):
+        def peak_for(count):
+            payload = json.dumps([make_deal(i) for i in range(count)]).encode()
+            gc.collect()
+            tracemalloc.start()
+            try:
+                for _ in iter_json_array(chunked(payload, 64 * 1024)):
+                    pass
+                return tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+        small = peak_for(2_000)
+        large = peak_for(40_000)
+
+        # Il payload cresce di 20 volte ma il picco resta quello di un pezzo
+        # da 64KB più l'elemento corrente
+        self.assertLess(large, small * 2)
+        self.assertLess(large, 1024 * 1024)
+
+
+class StreamingFetchTest(TestCase):
+    def setUp(self):
+        Store.objects.create(store_id=1, store_name='Steam', is_active=True)
+
+    def streamed_response(self, url, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        response.headers['X-Total-Page-Count'] = '1'
+        response.raw = io.BytesIO(json.dumps([make_deal(i) for i in range(25)]).encode())
+        self.stream_flags.append(kwargs.get('stream'))
+        return response
+
+    @patch('app.cheapshark.requests.Session.get')
+    def test_stream_mode_writes_fixed_size_batches(self, mock_get):
+        self.stream_flags = []
+        mock_get.side_effect = self.streamed_response
+
+        out = StringIO()
+        call_command(
+            'fetch_deals', '--deals-only', '--stores', '1', '--stream', '--batch-size', '10', '--rps', '0',
+            stdout=out
+        )
+
+        self.assertEqual(self.stream_flags, [True])
+        self.assertEqual(Deal.objects.count(), 25)
+        output = out.getvalue()
+        self.assertIn('Batch 1: 10 deals processed', output)
+        self.assertIn('Batch 3: 5 deals processed', output)
+
+    def test_response_is_closed_after_reading(self):
+        response = requests.Response()
+        response.raw = io.BytesIO(b'[{"a": 1}]')
+
+        with patch.object(response, 'close') as close:
+            self.assertEqual(list(iter_response_array(response)), [{'a': 1}])
+        close.assert_called_once()